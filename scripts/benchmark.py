@@ -0,0 +1,194 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "numpy==2.4.6",
+# ]
+# ///
+
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import datalib.actor
+import datalib.defs
+import datalib.map
+import datalib.music
+import datalib.sound
+import datalib.sprite
+import datalib.synth
+
+# Each case is a parser and the corpus inputs to call it on. Directory-based
+# parsers get called once per complete set of files.
+CASES = {
+    'actor': (datalib.actor.parse_actor_data, lambda corpus: [corpus / 'actor' / 'ACTORS.C']),
+    'map': (datalib.map.parse_map_data, lambda corpus: sorted((corpus / 'map').iterdir())),
+    'music': (datalib.music.parse_music_data, lambda corpus: [corpus / 'music']),
+    'sound': (datalib.sound.parse_sound_data, lambda corpus: sorted((corpus / 'sound').iterdir())),
+    'sprite': (datalib.sprite.parse_sprite_data, lambda corpus: [corpus / 'sprite' / 'ACTRINFO.MNI'])
+}
+
+parser = ArgumentParser(description='Parser benchmark utility')
+
+
+def corpus_command(args):
+    manifest = datalib.synth.write_corpus(
+        args.outdir, seed=args.seed, map_sets=-(-args.maps // len(datalib.defs.MAP_FILES)),
+        actor_count=args.actor_count, music_records=args.music_records,
+        sound_sets=args.sound_sets, sound_words=args.sound_words,
+        sprite_types=args.sprite_types, sprite_frames=args.sprite_frames,
+        actor_types=args.actor_types, actor_padding=args.actor_padding)
+
+    print(json.dumps(manifest['files'], indent=2))
+
+
+def max_rss_bytes():
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure(name, corpus, repeat):
+    # Runs in a fresh worker process, so peak RSS belongs to this case alone
+    func, inputs = CASES[name]
+    inputs = inputs(Path(corpus))
+    baseline_rss = max_rss_bytes()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in inputs:
+            func(path)
+        times.append(time.perf_counter() - start)
+
+    peak_rss = max_rss_bytes()
+
+    # Separate pass for allocations; tracemalloc slows everything down too
+    # much to leave on while timing
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    dbs = [func(path) for path in inputs]
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained_blocks = sys.getallocatedblocks() - blocks_before
+    del dbs
+
+    return {
+        'call_count': len(inputs),
+        'min_seconds': min(times),
+        'median_seconds': statistics.median(times),
+        'peak_rss_bytes': peak_rss,
+        'rss_growth_bytes': peak_rss - baseline_rss,
+        'traced_peak_bytes': traced_peak,
+        'retained_blocks': retained_blocks
+    }
+
+
+def run_command(args):
+    corpus = Path(args.corpus)
+    with open(corpus / datalib.synth.CORPUS_MANIFEST, 'r') as f:
+        manifest = json.load(f)
+
+    names = args.cases or list(CASES)
+    results = {}
+    for name in names:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(measure, name, str(corpus), args.repeat).result()
+
+        files = manifest['files'][name]
+        result['file_count'] = files['count']
+        result['input_bytes'] = files['bytes']
+        result['bytes_per_second'] = round(files['bytes'] / result['median_seconds'])
+        result['files_per_second'] = round(files['count'] / result['median_seconds'], 2)
+        results[name] = result
+
+        print(f'{name}: {result["median_seconds"]:.3f}s, {result["bytes_per_second"] / 1e6:.1f} MB/s, '
+              f'{result["peak_rss_bytes"] / 2**20:.1f} MiB peak RSS', file=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'repeat': args.repeat,
+        'corpus': {'seed': manifest['seed'], 'params': manifest['params']},
+        'results': results
+    }
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+
+        # Above 1.0 is slower or bigger than the baseline
+        report['change'] = {
+            name: {
+                'median_seconds': round(results[name]['median_seconds'] / baseline[name]['median_seconds'], 3),
+                'peak_rss_bytes': round(results[name]['peak_rss_bytes'] / baseline[name]['peak_rss_bytes'], 3)
+            } for name in results if name in baseline}
+
+    output = json.dumps(report, indent=2)
+    if args.outfile is not None:
+        with open(args.outfile, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+def usage(args):
+    parser.print_usage()
+    sys.exit(2)
+
+
+def main():
+    parser.set_defaults(command_func=usage)
+    commands = parser.add_subparsers(metavar='COMMAND')
+
+    corpus = commands.add_parser('corpus', help='write a synthetic corpus of game files')
+    corpus.add_argument(
+        '-o', dest='outdir', required=True, metavar='DIR',
+        help='directory to write the corpus into')
+    corpus.add_argument('-s', dest='seed', type=int, default=0, help='random seed')
+    corpus.add_argument(
+        '--maps', type=int, default=37,
+        help=f'number of map files, rounded up to whole sets of {len(datalib.defs.MAP_FILES)}')
+    corpus.add_argument('--actor-count', type=int, default=200, help='actors per map')
+    corpus.add_argument('--music-records', type=int, default=10000, help='records per music file')
+    corpus.add_argument('--sound-sets', type=int, default=1, help='sets of three sound files')
+    corpus.add_argument(
+        '--sound-words', type=int, default=200,
+        help='data words per sound; the format caps files at 64 KiB')
+    corpus.add_argument('--sprite-types', type=int, default=300, help='sprite types in the INFO file')
+    corpus.add_argument('--sprite-frames', type=int, default=20, help='frames per sprite type')
+    corpus.add_argument('--actor-types', type=int, default=300, help='cases in the actor source file')
+    corpus.add_argument('--actor-padding', type=int, default=10, help='filler lines per case')
+    corpus.set_defaults(command_func=corpus_command)
+
+    run = commands.add_parser('run', help='time the parsers against a corpus')
+    run.add_argument(
+        '-d', dest='corpus', required=True, metavar='DIR',
+        help='corpus directory, as written by the corpus command')
+    run.add_argument(
+        '-c', dest='cases', nargs='+', choices=list(CASES), metavar='CASE',
+        help='only run these cases: ' + ', '.join(CASES))
+    run.add_argument('-n', dest='repeat', type=int, default=3, help='timed runs per case')
+    run.add_argument('-o', dest='outfile', metavar='FILE', help='write the JSON report here')
+    run.add_argument(
+        '-b', dest='baseline', metavar='FILE',
+        help='earlier JSON report to compare against')
+    run.set_defaults(command_func=run_command)
+
+    args = parser.parse_args()
+    args.command_func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+# Submodules are imported explicitly (`import datalib.map`), and some scripts
+# only use the ones without third-party dependencies, so nothing is imported
+# here up front. Dataset is looked up on first use instead.
+
+
+def __getattr__(name):
+    if name == 'Dataset':
+        from datalib.dataset import Dataset
+        return Dataset
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
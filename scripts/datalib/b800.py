@@ -0,0 +1,186 @@
+import gzip
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import datalib.defs
+import datalib.image
+
+TEXT_COLUMNS = 80
+TEXT_ROWS = 25
+SCREEN_SIZE_BYTES = TEXT_COLUMNS * TEXT_ROWS * 2
+
+PSF1_MAGIC = b'\x36\x04'
+PSF2_MAGIC = b'\x72\xb5\x4a\x86'
+
+# On a VGA, box-drawing characters get their eighth column repeated into the
+# ninth, so horizontal lines join up. Everything else gets a blank ninth column.
+LINE_GRAPHICS = range(0xC0, 0xE0)
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'b800', help='render the B800 text screens to PNG')
+    parser.add_argument(
+        '-d', dest='dirname', required=True, metavar='DIR',
+        help='path containing all expected B800 text .MNI files')
+    parser.add_argument(
+        '-f', dest='fontfile', required=True, metavar='FILE',
+        help='path to a CP437 font; raw 256-glyph 8xN dump or PSF (optionally gzipped)')
+    parser.add_argument(
+        '-o', dest='outdir', required=True, metavar='DIR',
+        help='path where the PNG images will be written')
+    parser.add_argument(
+        '-9', dest='nine_dot', action='store_true',
+        help='draw 9-pixel-wide character cells like a VGA does')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    atlas = load_glyph_atlas(args.fontfile, nine_dot=args.nine_dot)
+    db = parse_b800_data(args.dirname, atlas)
+    db.export(args.outdir)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class B800DB:
+    def __init__(self):
+        self.table = []
+        self.frames = []
+
+    def insert_batch(self, names, screens, atlas):
+        chars, attrs = split_screens(screens)
+        visible, blinked = render_screens(chars, attrs, atlas)
+        has_blink = (attrs & 0x80).reshape(len(names), -1).any(axis=1)
+
+        for i, name in enumerate(names):
+            self.frames.append((name, visible[i], blinked[i] if has_blink[i] else None))
+            self.table.append({
+                'screen_name': name,
+                'width_pixels': visible.shape[2],
+                'height_pixels': visible.shape[1],
+                'blink_flag': int(has_blink[i]),
+                'png_files': []
+            })
+
+    def export(self, outdir):
+        os.makedirs(outdir, exist_ok=True)
+
+        jobs = []
+        for row, (name, visible, blinked) in zip(self.table, self.frames):
+            jobs.append((row, f'{name.lower()}.png', visible))
+            if blinked is not None:
+                jobs.append((row, f'{name.lower()}-blink.png', blinked))
+
+        def _export(job):
+            _, filename, pixels = job
+            datalib.image.write_png(
+                os.path.join(outdir, filename), pixels, datalib.defs.EGA_PALETTE)
+
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(_export, jobs))
+
+        for row, filename, _ in jobs:
+            row['png_files'].append(filename)
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'index': {},
+            'sort': {}
+        }
+
+
+def read_font_file(fontfile):
+    with open(fontfile, 'rb') as f:
+        data = f.read()
+
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+
+    if data[:2] == PSF1_MAGIC:
+        height = data[3]
+        return data[4:4 + (256 * height)], 8, height
+
+    if data[:4] == PSF2_MAGIC:
+        header_size, _, _, glyph_size, height, width = struct.unpack('<6I', data[8:32])
+        if glyph_size != height * ((width + 7) // 8):
+            raise ValueError(f'{fontfile} has an unexpected PSF2 glyph size')
+        return data[header_size:header_size + (256 * glyph_size)], width, height
+
+    # Raw ROM-style dump: 256 glyphs, one byte per 8-pixel row
+    if len(data) % 256:
+        raise ValueError(f'{fontfile} is not a recognizable font file')
+
+    return data, 8, len(data) // 256
+
+
+def load_glyph_atlas(fontfile, nine_dot=False):
+    # Returns a (256, height, width) boolean array, one slice per code point
+    data, width, height = read_font_file(fontfile)
+    row_bytes = (width + 7) // 8
+
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(256, height, row_bytes)
+    atlas = np.unpackbits(rows, axis=2)[:, :, :width].astype(bool)
+
+    if nine_dot:
+        ninth = np.zeros((256, height, 1), dtype=bool)
+        ninth[LINE_GRAPHICS] = atlas[LINE_GRAPHICS, :, -1:]
+        atlas = np.concatenate((atlas, ninth), axis=2)
+
+    return atlas
+
+
+def split_screens(screens):
+    cells = np.frombuffer(screens, dtype=np.uint8).reshape(-1, TEXT_ROWS, TEXT_COLUMNS, 2)
+
+    return cells[..., 0], cells[..., 1]
+
+
+def render_screens(chars, attrs, atlas):
+    # Blits every cell of every screen at once: gather each cell's glyph out
+    # of the atlas, then lay the (row, glyph row, column, glyph column) axes
+    # out as one big image per screen. Returns two palette-index images per
+    # screen, with the blinking text shown and hidden.
+    num_screens = chars.shape[0]
+    _, glyph_height, glyph_width = atlas.shape
+
+    glyphs = atlas[chars]
+    fg = (attrs & 0x0F)[..., None, None]
+    bg = ((attrs >> 4) & 0x07)[..., None, None]
+    blink = (attrs & 0x80).astype(bool)[..., None, None]
+
+    visible = np.where(glyphs, fg, bg)
+    blinked = np.where(glyphs & ~blink, fg, bg)
+
+    def _layout(cells):
+        return cells.transpose(0, 1, 3, 2, 4).reshape(
+            num_screens, TEXT_ROWS * glyph_height, TEXT_COLUMNS * glyph_width)
+
+    return _layout(visible.astype(np.uint8)), _layout(blinked.astype(np.uint8))
+
+
+def parse_b800_data(dirname, atlas):
+    b800_db = B800DB()
+
+    names = []
+    chunks = []
+    for filename in datalib.defs.b800_file_iterator(dirname):
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        if len(data) != SCREEN_SIZE_BYTES:
+            raise ValueError(f'{filename} is {len(data)} bytes, expected {SCREEN_SIZE_BYTES}')
+
+        names.append(datalib.defs.normalize_groupent_name(os.path.basename(filename)))
+        chunks.append(data)
+
+    b800_db.insert_batch(names, b''.join(chunks), atlas)
+
+    return b800_db
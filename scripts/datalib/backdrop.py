@@ -0,0 +1,176 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import datalib.defs
+import datalib.image
+
+BACKDROP_WIDTH = 40  # In tiles
+BACKDROP_HEIGHT = 18
+BACKDROP_SIZE = BACKDROP_WIDTH * BACKDROP_HEIGHT * 32
+TILE_ROW_SIZE = BACKDROP_WIDTH * 32
+
+# Order the game installs the variants into EGA memory
+VARIANTS = ['original', 'hshift', 'vshift', 'hvshift']
+STRIP_STEPS = 8
+CACHE_VERSION = 1
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'backdrop', help='render backdrop thumbnails and scroll strips to PNG')
+    parser.add_argument(
+        '-d', dest='dirname', required=True, metavar='DIR',
+        help='path containing the backdrop BD*.MNI files')
+    parser.add_argument(
+        '-o', dest='outdir', required=True, metavar='DIR',
+        help='path where the PNG images will be written')
+    parser.add_argument(
+        '-k', dest='cachedir', metavar='DIR',
+        help='path to keep decoded scroll variants between runs')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_backdrop_data(args.dirname, args.outdir, args.cachedir)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class BackdropDB:
+    def __init__(self):
+        self.table = []
+
+    def insert(self, row):
+        self.table.append(row)
+
+    def to_dict(self):
+        return {
+            'table': sorted(self.table, key=lambda row: row['backdrop_id']),
+            'index': {},
+            'sort': {}
+        }
+
+
+def shift_horizontal(data):
+    # Same result as the game's horizontal variant: every byte gets its own
+    # low nybble moved up, plus the high nybble of the byte 32 places over (the
+    # same pixel row of the next tile to the right), wrapping within each tile
+    # row. Done on the raw planar bytes, so planes need no special handling.
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(BACKDROP_HEIGHT, TILE_ROW_SIZE)
+    shifted = (rows << 4) | (np.roll(rows, -32, axis=1) >> 4)
+
+    return shifted.tobytes()
+
+
+def shift_vertical(data):
+    # Top half of each tile gets the bottom half of the same tile, and the
+    # bottom half gets the top half of the tile below, wrapping at the bottom.
+    tiles = np.frombuffer(data, dtype=np.uint8).reshape(BACKDROP_HEIGHT, BACKDROP_WIDTH, 32)
+    shifted = np.empty_like(tiles)
+    shifted[..., :16] = tiles[..., 16:]
+    shifted[..., 16:] = np.roll(tiles, -1, axis=0)[..., :16]
+
+    return shifted.tobytes()
+
+
+def build_variants(data):
+    # Returns a (4, height, width) array of the decoded variants, in the same
+    # order the game puts them into EGA memory.
+    hshift = shift_horizontal(data)
+    raw = [data, hshift, shift_vertical(data), shift_vertical(hshift)]
+
+    return datalib.image.decode_solid_tiles(b''.join(raw), BACKDROP_WIDTH).reshape(
+        len(VARIANTS), BACKDROP_HEIGHT * 8, BACKDROP_WIDTH * 8)
+
+
+def load_variants(data, cachedir):
+    if cachedir is None:
+        return build_variants(data)
+
+    digest = hashlib.sha1(data).hexdigest()
+    cachefile = os.path.join(cachedir, f'backdrop-v{CACHE_VERSION}-{digest}.npy')
+
+    try:
+        return np.load(cachefile)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    variants = build_variants(data)
+
+    temp_file = f'{cachefile}.{os.getpid()}.tmp'
+    with open(temp_file, 'wb') as f:
+        np.save(f, variants)
+    os.replace(temp_file, cachefile)
+
+    return variants
+
+
+def scroll_view(variants, scroll_x, scroll_y):
+    # What the game window shows at the given scroll position: odd positions
+    # use the shifted variants, and the backdrop moves one tile for every two
+    # steps of scrolling, wrapping around at the edges.
+    variant = variants[(scroll_x & 1) | ((scroll_y & 1) << 1)]
+    view = np.roll(variant, (-(scroll_y // 2) * 8, -(scroll_x // 2) * 8), axis=(0, 1))
+
+    return view[:datalib.defs.SCROLLH * 8, :datalib.defs.SCROLLW * 8]
+
+
+def render_backdrop(backdrop_id, filename, outdir, cachedir):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    if len(data) != BACKDROP_SIZE:
+        raise ValueError(f'{filename} is {len(data)} bytes, expected {BACKDROP_SIZE}')
+
+    name = datalib.defs.normalize_groupent_name(os.path.basename(filename))
+    variants = load_variants(data, cachedir)
+    palette = datalib.defs.EGA_PALETTE
+
+    outputs = {
+        'thumbnail': (f'{name.lower()}-thumb.png', variants[0, ::2, ::2]),
+        'hstrip': (f'{name.lower()}-hstrip.png', np.concatenate(
+            [scroll_view(variants, x, 0) for x in range(STRIP_STEPS)])),
+        'vstrip': (f'{name.lower()}-vstrip.png', np.concatenate(
+            [scroll_view(variants, 0, y) for y in range(STRIP_STEPS)], axis=1))
+    }
+    for variant_num, variant in enumerate(VARIANTS):
+        outputs[variant] = (f'{name.lower()}-{variant}.png', variants[variant_num])
+
+    for png_file, pixels in outputs.values():
+        datalib.image.write_png(os.path.join(outdir, png_file), pixels, palette)
+
+    return {
+        'backdrop_id': backdrop_id,
+        'backdrop_name': name,
+        'png_files': {kind: png_file for kind, (png_file, _) in outputs.items()}
+    }
+
+
+def parse_backdrop_data(dirname, outdir, cachedir=None):
+    backdrop_db = BackdropDB()
+
+    os.makedirs(outdir, exist_ok=True)
+    if cachedir is not None:
+        os.makedirs(cachedir, exist_ok=True)
+
+    # Not every backdrop ID has a file in the group files; those are skipped
+    jobs = [
+        (backdrop_id, filename) for backdrop_id, filename
+        in enumerate(datalib.defs.backdrop_file_iterator(dirname))
+        if filename.exists()]
+
+    with ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(render_backdrop, backdrop_id, filename, outdir, cachedir)
+            for backdrop_id, filename in jobs]
+
+        for future in futures:
+            backdrop_db.insert(future.result())
+
+    return backdrop_db
@@ -0,0 +1,199 @@
+import re
+
+import numpy as np
+from ruamel.yaml import YAML
+
+import datalib.defs
+
+# One line of GNU cflow's default output format, e.g.:
+#     NewActorAtIndex() <bbool NewActorAtIndex () at src/game1.c:5370> (R):
+# The <...> part only appears the first time a symbol is described, and a
+# trailing "[see N]" only appears when cflow is told to skip repeated subtrees.
+CFLOW_LINE_RE = re.compile(
+    r'^(?P<indent>\s*)(?P<symbol>[A-Za-z_$][\w$]*)\(\)'
+    r'(?: <(?P<signature>.*?) at (?P<location>[^<>]+:\d+)>)?'
+    r'(?P<recursive> \(R\))?:?(?: \[see \d+\])?\s*$')
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'calls', help='generate the call graph database from cflow output')
+    parser.add_argument(
+        '-f', dest='file', required=True, metavar='FILE',
+        help='path to a cflow output file, like calls.txt')
+    parser.add_argument(
+        '-r', dest='reverse', action='store_true',
+        help='the file was made with `cflow --reverse` (callers nested under callees)')
+    parser.add_argument(
+        '-c', dest='crefyml', metavar='FILE',
+        help='path to the cref.yml data file, to link symbols to their pages')
+    parser.add_argument(
+        '-b', dest='binfile', metavar='FILE',
+        help='also write the graph arrays as a NumPy .npz file')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    with open(args.file, 'r') as f:
+        graph = parse_cflow(f.read(), args.reverse)
+
+    if args.binfile is not None:
+        graph.save(args.binfile)
+
+    refs = {}
+    if args.crefyml is not None:
+        with open(args.crefyml, 'r') as f:
+            cref = YAML(typ='safe').load(f)
+        refs = {symbol: entry.get('ref') for symbol, entry in cref.items()}
+
+    db = CallGraphDB(graph, refs)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class CallGraph:
+    # Symbols are interned to small integer IDs in order of first appearance.
+    # Edges are kept twice, as CSR-style offset/ID arrays sorted by caller and
+    # by callee, so either direction is one slice. The transitive closure is
+    # precomputed as a packed bit matrix: row `i` has bit `j` set when `i`
+    # eventually calls `j`.
+
+    def __init__(self, symbols, locations, recursive, edges):
+        self.symbols = symbols
+        self.ids = {symbol: i for i, symbol in enumerate(symbols)}
+        self.locations = locations
+        self.recursive = recursive
+
+        edges = np.unique(np.asarray(edges, dtype=np.int32).reshape(-1, 2), axis=0)
+        self.edges = edges
+        self.callee_offsets, self.callee_ids = self._csr(edges[:, 0], edges[:, 1])
+        self.caller_offsets, self.caller_ids = self._csr(edges[:, 1], edges[:, 0])
+        self.closure = np.packbits(self._closure(), axis=1)
+
+    def _csr(self, keys, values):
+        order = np.lexsort((values, keys))
+        offsets = np.zeros(len(self.symbols) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(keys, minlength=len(self.symbols)), out=offsets[1:])
+
+        return offsets, values[order].astype(np.int32)
+
+    def _closure(self):
+        # Warshall's algorithm, one whole row operation per intermediate symbol
+        reach = np.zeros((len(self.symbols), len(self.symbols)), dtype=bool)
+        reach[self.edges[:, 0], self.edges[:, 1]] = True
+        for k in range(len(self.symbols)):
+            reach |= reach[:, k:k + 1] & reach[k]
+
+        return reach
+
+    def callees(self, symbol):
+        i = self.ids[symbol]
+        ids = self.callee_ids[self.callee_offsets[i]:self.callee_offsets[i + 1]]
+        return [self.symbols[j] for j in ids]
+
+    def callers(self, symbol):
+        i = self.ids[symbol]
+        ids = self.caller_ids[self.caller_offsets[i]:self.caller_offsets[i + 1]]
+        return [self.symbols[j] for j in ids]
+
+    def all_callees(self, symbol):
+        row = np.unpackbits(self.closure[self.ids[symbol]], count=len(self.symbols))
+        return [self.symbols[j] for j in np.flatnonzero(row)]
+
+    def _closure_column(self, j):
+        return (self.closure[:, j // 8] >> (7 - (j % 8))) & 1
+
+    def all_callers(self, symbol):
+        column = self._closure_column(self.ids[symbol])
+        return [self.symbols[i] for i in np.flatnonzero(column)]
+
+    def calls(self, caller, callee):
+        # True if `caller` eventually calls `callee`, directly or not
+        return bool(self._closure_column(self.ids[callee])[self.ids[caller]])
+
+    def save(self, binfile):
+        np.savez_compressed(
+            binfile, symbols=np.array(self.symbols), locations=np.array(self.locations),
+            recursive=np.array(self.recursive, dtype=bool), edges=self.edges,
+            callee_offsets=self.callee_offsets, callee_ids=self.callee_ids,
+            caller_offsets=self.caller_offsets, caller_ids=self.caller_ids,
+            closure=self.closure)
+
+
+class CallGraphDB:
+    def __init__(self, graph, refs):
+        self.graph = graph
+        self.refs = refs
+
+    def link(self, symbol):
+        return {'symbol': symbol, 'ref': self.refs.get(symbol)}
+
+    def to_dict(self):
+        graph = self.graph
+        table = []
+
+        for symbol in sorted(graph.symbols):
+            i = graph.ids[symbol]
+            table.append({
+                'symbol': symbol,
+                'ref': self.refs.get(symbol),
+                'location': graph.locations[i],
+                'recursive_flag': int(graph.recursive[i]),
+                'callers': [self.link(s) for s in sorted(graph.callers(symbol))],
+                'callees': [self.link(s) for s in sorted(graph.callees(symbol))],
+                'all_caller_count': len(graph.all_callers(symbol)),
+                'all_callee_count': len(graph.all_callees(symbol))
+            })
+
+        return {
+            'table': table,
+            'index': {
+                'symbol': {row['symbol']: i for i, row in enumerate(table)}
+            },
+            'sort': {}
+        }
+
+
+def parse_cflow(text, reverse=False):
+    symbols = []
+    ids = {}
+    locations = []
+    recursive = []
+    edges = []
+    stack = []  # (indent width, symbol ID) of each open ancestor
+
+    for line in text.splitlines():
+        if not line.strip() or line.startswith('#'):
+            continue
+
+        match = CFLOW_LINE_RE.match(line)
+        if match is None:
+            raise ValueError(f'unrecognized cflow line: {line!r}')
+
+        symbol = match.group('symbol')
+        if symbol not in ids:
+            ids[symbol] = len(symbols)
+            symbols.append(symbol)
+            locations.append(None)
+            recursive.append(False)
+        i = ids[symbol]
+
+        if match.group('location'):
+            locations[i] = match.group('location')
+        if match.group('recursive'):
+            recursive[i] = True
+
+        indent = len(match.group('indent').expandtabs())
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+
+        if stack:
+            parent = stack[-1][1]
+            edges.append((i, parent) if reverse else (parent, i))
+
+        stack.append((indent, i))
+
+    return CallGraph(symbols, locations, recursive, edges)
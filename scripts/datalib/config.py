@@ -0,0 +1,162 @@
+import os
+from collections import Counter
+
+import numpy as np
+
+import datalib.defs
+
+HIGH_SCORE_COUNT = 10
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'config', help='generate a database of configuration files')
+    parser.add_argument(
+        '-f', dest='files', required=True, nargs='+', metavar='FILE',
+        help='path to one or more COSMOx.CFG files')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_config_data(args.files)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class ConfigDB:
+    def __init__(self):
+        self.table = []
+        self.headers = None
+
+    def insert_batch(self, names, headers, raw_files):
+        self.headers = headers
+        tables = decode_high_scores(names, raw_files)
+
+        for i, (name, data, (high_scores, trailer)) in enumerate(
+                zip(names, raw_files, tables)):
+            row = {'config_name': name}
+            row.update({field: int(headers[field][i]) for field in headers.dtype.names})
+            row['high_scores'] = high_scores
+            row['trailer'] = trailer
+            row['round_trip_flag'] = int(encode_config(row) == data)
+            self.table.append(row)
+
+    def build_summary(self):
+        headers = self.headers
+
+        bindings = {}
+        for field in headers.dtype.names:
+            if field.startswith('scancode_'):
+                codes, counts = np.unique(headers[field], return_counts=True)
+                order = np.argsort(-counts, kind='stable')
+                bindings[field] = [
+                    {'scancode': int(codes[i]), 'count': int(counts[i])} for i in order]
+
+        names = Counter(
+            entry['name'] for row in self.table for entry in row['high_scores'])
+
+        return {
+            'config_count': len(headers),
+            'music_on_count': int(headers['music_flag'].astype(bool).sum()),
+            'sound_on_count': int(headers['sound_flag'].astype(bool).sum()),
+            'bindings': bindings,
+            'max_score': max(
+                (entry['score'] for row in self.table for entry in row['high_scores']),
+                default=0),
+            'common_names': [
+                {'name': name, 'count': count} for name, count in names.most_common(10)]
+        }
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'index': {},
+            'sort': {},
+            'summary': self.build_summary()
+        }
+
+
+def next_match(mask):
+    # For every position, the position of the first True at or after it, or
+    # len(mask) if there is none. One extra slot at the end holds len(mask).
+    positions = np.append(np.where(mask, np.arange(len(mask)), len(mask)), len(mask))
+
+    return np.minimum.accumulate(positions[::-1])[::-1]
+
+
+def decode_high_scores(names, raw_files):
+    # Same steps as the game: digits, skip one character (whatever it is),
+    # name up to newline. Each entry starts where the last one ended, so the
+    # ten entries are walked in step, each step covering every file at once.
+    # Returns the high scores of each file and whatever follows the last one.
+    size = datalib.defs.CONFIG_SCHEMA.size
+    data = b''.join(raw_files)
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    file_ends = np.cumsum([len(raw) for raw in raw_files])
+    file_starts = file_ends - [len(raw) for raw in raw_files]
+
+    next_non_digit = next_match((buffer < ord('0')) | (buffer > ord('9')))
+    next_newline = next_match(buffer == ord('\n'))
+
+    pos = file_starts + size
+    entries = []
+    for _ in range(HIGH_SCORE_COUNT):
+        digits_end = np.minimum(next_non_digit[pos], file_ends)
+        name_end = np.minimum(next_newline[np.minimum(digits_end + 1, len(buffer))], file_ends)
+
+        short = np.flatnonzero(name_end >= file_ends)
+        if len(short):
+            i = short[0]
+            raise ValueError(
+                f'high score table in {names[i]} ends early at offset {pos[i] - file_starts[i]}')
+
+        entries.append((pos, digits_end, name_end))
+        pos = name_end + 1
+
+    tables = []
+    for i in range(len(raw_files)):
+        high_scores = []
+        for score_start, digits_end, name_end in entries:
+            high_scores.append({
+                'score': int(data[score_start[i]:digits_end[i]] or 0),
+                'separator': data[digits_end[i]:digits_end[i] + 1].decode('cp437'),
+                'name': data[digits_end[i] + 1:name_end[i]].decode('cp437')
+            })
+
+        tables.append((high_scores, data[pos[i]:file_ends[i]].decode('cp437')))
+
+    return tables
+
+
+def encode_config(row):
+    table = b''.join(
+        f'{entry["score"]}{entry["separator"]}{entry["name"]}\n'.encode('cp437')
+        for entry in row['high_scores'])
+
+    return datalib.defs.CONFIG_SCHEMA.pack(row) + table + row['trailer'].encode('cp437')
+
+
+def parse_config_data(files):
+    config_db = ConfigDB()
+    size = datalib.defs.CONFIG_SCHEMA.size
+
+    names = []
+    raw_files = []
+    for filename in files:
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        if len(data) < size:
+            raise ValueError(f'{filename} is {len(data)} bytes, expected at least {size}')
+
+        names.append(os.path.basename(filename))
+        raw_files.append(data)
+
+    # Only the fixed-size headers can be decoded as one batch
+    headers = datalib.defs.CONFIG_SCHEMA.unpack_many(b''.join(data[:size] for data in raw_files))
+    config_db.insert_batch(names, headers, raw_files)
+
+    return config_db
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+
+import datalib.defs
+import datalib.map
+import datalib.music
+import datalib.sound
+import datalib.sprite
+
+# The same databases generate.py builds, for use from notebooks and other
+# tools: Dataset('path/to/game').maps is a MapDB, and so on. Nothing is read
+# until it is asked for. Results are remembered by the SHA-1 of their input
+# files, in memory (shared by every Dataset in the process, least recently
+# used dropped first) and, if a cache directory is given, on disk as pickles.
+# Digests are themselves remembered by file size and mtime, so a warm load
+# doesn't even reread the files. The databases are shared between callers, so
+# treat them as read-only.
+
+CACHE_VERSION = 2
+MAX_CACHED = 32
+
+_cache = OrderedDict()
+_digests = {}
+
+
+def file_digest(path):
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    digest = _digests.get(key)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        _digests[key] = digest
+
+    return digest
+
+
+def combined_digest(paths):
+    sha = hashlib.sha1()
+    for path in paths:
+        sha.update(f'{os.path.basename(path)}:{file_digest(path)}\n'.encode())
+
+    return sha.hexdigest()
+
+
+def clear_cache():
+    _cache.clear()
+    _digests.clear()
+
+
+class Dataset:
+    def __init__(self, dirname, cachedir=None):
+        self.dirname = Path(dirname)
+        self.cachedir = cachedir
+        if cachedir is not None:
+            os.makedirs(cachedir, exist_ok=True)
+
+    def load(self, kind, paths, parse, *args):
+        # `parse(*args)` builds the database from `paths`; it only runs if
+        # neither cache has a copy made from the same file contents
+        key = (kind, combined_digest(paths))
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+        db = None
+        cachefile = None
+        if self.cachedir is not None:
+            cachefile = os.path.join(self.cachedir, f'{kind}-v{CACHE_VERSION}-{key[1]}.pickle')
+            try:
+                with open(cachefile, 'rb') as f:
+                    db = pickle.load(f)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                pass
+
+        if db is None:
+            db = parse(*args)
+
+            if cachefile is not None:
+                temp_file = f'{cachefile}.{os.getpid()}.tmp'
+                with open(temp_file, 'wb') as f:
+                    pickle.dump(db, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_file, cachefile)
+
+        _cache[key] = db
+        if len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+        return db
+
+    @property
+    def maps(self):
+        return self.load(
+            'map', list(datalib.defs.map_file_iterator(self.dirname)),
+            datalib.map.parse_map_data, self.dirname)
+
+    @property
+    def music(self):
+        return self.load(
+            'music', list(datalib.defs.music_file_iterator(self.dirname)),
+            datalib.music.parse_music_data, self.dirname)
+
+    @property
+    def sounds(self):
+        return self.load(
+            'sound', list(datalib.defs.sound_file_iterator(self.dirname)),
+            datalib.sound.parse_sound_data, self.dirname)
+
+    def sprites(self, filename):
+        path = self.dirname / filename
+        return self.load('sprite', [path], datalib.sprite.parse_sprite_data, path)
+
+    @property
+    def actor_sprites(self):
+        return self.sprites('ACTRINFO.MNI')
+
+    @property
+    def player_sprites(self):
+        return self.sprites('PLYRINFO.MNI')
+
+    @property
+    def cartoon_sprites(self):
+        return self.sprites('CARTINFO.MNI')
+
+    def preload(self):
+        # Everything at once, e.g. to fill the disk cache ahead of time
+        for name in ('maps', 'music', 'sounds', 'actor_sprites', 'player_sprites', 'cartoon_sprites'):
+            getattr(self, name)
@@ -2,6 +2,9 @@ import ctypes
 import json
 from pathlib import Path
 
+import datalib.profiling
+import datalib.schema
+
 MAP_FILES = [
     'A1.MNI', 'A2.MNI', 'A3.MNI', 'A4.MNI', 'A5.MNI', 'A6.MNI', 'A7.MNI',
     'A8.MNI', 'A9.MNI', 'A10.MNI', 'A11.MNI', 'BONUS1.MNI', 'BONUS2.MNI',
@@ -18,9 +21,51 @@ MUSIC_FILES = [
 
 SOUND_FILES = ['SOUNDS.MNI', 'SOUNDS2.MNI', 'SOUNDS3.MNI']
 
+BACKDROP_FILES = [
+    'BDBLANK.MNI', 'BDPIPE.MNI', 'BDREDSKY.MNI', 'BDROCKTK.MNI', 'BDJUNGLE.MNI',
+    'BDSTAR.MNI', 'BDWIERD.MNI', 'BDCAVE.MNI', 'BDICE.MNI', 'BDSHRUM.MNI',
+    'BDTECHMS.MNI', 'BDNEWSKY.MNI', 'BDSTAR2.MNI', 'BDSTAR3.MNI', 'BDFOREST.MNI',
+    'BDMOUNTN.MNI', 'BDGUTS.MNI', 'BDBRKTEC.MNI', 'BDCLOUDS.MNI', 'BDFUTCTY.MNI',
+    'BDICE2.MNI', 'BDCLIFF.MNI', 'BDSPOOKY.MNI', 'BDCRYSTL.MNI', 'BDCIRCUT.MNI',
+    'BDCIRCPC.MNI']
+
+B800_FILES = ['COSMO1.MNI', 'COSMO2.MNI', 'COSMO3.MNI', 'NOMEMORY.MNI']
+
+FULL_SCREEN_FILES = [
+    'PRETITLE.MNI', 'TITLE1.MNI', 'TITLE2.MNI', 'TITLE3.MNI', 'CREDIT.MNI',
+    'BONUS.MNI', 'END1.MNI', 'END2.MNI', 'END3.MNI', 'ONEMOMNT.MNI']
+
 ERROR_RATE_HZ = 1193181.818181 / 1192030  # Game runs slightly FASTER than ideal
 MUSIC_RATE_HZ = 560 * ERROR_RATE_HZ
 SOUND_RATE_HZ = 140 * ERROR_RATE_HZ
+GAME_RATE_HZ = SOUND_RATE_HZ / 13  # Game loop waits 13 ticks per frame
+
+FIRST_REAL_ACTOR_TYPE = 31
+
+SCREEN_WIDTH_PIXELS = 320
+SCREEN_HEIGHT_PIXELS = 200
+EGA_PLANES = 4
+
+SCROLLW = 38  # Game window size, in tiles
+SCROLLH = 18
+
+
+def _ega_default_palette():
+    # Palette number bits are (from least significant) blue, green, red, and
+    # intensity. Brown gets its green channel knocked down, like the hardware.
+    palette = []
+    for i in range(16):
+        bbit, gbit, rbit, ibit = (i >> 0) & 1, (i >> 1) & 1, (i >> 2) & 1, (i >> 3) & 1
+        r = (rbit * 0xAA) + (ibit * 0x55)
+        g = (gbit * 0xAA) + (ibit * 0x55)
+        b = (bbit * 0xAA) + (ibit * 0x55)
+        if (rbit, gbit, bbit, ibit) == (1, 1, 0, 0):
+            g -= 0x55
+        palette.append((r, g, b))
+    return palette
+
+
+EGA_PALETTE = _ega_default_palette()
 
 
 class MapHeaderStruct(ctypes.LittleEndianStructure):
@@ -69,9 +114,73 @@ class ActorStruct(ctypes.LittleEndianStructure):
 
     @property
     def real_type(self):
-        if self.type < 31:
+        if self.type < FIRST_REAL_ACTOR_TYPE:
             raise ValueError('not a real actor type')
-        return self.type - 31
+        return self.type - FIRST_REAL_ACTOR_TYPE
+
+
+SAVE_SCHEMA = datalib.schema.Schema([
+    ('health', 'H'),
+    ('score', 'I'),
+    ('stars', 'H'),
+    ('level_num', 'H'),
+    ('bombs', 'H'),
+    ('max_health', 'H'),
+    ('used_cheat_flag', 'H'),
+    ('saw_bomb_hint_flag', 'H'),
+    ('saw_pounce_hint_state', 'H'),
+    ('saw_powerup_hint_flag', 'H'),
+    ('checksum', 'H')
+])
+
+# Only the fixed part; the high score table follows as text
+CONFIG_SCHEMA = datalib.schema.Schema([
+    ('scancode_look_up', 'B'),
+    ('scancode_look_down', 'B'),
+    ('scancode_walk_left', 'B'),
+    ('scancode_walk_right', 'B'),
+    ('scancode_jump', 'B'),
+    ('scancode_drop_bomb', 'B'),
+    ('music_flag', 'B'),
+    ('sound_flag', 'B')
+])
+
+# DOS executable header, first 28 bytes of every EXE file
+EXE_HEADER_SCHEMA = datalib.schema.Schema([
+    ('signature', 'H'),
+    ('last_page_bytes', 'H'),
+    ('page_count', 'H'),
+    ('relocation_count', 'H'),
+    ('header_paragraphs', 'H'),
+    ('min_alloc_paragraphs', 'H'),
+    ('max_alloc_paragraphs', 'H'),
+    ('initial_ss', 'H'),
+    ('initial_sp', 'H'),
+    ('checksum', 'H'),
+    ('initial_ip', 'H'),
+    ('initial_cs', 'H'),
+    ('relocation_offset', 'H'),
+    ('overlay_number', 'H')
+])
+
+# Found at the start of the LZEXE decompressor's code segment
+LZEXE_HEADER_SCHEMA = datalib.schema.Schema([
+    ('initial_ip', 'H'),
+    ('initial_cs', 'H'),
+    ('initial_sp', 'H'),
+    ('initial_ss', 'H'),
+    ('compressed_paragraphs', 'H'),
+    ('extra_paragraphs', 'H'),
+    ('decompressor_bytes', 'H')
+])
+
+OPL_CHANNELS = 9
+OPL_SAMPLE_RATE_HZ = 3579545 / 72  # The AdLib's 14.318 MHz / 4 clock, / 72
+OPL_MODULATOR_OFFSETS = [0x00, 0x01, 0x02, 0x08, 0x09, 0x0A, 0x10, 0x11, 0x12]
+OPL_CARRIER_OFFSET = 3  # Each channel's carrier is 3 operators past its modulator
+
+# Bits 0-4 of register BDh, which key these on when rhythm mode (bit 5) is set
+OPL_PERCUSSION = ['hi_hat', 'top_cymbal', 'tom_tom', 'snare_drum', 'bass_drum']
 
 
 class InfoHeaderStruct(ctypes.LittleEndianStructure):
@@ -125,14 +234,29 @@ def json_minidumps(obj):
     return json.dumps(obj, separators=(',', ':'))
 
 
+def backdrop_file_iterator(dirname):
+    for bf in BACKDROP_FILES:
+        yield Path(dirname) / bf
+
+
+def b800_file_iterator(dirname):
+    for bf in B800_FILES:
+        yield Path(dirname) / bf
+
+
+def full_screen_file_iterator(dirname):
+    for ff in FULL_SCREEN_FILES:
+        yield Path(dirname) / ff
+
+
 def map_file_iterator(dirname):
-    for mf in MAP_FILES:
-        yield Path(dirname) / mf
+    # Timed per file when profiling
+    yield from datalib.profiling.files(Path(dirname) / mf for mf in MAP_FILES)
 
 
 def music_file_iterator(dirname):
-    for mf in MUSIC_FILES:
-        yield Path(dirname) / mf
+    # Timed per file when profiling
+    yield from datalib.profiling.files(Path(dirname) / mf for mf in MUSIC_FILES)
 
 
 def normalize_groupent_name(name):
@@ -140,5 +264,5 @@ def normalize_groupent_name(name):
 
 
 def sound_file_iterator(dirname):
-    for sf in SOUND_FILES:
-        yield Path(dirname) / sf
+    # Timed per file when profiling
+    yield from datalib.profiling.files(Path(dirname) / sf for sf in SOUND_FILES)
@@ -0,0 +1,174 @@
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import datalib.defs
+
+# Bit positions in each demo frame byte, least significant first
+KEY_NAMES = ['walk_left', 'walk_right', 'look_up', 'look_down', 'jump', 'drop_bomb']
+END_LEVEL_BIT = 6
+
+# Hard-coded demo level progression, as (level number, map number)
+DEMO_LEVELS = [(0, 1), (13, 8), (5, 4), (9, 6), (16, 9)]
+
+MAX_DEMO_FRAMES = 4999
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'demo', help='generate input statistics for recorded demo files')
+    parser.add_argument(
+        '-f', dest='files', required=True, nargs='+', metavar='FILE',
+        help='path to one or more PREVDEMO.MNI-style files')
+    parser.add_argument(
+        '-j', dest='jobs', type=int, default=None, metavar='N',
+        help='number of worker processes for large batches')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_demo_data(args.files, args.jobs)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class DemoDB:
+    def __init__(self):
+        self.table = []
+
+    def insert(self, row):
+        self.table.append(row)
+
+    def build_summary(self):
+        frames_held = [0] * len(KEY_NAMES)
+        for row in self.table:
+            for i, key in enumerate(row['keys']):
+                frames_held[i] += key['frames_held']
+
+        return {
+            'demo_count': len(self.table),
+            'frame_count': sum(row['frame_count'] for row in self.table),
+            'frames_held': dict(zip(KEY_NAMES, frames_held))
+        }
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'index': {},
+            'sort': {},
+            'summary': self.build_summary()
+        }
+
+
+def decode_frames(data):
+    # One row per frame of gameplay, one column per bit of the frame byte
+    # (see KEY_NAMES and END_LEVEL_BIT). The whole stream is unpacked at once.
+    if len(data) < 2:
+        raise ValueError('demo data is too short to hold a header')
+
+    frame_count, = struct.unpack_from('<H', data)
+    if len(data) < 2 + frame_count:
+        raise ValueError(f'demo header claims {frame_count} frames, found {len(data) - 2}')
+
+    frames = np.frombuffer(data, dtype=np.uint8, count=frame_count, offset=2)
+
+    return np.unpackbits(frames[:, None], axis=1, bitorder='little').astype(bool)
+
+
+def run_lengths(held):
+    # For a (frames, keys) boolean array, returns parallel arrays of key number
+    # and length for every run of consecutive frames a key was held.
+    edges = np.diff(np.pad(held, ((1, 1), (0, 0))).astype(np.int8), axis=0).T
+    start_keys, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    return start_keys, ends - starts
+
+
+def level_durations(end_flags):
+    # A set bit 6 ends the level on that frame; later frames belong to the
+    # next level in the progression. The last level restarts instead of ending.
+    level_nums = np.cumsum(end_flags, dtype=np.int64) - end_flags
+    level_nums = np.minimum(level_nums, len(DEMO_LEVELS) - 1)
+
+    return np.bincount(level_nums, minlength=len(DEMO_LEVELS))
+
+
+def analyze_demo(filename, demo_name):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    bits = decode_frames(data)
+    held = bits[:, :len(KEY_NAMES)]
+    frame_count = len(bits)
+
+    frames_held = held.sum(axis=0)
+    press_counts = (held & ~np.pad(held, ((1, 0), (0, 0)))[:-1]).sum(axis=0)
+    run_keys, run_lens = run_lengths(held)
+
+    keys = []
+    for key_num, key_name in enumerate(KEY_NAMES):
+        lengths, counts = np.unique(run_lens[run_keys == key_num], return_counts=True)
+        keys.append({
+            'key': key_name,
+            'frames_held': int(frames_held[key_num]),
+            'held_fraction': round(float(frames_held[key_num]) / frame_count, 4) if frame_count else 0,
+            'press_count': int(press_counts[key_num]),
+            'run_lengths': [[int(n), int(c)] for n, c in zip(lengths, counts)]
+        })
+
+    levels = []
+    for (level_num, map_num), count in zip(DEMO_LEVELS, level_durations(bits[:, END_LEVEL_BIT])):
+        if count == 0:
+            continue
+        levels.append({
+            'level_num': level_num,
+            'map_num': map_num,
+            'frame_count': int(count),
+            'duration_seconds': round(int(count) / datalib.defs.GAME_RATE_HZ, 2)
+        })
+
+    return {
+        'demo_name': demo_name,
+        'frame_count': frame_count,
+        'duration_seconds': round(frame_count / datalib.defs.GAME_RATE_HZ, 2),
+        'idle_frame_count': int((~held.any(axis=1)).sum()),
+        'truncated_flag': int(frame_count >= MAX_DEMO_FRAMES),
+        'keys': keys,
+        'levels': levels
+    }
+
+
+def demo_names(files):
+    # Every episode's copy is called PREVDEMO.MNI, so in a batch each one is
+    # named by its path relative to the directory they all have in common
+    if len(files) == 1:
+        return [os.path.basename(files[0])]
+
+    dirnames = [os.path.dirname(os.path.abspath(f)) for f in files]
+    parent = os.path.commonpath(dirnames)
+
+    return [
+        os.path.relpath(os.path.abspath(f), parent).replace(os.sep, '/') for f in files]
+
+
+def parse_demo_data(files, jobs=None):
+    demo_db = DemoDB()
+    names = demo_names(files)
+
+    if len(files) == 1:
+        demo_db.insert(analyze_demo(files[0], names[0]))
+        return demo_db
+
+    # Each demo is tiny, so hand them to the workers in big chunks
+    chunksize = max(1, len(files) // ((jobs or os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for row in executor.map(analyze_demo, files, names, chunksize=chunksize):
+            demo_db.insert(row)
+
+    return demo_db
@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import datalib.defs
+import datalib.image
+
+PLANE_SIZE_BYTES = (datalib.defs.SCREEN_WIDTH_PIXELS * datalib.defs.SCREEN_HEIGHT_PIXELS) // 8
+IMAGE_SIZE_BYTES = PLANE_SIZE_BYTES * datalib.defs.EGA_PLANES
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'fullscreen', help='decode the full-screen images to PNG')
+    parser.add_argument(
+        '-d', dest='dirname', required=True, metavar='DIR',
+        help='path containing all expected full-screen image .MNI files')
+    parser.add_argument(
+        '-o', dest='outdir', required=True, metavar='DIR',
+        help='path where the PNG images will be written')
+    parser.add_argument(
+        '-s', dest='scale', type=int, default=1, metavar='N',
+        help='integer scale factor for the output images')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_full_screen_data(args.dirname)
+    db.export(args.outdir, args.scale)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class FullScreenDB:
+    def __init__(self):
+        self.names = []
+        self.images = None
+        self.table = []
+
+    def insert_batch(self, names, images):
+        # Each name becomes a PNG filename, so two images with the same name
+        # would silently write over one another
+        seen = set()
+        for name in names:
+            if name in seen:
+                raise ValueError(f'more than one image is named {name}')
+            seen.add(name)
+
+        self.names = names
+        self.images = images
+
+        present = np.zeros((len(names), 16), dtype=bool)
+        present[np.arange(len(names))[:, None], images.reshape(len(names), -1)] = True
+        colors_used = present.sum(axis=1)
+
+        for name, colors in zip(names, colors_used.tolist()):
+            self.table.append({
+                'image_name': name,
+                'width_pixels': datalib.defs.SCREEN_WIDTH_PIXELS,
+                'height_pixels': datalib.defs.SCREEN_HEIGHT_PIXELS,
+                'colors_used': colors,
+                'png_file': None
+            })
+
+    def export(self, outdir, scale=1):
+        os.makedirs(outdir, exist_ok=True)
+
+        def _export(i):
+            filename = os.path.join(outdir, f'{self.names[i].lower()}.png')
+            pixels = datalib.image.scale_pixels(self.images[i], scale)
+            datalib.image.write_png(filename, pixels, datalib.defs.EGA_PALETTE)
+            return filename
+
+        # zlib releases the GIL while compressing, so threads suffice here
+        with ThreadPoolExecutor() as executor:
+            for row, filename in zip(self.table, executor.map(_export, range(len(self.names)))):
+                row['png_file'] = os.path.basename(filename)
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'index': {},
+            'sort': {}
+        }
+
+
+def decode_planar_images(data):
+    # `data` is any number of back-to-back 32,000-byte images. All of their
+    # planes are unpacked to one bit per byte in a single pass, then each
+    # pixel's palette number is put back together from its four plane bits
+    # (plane n holds bit n: blue, green, red, intensity).
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(
+        -1, datalib.defs.EGA_PLANES, PLANE_SIZE_BYTES)
+    bits = np.unpackbits(planes, axis=2)
+    pixels = bits[:, 0] | (bits[:, 1] << 1) | (bits[:, 2] << 2) | (bits[:, 3] << 3)
+
+    return pixels.reshape(
+        -1, datalib.defs.SCREEN_HEIGHT_PIXELS, datalib.defs.SCREEN_WIDTH_PIXELS)
+
+
+def parse_full_screen_data(dirname):
+    full_screen_db = FullScreenDB()
+
+    names = []
+    chunks = []
+    for filename in datalib.defs.full_screen_file_iterator(dirname):
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        if len(data) != IMAGE_SIZE_BYTES:
+            raise ValueError(f'{filename} is {len(data)} bytes, expected {IMAGE_SIZE_BYTES}')
+
+        names.append(datalib.defs.normalize_groupent_name(os.path.basename(filename)))
+        chunks.append(data)
+
+    full_screen_db.insert_batch(names, decode_planar_images(b''.join(chunks)))
+
+    return full_screen_db
@@ -0,0 +1,106 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Just enough of a PNG encoder to write 8-bit indexed images out of NumPy
+# arrays, so none of the image generators need an imaging library.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_chunk(kind, data):
+    return (
+        struct.pack('>I', len(data)) + kind + data +
+        struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def png_header_chunks(width, height, palette, alpha=None):
+    chunks = (
+        png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)) +
+        png_chunk(b'PLTE', bytes(c for rgb in palette for c in rgb)))
+
+    if alpha is not None:
+        chunks += png_chunk(b'tRNS', bytes(alpha))
+
+    return chunks
+
+
+def png_image_data(pixels):
+    # Every row gets a leading zero byte ("no filter"), done as one column
+    # insert instead of a loop over rows.
+    height = pixels.shape[0]
+    rows = np.insert(np.ascontiguousarray(pixels, dtype=np.uint8), 0, 0, axis=1)
+
+    return zlib.compress(rows.reshape(height, -1).tobytes(), 9)
+
+
+def encode_png(pixels, palette):
+    height, width = pixels.shape
+
+    return (
+        PNG_SIGNATURE +
+        png_header_chunks(width, height, palette) +
+        png_chunk(b'IDAT', png_image_data(pixels)) +
+        png_chunk(b'IEND', b''))
+
+
+def encode_apng(frames, palette, alpha=None, num_plays=0):
+    # `frames` is a list of (pixels, x, y, delay) tuples, with `delay` as a
+    # Fraction of a second. The first frame must cover the whole canvas; each
+    # later one only covers the region it changes, and is blended over what
+    # came before it so any `alpha` transparent pixels leave it as it was.
+    height, width = frames[0][0].shape
+    out = [
+        PNG_SIGNATURE,
+        png_header_chunks(width, height, palette, alpha),
+        png_chunk(b'acTL', struct.pack('>II', len(frames), num_plays))]
+
+    sequence = 0
+    for frame_num, (pixels, x, y, delay) in enumerate(frames):
+        frame_height, frame_width = pixels.shape
+        blend_op = 1 if frame_num > 0 and alpha is not None else 0
+        out.append(png_chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', sequence, frame_width, frame_height, x, y,
+            delay.numerator, delay.denominator, 0, blend_op)))
+        sequence += 1
+
+        if frame_num == 0:
+            out.append(png_chunk(b'IDAT', png_image_data(pixels)))
+        else:
+            out.append(png_chunk(
+                b'fdAT', struct.pack('>I', sequence) + png_image_data(pixels)))
+            sequence += 1
+
+    out.append(png_chunk(b'IEND', b''))
+
+    return b''.join(out)
+
+
+def write_png(filename, pixels, palette):
+    with open(filename, 'wb') as f:
+        f.write(encode_png(pixels, palette))
+
+
+def write_apng(filename, frames, palette, alpha=None):
+    with open(filename, 'wb') as f:
+        f.write(encode_apng(frames, palette, alpha))
+
+
+def scale_pixels(pixels, scale):
+    if scale == 1:
+        return pixels
+
+    return np.repeat(np.repeat(pixels, scale, axis=0), scale, axis=1)
+
+
+def decode_solid_tiles(data, width_tiles):
+    # Solid tiles are 32 bytes each: eight pixel rows of four plane bytes
+    # (blue, green, red, intensity). `data` holds a row-major run of them that
+    # is `width_tiles` across; the result is one (height, width) image.
+    tiles = np.frombuffer(data, dtype=np.uint8).reshape(-1, width_tiles, 8, 4)
+    bits = np.unpackbits(tiles[..., None], axis=-1)
+    pixels = bits[..., 0, :] | (bits[..., 1, :] << 1) | (bits[..., 2, :] << 2) | (bits[..., 3, :] << 3)
+
+    # (tile row, tile column, pixel row, pixel column) -> (y, x)
+    return pixels.transpose(0, 2, 1, 3).reshape(tiles.shape[0] * 8, width_tiles * 8)
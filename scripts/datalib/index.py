@@ -0,0 +1,175 @@
+import hashlib
+import html
+import json
+import re
+from pathlib import Path
+
+import markdown
+from pygments.lexers import CLexer
+from pygments.token import STANDARD_TYPES
+from ruamel.yaml import YAML
+
+import datalib.defs
+
+# Counts exactly what `sed "s/[^0-9A-Za-z',]/ /g" | wc -w` does, front matter
+# and shortcode calls included, since that is what the word count on the home
+# page was calibrated against.
+WORD_RE = re.compile(r"[0-9A-Za-z',]+")
+SHORTCODE_RE = re.compile(r'\{\{[<%].*?[%>]\}\}', re.DOTALL)
+CACHE_VERSION = 2
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'index', help='generate the word count and function index data')
+    parser.add_argument(
+        '-c', dest='crefyml', required=True, metavar='FILE',
+        help='path to the cref.yml data file')
+    parser.add_argument(
+        '-d', dest='dirname', required=True, metavar='DIR',
+        help='path to the Hugo content directory')
+    parser.add_argument(
+        '-k', dest='cachefile', metavar='FILE',
+        help='path to a cache file to reuse results from previous runs')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_index_data(args.crefyml, args.dirname, args.cachefile)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class IndexDB:
+    def __init__(self):
+        self.functions = []
+        self.word_count = 0
+
+    def insert_function(self, symbol, entry):
+        self.functions.append({
+            'symbol': symbol,
+            'text': entry['text'],
+            'ref': entry.get('ref'),
+            'def_html': self.highlight_c(entry['def']),
+            'desc': entry['desc'],
+            'desc_html': self.markdownify(entry['desc']),
+            'symbol_address': dict(entry.get('symbol_address') or {}),
+            'size': dict(entry.get('size') or {})
+        })
+
+    def insert_words(self, count):
+        self.word_count += count
+
+    @staticmethod
+    def highlight_c(source):
+        # Reproduces the markup of Hugo's `highlight` function (with the
+        # `noClasses = false` site setting), so the existing Chroma stylesheet
+        # applies unchanged. Pygments and Chroma share their CSS class names.
+        lines = []
+        line = []
+        for token_type, value in CLexer().get_tokens(source):
+            while token_type not in STANDARD_TYPES:
+                token_type = token_type.parent
+            css_class = STANDARD_TYPES[token_type]
+
+            for i, part in enumerate(value.split('\n')):
+                if i > 0:
+                    lines.append(line)
+                    line = []
+                if part:
+                    text = html.escape(part, quote=False)
+                    line.append(f'<span class="{css_class}">{text}</span>' if css_class else text)
+        if line:
+            lines.append(line)
+
+        body = ''.join(
+            f'<span class="line"><span class="cl">{"".join(line)}\n</span></span>'
+            for line in lines)
+
+        return (
+            '<div class="highlight"><pre tabindex="0" class="chroma">'
+            f'<code class="language-c" data-lang="c">{body}</code></pre></div>')
+
+    @staticmethod
+    def markdownify(source):
+        # Shortcodes can only be expanded by Hugo; leave those to the template
+        if SHORTCODE_RE.search(str(source)):
+            return None
+
+        # Like Hugo's `markdownify`, a lone paragraph is not wrapped in <p>
+        out = markdown.markdown(str(source), extensions=['smarty'])
+        if out.startswith('<p>') and out.endswith('</p>') and out.count('<p>') == 1:
+            out = out[3:-4]
+
+        return out
+
+    def to_dict(self):
+        return {
+            'functions': self.functions,
+            'word_count': self.word_count
+        }
+
+
+def count_words(text):
+    return len(WORD_RE.findall(text))
+
+
+def load_cache(cachefile):
+    try:
+        with open(cachefile, 'r') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (TypeError, FileNotFoundError, ValueError, AttributeError):
+        pass
+
+    return {}
+
+
+def save_cache(cachefile, cache):
+    if cachefile is None:
+        return
+
+    with open(cachefile, 'w') as f:
+        f.write(datalib.defs.json_minidumps(cache))
+
+
+def parse_index_data(crefyml, dirname, cachefile=None):
+    index_db = IndexDB()
+    cache = load_cache(cachefile)
+    new_cache = {'version': CACHE_VERSION, 'cref_sha': None, 'functions': None, 'words': {}}
+
+    cref_bytes = Path(crefyml).read_bytes()
+    cref_sha = hashlib.sha1(cref_bytes).hexdigest()
+    new_cache['cref_sha'] = cref_sha
+
+    if cache.get('cref_sha') == cref_sha:
+        index_db.functions = cache['functions']
+    else:
+        cref = YAML(typ='safe').load(cref_bytes)
+
+        # Only entries whose text ends in "()" belong in the function index
+        for symbol in sorted(cref.keys()):
+            if str(cref[symbol]['text']).endswith('()'):
+                index_db.insert_function(symbol, cref[symbol])
+
+    new_cache['functions'] = index_db.functions
+
+    old_words = cache.get('words', {})
+    for filename in sorted(Path(dirname).rglob('*.md')):
+        md_bytes = filename.read_bytes()
+        md_sha = hashlib.sha1(md_bytes).hexdigest()
+
+        count = old_words.get(md_sha)
+        if count is None:
+            count = count_words(md_bytes.decode())
+
+        new_cache['words'][md_sha] = count
+        index_db.insert_words(count)
+
+    save_cache(cachefile, new_cache)
+
+    return index_db
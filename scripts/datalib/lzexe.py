@@ -0,0 +1,317 @@
+import os
+
+import numpy as np
+
+import datalib.defs
+
+MZ_SIGNATURE = 0x5A4D
+PAGE_BYTES = 512
+PARAGRAPH_BYTES = 16
+
+RELOCATION_DTYPE = np.dtype([('offset', '<u2'), ('segment', '<u2')])
+
+# Where the compressed relocation table starts, relative to the decompressor's
+# code segment, for each version of LZEXE. The signature is stored where the
+# relocation table would normally be, right after the EXE header.
+LZEXE_VERSIONS = {
+    b'LZ09': 0x19D,  # LZEXE 0.90
+    b'LZ91': 0x158   # LZEXE 0.91
+}
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'lzexe', help='unpack LZEXE-compressed executables and describe their headers')
+    parser.add_argument(
+        '-f', dest='files', required=True, nargs='+', metavar='FILE',
+        help='path to one or more COSMOx.EXE files')
+    parser.add_argument(
+        '-o', dest='outdir', metavar='DIR',
+        help='also write an uncompressed copy of each executable here')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_exe_data(args.files)
+
+    if args.outdir is not None:
+        for name, exe in db.executables.items():
+            with open(os.path.join(args.outdir, name), 'wb') as f:
+                f.write(exe.to_bytes())
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class Executable:
+    def __init__(self, header, relocations, image, packed_version=None):
+        self.header = header
+        self.relocations = relocations
+        self.image = image
+        self.packed_version = packed_version
+
+    def data(self, segment, offset, size):
+        # Bytes of the load image at segment:offset, with segments relative to
+        # the start of the image like the header and relocation table use
+        start = (segment * PARAGRAPH_BYTES) + offset
+
+        return memoryview(self.image)[start:start + size]
+
+    def to_bytes(self):
+        # Relocations follow the header directly, padded out to a whole page
+        # the same way UNLZEXE and the linker do it
+        table = self.relocations.astype(RELOCATION_DTYPE).tobytes()
+        schema = datalib.defs.EXE_HEADER_SCHEMA
+        header_size = -(-(schema.size + len(table)) // PAGE_BYTES) * PAGE_BYTES
+        total_size = header_size + len(self.image)
+
+        header = dict(
+            self.header,
+            signature=MZ_SIGNATURE,
+            last_page_bytes=total_size % PAGE_BYTES,
+            page_count=-(-total_size // PAGE_BYTES),
+            relocation_count=len(self.relocations),
+            header_paragraphs=header_size // PARAGRAPH_BYTES,
+            checksum=0,
+            relocation_offset=schema.size,
+            overlay_number=0)
+
+        return (schema.pack(header) + table).ljust(header_size, b'\0') + self.image
+
+
+class ExeDB:
+    def __init__(self):
+        self.executables = {}
+
+    def insert(self, name, exe):
+        self.executables[name] = exe
+
+    def to_dict(self):
+        table = []
+
+        for name, exe in self.executables.items():
+            row = {'exe_name': name, 'packed_version': exe.packed_version}
+            row.update(exe.header)
+            row['image_size'] = len(exe.image)
+            row['relocation_count'] = len(exe.relocations)
+            table.append(row)
+
+        return {
+            'table': table,
+            'index': {},
+            'sort': {}
+        }
+
+
+def load_image(data, header):
+    # The part of the file that DOS copies into memory: everything after the
+    # header, up to the size the header claims for the whole file
+    end = header['page_count'] * PAGE_BYTES
+    if header['last_page_bytes'] != 0:
+        end -= PAGE_BYTES - header['last_page_bytes']
+
+    return data[header['header_paragraphs'] * PARAGRAPH_BYTES:end]
+
+
+def decompress(data):
+    # LZSS decoder for the LZEXE compressed stream. Flag bits come from a
+    # 16-bit word, least significant bit first, and the next word is read in
+    # the moment the last bit of the previous one is used up -- even if that
+    # lands between a flag and the data bytes it goes with. A sentinel bit
+    # above the word keeps track of how many bits are left: when only the
+    # sentinel remains, the buffer is empty.
+    view = memoryview(data)
+    out = bytearray()
+    flags = view[0] | (view[1] << 8) | 0x10000
+    pos = 2
+
+    while True:
+        # Runs of literal bytes (1b) are copied as one slice, up to the end
+        # of the buffered word
+        remaining = flags.bit_length() - 1
+        run = min((~flags & (flags + 1)).bit_length() - 1, remaining)
+        if run < remaining:
+            out += view[pos:pos + run]
+            pos += run
+            flags >>= run
+        else:
+            out += view[pos:pos + run - 1]
+            flags = view[pos + run - 1] | (view[pos + run] << 8) | 0x10000
+            out.append(view[pos + run + 1])
+            pos += run + 2
+            continue
+
+        # The 0b that starts a pointer codeword, then the pointer type bit.
+        # Each bit is taken inline (like the decompressor does) since a call
+        # per bit would be most of the running time.
+        flags >>= 1
+        if flags == 1:
+            flags = view[pos] | (view[pos + 1] << 8) | 0x10000
+            pos += 2
+        long_pointer = flags & 1
+        flags >>= 1
+        if flags == 1:
+            flags = view[pos] | (view[pos + 1] << 8) | 0x10000
+            pos += 2
+
+        if long_pointer:
+            # 01b: xxxx xyyy zzzz zzzz, with a length byte when yyy is 0
+            low, high = view[pos], view[pos + 1]
+            pos += 2
+            distance = 0x2000 - (((high & 0xF8) << 5) | low)
+            length = (high & 0x07) + 2
+            if length == 2:
+                length = view[pos]
+                pos += 1
+                if length == 0:
+                    break  # End of compressed data
+                elif length == 1:
+                    continue  # Segment change; nothing to do with a flat buffer
+                length += 1
+        else:
+            # 00xxb: two more flag bits of length, one byte of distance
+            length = flags & 1
+            flags >>= 1
+            if flags == 1:
+                flags = view[pos] | (view[pos + 1] << 8) | 0x10000
+                pos += 2
+            length = ((length << 1) | (flags & 1)) + 2
+            flags >>= 1
+            if flags == 1:
+                flags = view[pos] | (view[pos + 1] << 8) | 0x10000
+                pos += 2
+            distance = 0x100 - view[pos]
+            pos += 1
+
+        start = len(out) - distance
+        if start < 0:
+            raise ValueError(f'pointer reaches {-start} bytes before the start of the data')
+
+        if distance >= length:
+            out += out[start:start + length]
+        else:
+            # Overlapping copy, which repeats the last `distance` bytes
+            out += (out[start:] * (length // distance + 1))[:length]
+
+    return bytes(out), pos
+
+
+def decode_relocations_v90(data):
+    # One list per 64 KiB segment: a count word, then that many offset words
+    counts = []
+    offsets = []
+    pos = 0
+    for _ in range(16):
+        count = int.from_bytes(data[pos:pos + 2], 'little')
+        offsets.append(np.frombuffer(data, dtype='<u2', count=count, offset=pos + 2))
+        counts.append(count)
+        pos += 2 + (count * 2)
+
+    relocations = np.zeros(sum(counts), dtype=RELOCATION_DTYPE)
+    relocations['offset'] = np.concatenate(offsets)
+    relocations['segment'] = np.repeat(np.arange(16) * 0x1000, counts)
+
+    return relocations
+
+
+def decode_relocations_v91(data):
+    # Each entry is the distance from the previous fixup, as one byte or as a
+    # 0 byte and a word. A zero word skips ahead FFFh paragraphs, and a word
+    # of 1 ends the table. Fixup addresses are the running total, which the
+    # decompressor keeps normalized so the offset is always below 10h.
+    steps = []
+    pos = 0
+    while True:
+        step = data[pos]
+        pos += 1
+        if step == 0:
+            step = data[pos] | (data[pos + 1] << 8)
+            pos += 2
+            if step == 0:
+                steps.append((0xFFF * PARAGRAPH_BYTES, False))
+                continue
+            elif step == 1:
+                break
+        steps.append((step, True))
+
+    steps = np.array(steps, dtype=np.int64).reshape(-1, 2)
+    addresses = np.cumsum(steps[:, 0])[steps[:, 1].astype(bool)]
+
+    relocations = np.zeros(len(addresses), dtype=RELOCATION_DTYPE)
+    relocations['offset'] = addresses % PARAGRAPH_BYTES
+    relocations['segment'] = addresses // PARAGRAPH_BYTES
+
+    return relocations
+
+
+def unpack_lzexe(data, header, version):
+    image = load_image(memoryview(data), header)
+    code = image[header['initial_cs'] * PARAGRAPH_BYTES:]
+    lz = datalib.defs.LZEXE_HEADER_SCHEMA.unpack(code)
+
+    # The packed data ends where the decompressor's segment starts, and runs
+    # back from there for as many paragraphs as the LZEXE header says. This is
+    # usually the whole image before the decompressor, but not always.
+    packed_start = (header['initial_cs'] - lz['compressed_paragraphs']) * PARAGRAPH_BYTES
+    if packed_start < 0:
+        raise ValueError(
+            f'LZEXE header claims {lz["compressed_paragraphs"]} packed paragraphs, '
+            f'only {header["initial_cs"]} come before the decompressor')
+
+    unpacked, _ = decompress(image[packed_start:header['initial_cs'] * PARAGRAPH_BYTES])
+
+    table = code[LZEXE_VERSIONS[version]:lz['decompressor_bytes']]
+    if version == b'LZ09':
+        relocations = decode_relocations_v90(table)
+    else:
+        relocations = decode_relocations_v91(table)
+
+    # Keep the total amount of memory the same as what the packed program
+    # asked for. This can be a little more than the original program needed,
+    # but never less.
+    packed_paragraphs = -(-len(image) // PARAGRAPH_BYTES) + header['min_alloc_paragraphs']
+    unpacked_paragraphs = -(-len(unpacked) // PARAGRAPH_BYTES)
+
+    return Executable(
+        dict(
+            header,
+            min_alloc_paragraphs=max(packed_paragraphs - unpacked_paragraphs, 0),
+            initial_ss=lz['initial_ss'],
+            initial_sp=lz['initial_sp'],
+            initial_ip=lz['initial_ip'],
+            initial_cs=lz['initial_cs']),
+        relocations, unpacked, version.decode('ascii'))
+
+
+def read_exe(filename):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    schema = datalib.defs.EXE_HEADER_SCHEMA
+    if len(data) < schema.size:
+        raise ValueError(f'{filename} is {len(data)} bytes, expected at least {schema.size}')
+
+    header = schema.unpack(data)
+    if header['signature'] not in (MZ_SIGNATURE, 0x4D5A):
+        raise ValueError(f'{filename} is not an EXE file')
+
+    version = data[schema.size:schema.size + 4]
+    if header['relocation_count'] == 0 and version in LZEXE_VERSIONS:
+        return unpack_lzexe(data, header, version)
+
+    relocations = np.frombuffer(
+        data, dtype=RELOCATION_DTYPE,
+        count=header['relocation_count'], offset=header['relocation_offset'])
+
+    return Executable(header, relocations.copy(), bytes(load_image(data, header)))
+
+
+def parse_exe_data(files):
+    exe_db = ExeDB()
+
+    for filename in files:
+        exe_db.insert(os.path.basename(filename), read_exe(filename))
+
+    return exe_db
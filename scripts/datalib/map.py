@@ -1,7 +1,14 @@
 import os
 from collections import defaultdict
 
+import numpy as np
+
 import datalib.defs
+import datalib.reach
+import datalib.tileattr
+
+# Same layout as ActorStruct, for looking at a whole run of them at once
+ACTOR_DTYPE = np.dtype([('type', '<u2'), ('x_tiles', '<u2'), ('y_tiles', '<u2')])
 
 
 def register_parser(parent):
@@ -10,11 +17,14 @@ def register_parser(parent):
     parser.add_argument(
         '-d', dest='dirname', required=True, metavar='DIR',
         help='path containing all expected map data .MNI files')
+    parser.add_argument(
+        '-t', dest='tileattr', metavar='FILE',
+        help='path to TILEATTR.MNI, to add tile attribute statistics for each map')
     parser.set_defaults(command_func=run)
 
 
 def run(args):
-    db = parse_map_data(args.dirname)
+    db = parse_map_data(args.dirname, args.tileattr)
 
     print(datalib.defs.json_minidumps(db.to_dict()))
 
@@ -23,13 +33,15 @@ def run(args):
 
 
 class MapDB:
-    def __init__(self):
+    def __init__(self, tile_masks=None):
         self.table = []
+        self.tile_masks = tile_masks
         self.index_actor = defaultdict(list)
         self.index_backdrop = defaultdict(list)
         self.index_music = defaultdict(list)
         self.index_palette_animation = defaultdict(list)
         self.index_special_actor = defaultdict(list)
+        self.actor_records = []
 
     def insert(self, map_name, header, actors, tiles):
         self.table.append({
@@ -50,6 +62,15 @@ class MapDB:
             'tile_size_bytes': len(tiles),
         })
 
+        # Zero-copy view of the same ActorStruct records, for the cross index
+        records = np.frombuffer(actors, dtype=ACTOR_DTYPE)
+        self.actor_records.append(records)
+
+        if self.tile_masks is not None:
+            self.table[-1]['tile_stats'] = self.build_tile_stats(tiles)
+            self.table[-1]['reachability'] = datalib.reach.reachability_stats(
+                tile_grid(header, tiles), records, self.tile_masks)
+
         for act in actors:
             try:
                 if map_name not in self.index_actor[act.real_type]:
@@ -67,6 +88,80 @@ class MapDB:
         if map_name not in self.index_palette_animation[header.palette_animation_id]:
             self.index_palette_animation[header.palette_animation_id].append(map_name)
 
+    def build_tile_stats(self, tiles):
+        tile_values = np.frombuffer(tiles, dtype='<u2', count=len(tiles) // 2)
+        counts = datalib.tileattr.count_flags(tile_values, self.tile_masks)
+        total = len(tile_values)
+
+        return {
+            'tile_count': total,
+            'flag_counts': dict(zip(datalib.tileattr.TILE_FLAGS, counts.tolist())),
+            'flag_percents': {
+                flag: round(100 * int(count) / total, 2) if total else 0
+                for flag, count in zip(datalib.tileattr.TILE_FLAGS, counts)}
+        }
+
+    def build_cross_index(self, special):
+        # Flattens every map's actor records into parallel arrays (in map file
+        # order) and aggregates them all at once: a dense actor type x map count
+        # matrix, and the first place in the game each actor type appears.
+        map_names = [row['map_name'] for row in self.table]
+        map_nums = np.repeat(
+            np.arange(len(map_names)), [len(r) for r in self.actor_records])
+        records = np.concatenate(self.actor_records) if self.actor_records else \
+            np.zeros(0, dtype=ACTOR_DTYPE)
+
+        if special:
+            mask = records['type'] < datalib.defs.FIRST_REAL_ACTOR_TYPE
+            types = records['type'][mask].astype(np.int64)
+        else:
+            mask = records['type'] >= datalib.defs.FIRST_REAL_ACTOR_TYPE
+            types = records['type'][mask].astype(np.int64) - datalib.defs.FIRST_REAL_ACTOR_TYPE
+        map_nums = map_nums[mask]
+        records = records[mask]
+
+        unique_types, first_pos, type_nums = np.unique(
+            types, return_index=True, return_inverse=True)
+        matrix = np.zeros((len(unique_types), len(map_names)), dtype=np.int64)
+        np.add.at(matrix, (type_nums, map_nums), 1)
+
+        table = []
+        for type_num, actor_type in enumerate(unique_types.tolist()):
+            counts = matrix[type_num]
+            present = np.flatnonzero(counts)
+            first = first_pos[type_num]
+
+            table.append({
+                'actor_type': actor_type,
+                'total': int(counts.sum()),
+                'maps': [
+                    {'map_name': map_names[m], 'count': int(counts[m])}
+                    for m in present.tolist()],
+                'first_occurrence': {
+                    'map_name': map_names[map_nums[first]],
+                    'x_tiles': int(records['x_tiles'][first]),
+                    'y_tiles': int(records['y_tiles'][first])
+                }
+            })
+
+        histograms = {}
+        for map_num, map_name in enumerate(map_names):
+            column = matrix[:, map_num]
+            present = np.flatnonzero(column)
+            # Most common first; ties go in actor type order
+            order = present[np.lexsort((unique_types[present], -column[present]))]
+            histograms[map_name] = [
+                {'actor_type': int(unique_types[i]), 'count': int(column[i])}
+                for i in order.tolist()]
+
+        return {
+            'map_names': map_names,
+            'actor_types': unique_types.tolist(),
+            'counts': matrix.tolist(),
+            'table': table,
+            'histogram': histograms
+        }
+
     def to_dict(self):
         return {
             'table': self.table,
@@ -83,28 +178,46 @@ class MapDB:
                 'music': sorted(self.index_music.keys()),
                 'palette_animation': sorted(self.index_palette_animation.keys()),
                 'special_actor': sorted(self.index_special_actor.keys())
+            },
+            'cross': {
+                'actor': self.build_cross_index(special=False),
+                'special_actor': self.build_cross_index(special=True)
             }
         }
 
 
-def parse_map_data(dirname):
-    map_db = MapDB()
+def read_map_file(filename):
+    with open(filename, 'rb') as f:
+        header = datalib.defs.MapHeaderStruct()
+        f.readinto(header)
 
-    for filename in datalib.defs.map_file_iterator(dirname):
-        map_name = datalib.defs.normalize_groupent_name(os.path.basename(filename))
+        actors = (datalib.defs.ActorStruct * header.num_actors)()
+        f.readinto(actors)
+
+        tiles = f.read()
+
+    return header, actors, tiles
 
-        with open(filename, 'rb') as f:
-            header = datalib.defs.MapHeaderStruct()
-            f.readinto(header)
 
-            actors = []
-            for _ in range(header.num_actors):
-                act = datalib.defs.ActorStruct()
-                f.readinto(act)
-                actors.append(act)
+def tile_grid(header, tiles):
+    # The tile data is a few words short of filling the bottom row (which the
+    # game never shows anyway); the missing cells come back as zero.
+    grid = np.zeros(header.width_tiles * header.height_tiles, dtype=np.uint16)
+    words = np.frombuffer(tiles, dtype='<u2', count=min(len(tiles) // 2, len(grid)))
+    grid[:len(words)] = words
 
-            tiles = f.read()
+    return grid.reshape(header.height_tiles, header.width_tiles)
 
-        map_db.insert(map_name, header, actors, tiles)
+
+def parse_map_data(dirname, tileattr=None):
+    tile_masks = None
+    if tileattr is not None:
+        tile_masks = datalib.tileattr.flag_masks(datalib.tileattr.read_tile_attributes(tileattr))
+
+    map_db = MapDB(tile_masks)
+
+    for filename in datalib.defs.map_file_iterator(dirname):
+        map_name = datalib.defs.normalize_groupent_name(os.path.basename(filename))
+        map_db.insert(map_name, *read_map_file(filename))
 
     return map_db
@@ -1,8 +1,45 @@
+import argparse
 import os
-from collections import defaultdict
+
+import numpy as np
 
 import datalib.defs
 
+# One AdLib register write in a music file, and the delay that follows it
+MUSIC_DTYPE = np.dtype([('register', 'u1'), ('value', 'u1'), ('wait', '<u2')])
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+REPEAT_WINDOW_WRITES = 32
+HASH_BASE = 0x9E3779B97F4A7C15  # Any odd number works; odd means invertible mod 2**64
+
+# One note, from key on to key off. `note` is the nearest MIDI note number
+# (-1 if the frequency was zero) and `instrument` indexes the song's
+# instrument table.
+NOTE_EVENT_DTYPE = np.dtype([
+    ('channel', 'u1'),
+    ('start', '<i8'),
+    ('duration', '<i8'),
+    ('block', 'u1'),
+    ('fnum', '<u2'),
+    ('note', '<i2'),
+    ('instrument', '<i4')
+])
+
+# A section of one song that is an exact copy of an earlier section, in the
+# same song (possibly overlapping it) or one before it in MUSIC_FILES order.
+# Offsets count writes, times count cycles.
+REPEAT_DTYPE = np.dtype([
+    ('music', '<i4'),
+    ('offset', '<i8'),
+    ('time', '<i8'),
+    ('writes', '<i8'),
+    ('cycles', '<i8'),
+    ('source_music', '<i4'),
+    ('source_offset', '<i8'),
+    ('source_time', '<i8')
+])
+
 
 def register_parser(parent):
     parser = parent.add_parser(
@@ -10,11 +47,22 @@ def register_parser(parent):
     parser.add_argument(
         '-d', dest='dirname', required=True, metavar='DIR',
         help='path containing all expected music .MNI files')
+    parser.add_argument(
+        '-w', dest='window', type=window_writes, default=REPEAT_WINDOW_WRITES, metavar='WRITES',
+        help='shortest run of identical writes to report as a repeat (default: %(default)s)')
     parser.set_defaults(command_func=run)
 
 
+def window_writes(value):
+    writes = int(value)
+    if writes < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, not {writes}')
+
+    return writes
+
+
 def run(args):
-    db = parse_music_data(args.dirname)
+    db = parse_music_data(args.dirname, args.window)
 
     print(datalib.defs.json_minidumps(db.to_dict()))
 
@@ -25,15 +73,83 @@ def run(args):
 class MusicDB:
     def __init__(self):
         self.table = []
+        self.events = {}
+        self.index_shared = {}
+
+    def insert(self, music_name, cycles, writes, events, instruments, percussion):
+        # The full event list is kept for anybody using the DB directly, but
+        # only the summary goes into the table
+        self.events[music_name] = events
+
+        channels = []
+        for channel in np.unique(events['channel']):
+            played = events[events['channel'] == channel]
+            lowest_note, highest_note = self.note_range(played['note'])
+            channels.append({
+                'channel': int(channel),
+                'note_count': len(played),
+                'lowest_note': lowest_note,
+                'highest_note': highest_note,
+                'busy_cycles': int(played['duration'].sum()),
+                'instruments': np.unique(played['instrument']).tolist()
+            })
+
+        lowest_note, highest_note = self.note_range(events['note'])
+        counts = np.bincount(events['instrument'], minlength=len(instruments))
 
-    def insert(self, music_name, cycles, writes):
         self.table.append({
             'music_name': music_name,
             'cycles': cycles,
             'writes': writes,
-            'duration': self.cycles_to_duration(cycles)
+            'duration': self.cycles_to_duration(cycles),
+            'note_count': len(events),
+            'lowest_note': lowest_note,
+            'highest_note': highest_note,
+            'channels': channels,
+            'percussion': percussion,
+            'instruments': [{
+                'instrument': i,
+                'registers': ' '.join(f'{value:02X}' for value in registers),
+                'note_count': int(counts[i])
+            } for i, registers in enumerate(instruments)]
         })
 
+    def insert_repeats(self, repeats):
+        # Rows were inserted in the same order the songs were numbered in
+        for row in self.table:
+            row['repeats'] = []
+            row['loop'] = None
+
+        for repeat in repeats:
+            row = self.table[repeat['music']]
+            source_name = self.table[repeat['source_music']]['music_name']
+
+            row['repeats'].append({
+                'offset': int(repeat['offset']),
+                'time': int(repeat['time']),
+                'writes': int(repeat['writes']),
+                'cycles': int(repeat['cycles']),
+                'duration': self.cycles_to_duration(int(repeat['cycles'])),
+                'source_music_name': source_name,
+                'source_offset': int(repeat['source_offset']),
+                'source_time': int(repeat['source_time'])
+            })
+
+            if repeat['source_music'] != repeat['music']:
+                self.index_shared.setdefault(row['music_name'], set()).add(source_name)
+                self.index_shared.setdefault(source_name, set()).add(row['music_name'])
+            elif repeat['offset'] + repeat['writes'] == row['writes']:
+                # The song ends by playing an earlier part of itself again, so
+                # that's where it really loops back to
+                if row['loop'] is None or repeat['writes'] > row['loop']['writes']:
+                    row['loop'] = {
+                        'offset': int(repeat['source_offset']),
+                        'time': int(repeat['source_time']),
+                        'writes': int(repeat['writes']),
+                        'cycles': int(repeat['cycles']),
+                        'duration': self.cycles_to_duration(int(repeat['cycles']))
+                    }
+
     @staticmethod
     def cycles_to_duration(cycles):
         seconds = cycles / datalib.defs.MUSIC_RATE_HZ
@@ -43,16 +159,255 @@ class MusicDB:
 
         return f'{minutes}:{seconds:06.3f}'
 
+    @staticmethod
+    def note_range(notes):
+        notes = notes[notes >= 0]
+        if len(notes) == 0:
+            return None, None
+
+        return note_name(notes.min()), note_name(notes.max())
+
     def to_dict(self):
         return {
             'table': self.table,
-            'index': {},
-            'sort': {}
+            'index': {
+                'shared': {name: sorted(names) for name, names in self.index_shared.items()}
+            },
+            'sort': {
+                'shared': sorted(self.index_shared.keys())
+            }
         }
 
 
-def parse_music_data(dirname):
+def note_name(note):
+    return f'{NOTE_NAMES[note % 12]}{(note // 12) - 1}'
+
+
+def instrument_registers(channel):
+    # Everything that shapes a channel's sound: 20h/40h/60h/80h/E0h for its
+    # modulator then its carrier, and its own C0h (feedback/connection)
+    modulator = datalib.defs.OPL_MODULATOR_OFFSETS[channel]
+    carrier = modulator + datalib.defs.OPL_CARRIER_OFFSET
+
+    return [base + op for op in (modulator, carrier) for base in (0x20, 0x40, 0x60, 0x80, 0xE0)] + [0xC0 + channel]
+
+
+class RegisterHistory:
+    # Every write grouped by register, in file order, so the value a register
+    # held at any point in the stream is one binary search away
+    def __init__(self, records):
+        registers = records['register']
+        self.values = records['value']
+        self.order = np.argsort(registers, kind='stable')
+        self.bounds = np.searchsorted(registers[self.order], np.arange(0x101))
+
+    def writes(self, register):
+        return self.order[self.bounds[register]:self.bounds[register + 1]]
+
+    def value_at(self, register, positions):
+        # Registers that were never written are still in their reset state
+        written = self.writes(register)
+        if len(written) == 0:
+            return np.zeros(len(positions), dtype=np.uint8)
+
+        k = np.searchsorted(written, positions, side='right') - 1
+        return np.where(k >= 0, self.values[written[np.maximum(k, 0)]], 0).astype(np.uint8)
+
+
+def key_transitions(key_bits):
+    # Positions (within key_bits) where a key goes on and where it goes off;
+    # the two alternate, starting with an on
+    was_on = np.concatenate(([False], key_bits[:-1]))
+
+    return np.flatnonzero(key_bits & ~was_on), np.flatnonzero(~key_bits & was_on)
+
+
+def decode_notes(records):
+    # Writes happen at the time *before* their own wait is added on
+    waits = records['wait'].astype(np.int64)
+    times = np.cumsum(waits) - waits
+    total = int(waits.sum())
+    history = RegisterHistory(records)
+
+    channel_events = []
+    channel_instruments = []
+    for channel in range(datalib.defs.OPL_CHANNELS):
+        writes = history.writes(0xB0 + channel)
+        values = history.values[writes]
+        ons, offs = key_transitions((values & 0x20) != 0)
+        starts = writes[ons]
+
+        # A note still sounding at the end of the song runs until the end
+        ends = np.concatenate((times[writes[offs]], np.full(len(ons) - len(offs), total)))
+
+        events = np.zeros(len(starts), dtype=NOTE_EVENT_DTYPE)
+        events['channel'] = channel
+        events['start'] = times[starts]
+        events['duration'] = ends - times[starts]
+        events['block'] = (values[ons] >> 2) & 7
+        events['fnum'] = ((values[ons].astype(np.uint16) & 3) << 8) | history.value_at(0xA0 + channel, starts)
+        channel_events.append(events)
+
+        instruments = np.stack(
+            [history.value_at(register, starts) for register in instrument_registers(channel)], axis=1)
+        # The carrier's attenuation is the note's volume, not part of the
+        # instrument, so only its key scale bits are kept
+        instruments[:, 6] &= 0xC0
+        channel_instruments.append(instruments)
+
+    events = np.concatenate(channel_events)
+    instruments = np.concatenate(channel_instruments)
+    order = np.argsort(events['start'], kind='stable')
+    events = events[order]
+    instruments = instruments[order]
+
+    with np.errstate(divide='ignore'):
+        hz = events['fnum'] * datalib.defs.OPL_SAMPLE_RATE_HZ / np.exp2(20 - events['block'].astype(np.int64))
+        notes = np.rint(69 + 12 * np.log2(hz / 440))
+    events['note'] = np.where(events['fnum'] > 0, notes, -1)
+
+    # Number the distinct instruments in order of first use
+    table, first, inverse = np.unique(instruments, axis=0, return_index=True, return_inverse=True)
+    by_first_use = np.argsort(first)
+    rank = np.empty_like(by_first_use)
+    rank[by_first_use] = np.arange(len(by_first_use))
+    events['instrument'] = rank[inverse.reshape(-1)]
+
+    rhythm = history.values[history.writes(0xBD)]
+    percussion = {}
+    for bit, name in enumerate(datalib.defs.OPL_PERCUSSION):
+        hits, _ = key_transitions(((rhythm >> 5) & (rhythm >> bit) & 1) != 0)
+        if len(hits) > 0:
+            percussion[name] = len(hits)
+
+    return events, table[by_first_use], percussion
+
+
+def window_hashes(tokens, window):
+    # Polynomial hash of every `window`-long run of tokens, mod 2**64. Token j
+    # is weighted by the base's inverse to the jth power, which makes every
+    # window's hash the difference of two cumulative sums, scaled back up by
+    # a power of the base: a rolling hash without the loop.
+    if window < 1:
+        raise ValueError(f'window is {window} tokens, expected at least 1')
+
+    count = len(tokens) - window + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    powers = np.ones(len(tokens), dtype=np.uint64)
+    inverse_powers = np.ones(len(tokens), dtype=np.uint64)
+    np.cumprod(np.full(len(tokens) - 1, HASH_BASE, dtype=np.uint64), out=powers[1:])
+    np.cumprod(np.full(len(tokens) - 1, pow(HASH_BASE, -1, 2**64), dtype=np.uint64), out=inverse_powers[1:])
+
+    prefix = np.zeros(len(tokens) + 1, dtype=np.uint64)
+    np.cumsum(tokens * inverse_powers, out=prefix[1:])
+
+    return (prefix[window:] - prefix[:-window]) * powers[window - 1:]
+
+
+def match_length(flat, a, b, limit, step):
+    # How many tokens match from positions a and b onward, up to `limit`.
+    # Compared a chunk at a time, each twice as long as the last, so a short
+    # match costs little even when the songs are long.
+    length = 0
+    while length < limit:
+        size = min(step, limit - length)
+        differ = np.flatnonzero(flat[a + length:a + length + size] != flat[b + length:b + length + size])
+        if len(differ):
+            return length + int(differ[0])
+        length += size
+        step *= 2
+
+    return limit
+
+
+def find_repeats(songs, window=REPEAT_WINDOW_WRITES):
+    # Every window of `window` writes (register, value, and wait all have to
+    # match) from every song goes into one table, keyed by hash, and each
+    # window is matched with the last window before it that had the same
+    # contents. A section starts at the first matched window not already
+    # covered, and runs for as long as the writes after it keep matching the
+    # writes after its source, so a copy is one section even where some later
+    # copy of the source would have been the last match. A phrase played four
+    # times in a row comes out as one section that overlaps its own source,
+    # which is exactly what a loop is. Sections in the same song never
+    # overlap; where the next one starts inside the last, it is cut short, and
+    # dropped if that leaves less than a window.
+    tokens = [records.view('<u4').astype(np.uint64) for records in songs]
+    hashes = [window_hashes(t, window) for t in tokens]
+    counts = np.array([len(h) for h in hashes])
+    if counts.sum() == 0:
+        return np.zeros(0, dtype=REPEAT_DTYPE)
+
+    song = np.repeat(np.arange(len(songs)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    hashes = np.concatenate(hashes)
+
+    # Equal hashes end up next to each other, still in stream order
+    order = np.argsort(hashes, kind='stable')
+    group_start = np.concatenate(([True], hashes[order][1:] != hashes[order][:-1]))
+    source = np.empty_like(order)
+    source[order] = np.where(group_start, order, np.roll(order, 1))
+
+    # Don't trust the hash alone; compare the writes themselves
+    flat = np.concatenate(tokens)
+    token_starts = np.concatenate(([0], np.cumsum([len(t) for t in tokens])))
+    windows = np.lib.stride_tricks.sliding_window_view(flat, window)
+    position = token_starts[song] + offset
+    matched = (source != np.arange(len(source)))
+    candidates = np.flatnonzero(matched)
+    matched[candidates] = (windows[position[candidates]] == windows[position[source[candidates]]]).all(axis=1)
+    candidates = np.flatnonzero(matched)
+
+    sections = []
+    covered_end = -1  # Token position where the last section ended
+    k = 0
+    while k < len(candidates):
+        i = candidates[k]
+        j = source[i]
+        start, source_start = position[i], position[j]
+        length = match_length(
+            flat, start, source_start,
+            min(token_starts[song[i] + 1] - start, token_starts[song[j] + 1] - source_start),
+            2 * window)
+
+        # Every window up to the one holding the first mismatch is covered
+        k = np.searchsorted(candidates, i + length - window + 1)
+
+        # Sections are found in stream order, so only the last one can overlap
+        cut = max(covered_end - start, 0)
+        if length - cut >= window:
+            sections.append((i, j, cut, length - cut))
+            covered_end = start + length
+
+    sections = np.array(sections, dtype=np.int64).reshape(-1, 4)
+    firsts, sources, cuts, lengths = sections.T
+
+    # Each song's times, with one extra at the end for when its last wait is
+    # over, all in one array
+    times = np.concatenate([
+        np.concatenate(([0], np.cumsum(records['wait'], dtype=np.int64))) for records in songs])
+    time_starts = token_starts + np.arange(len(songs) + 1)
+
+    repeats = np.zeros(len(sections), dtype=REPEAT_DTYPE)
+    repeats['music'] = song[firsts]
+    repeats['offset'] = offset[firsts] + cuts
+    repeats['writes'] = lengths
+    repeats['source_music'] = song[sources]
+    repeats['source_offset'] = offset[sources] + cuts
+
+    at = time_starts[repeats['music']] + repeats['offset']
+    repeats['time'] = times[at]
+    repeats['cycles'] = times[at + repeats['writes']] - times[at]
+    repeats['source_time'] = times[time_starts[repeats['source_music']] + repeats['source_offset']]
+
+    return repeats
+
+
+def parse_music_data(dirname, window=REPEAT_WINDOW_WRITES):
     music_db = MusicDB()
+    songs = []
 
     for filename in datalib.defs.music_file_iterator(dirname):
         music_name = datalib.defs.normalize_groupent_name(os.path.basename(filename))
@@ -60,20 +415,18 @@ def parse_music_data(dirname):
         with open(filename, 'rb') as f:
             data = f.read()
 
-        cycles = 0
-        writes = 0
-        pos = 0
-        while True:
-            if pos >= len(data):
-                break
+        if len(data) % MUSIC_DTYPE.itemsize != 0:
+            raise ValueError(
+                f'{filename} is {len(data)} bytes, expected a multiple of {MUSIC_DTYPE.itemsize}')
 
-            # vals = int.from_bytes(data[pos + 0:pos + 1], byteorder='little')
-            wait = int.from_bytes(data[pos + 2:pos + 4], byteorder='little')
+        records = np.frombuffer(data, dtype=MUSIC_DTYPE)
+        events, instruments, percussion = decode_notes(records)
+        songs.append(records)
 
-            cycles += wait
-            writes += 1
-            pos += 4
+        music_db.insert(
+            music_name, int(records['wait'].sum(dtype=np.int64)), len(records),
+            events, instruments, percussion)
 
-        music_db.insert(music_name, cycles, writes)
+    music_db.insert_repeats(find_repeats(songs, window))
 
     return music_db
@@ -0,0 +1,227 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+import numpy as np
+
+import datalib.backdrop
+import datalib.defs
+import datalib.image
+import datalib.map
+
+# COLORS values, which are also the EGA default palette register numbers
+BLACK = 0
+BLUE = 1
+GREEN = 2
+RED = 4
+MAGENTA = 5
+LIGHTGRAY = 7
+DARKGRAY = 8
+LIGHTBLUE = 9
+LIGHTGREEN = 10
+LIGHTRED = 12
+LIGHTMAGENTA = 13
+YELLOW = 14
+WHITE = 15
+
+PALETTE_KEY_INDEX = MAGENTA
+FRAME_DELAY = Fraction(13, 140)  # Game loop waits 13 ticks of the 140 Hz timer
+
+# Tables from AnimatePalette(), keyed by PAL_ANIM_* value
+PALETTE_TABLES = {
+    2: [
+        RED, RED, LIGHTRED, LIGHTRED, YELLOW, YELLOW, WHITE, WHITE,
+        YELLOW, YELLOW, LIGHTRED, LIGHTRED],
+    3: [
+        BLACK, BLACK, RED, RED, LIGHTRED, RED, RED,
+        BLACK, BLACK, GREEN, GREEN, LIGHTGREEN, GREEN, GREEN,
+        BLACK, BLACK, BLUE, BLUE, LIGHTBLUE, BLUE, BLUE],
+    4: [BLACK, BLACK, DARKGRAY, LIGHTGRAY, WHITE, LIGHTGRAY, DARKGRAY],
+    5: [WHITE, WHITE, WHITE, WHITE, WHITE, WHITE, RED, LIGHTMAGENTA]
+}
+PAL_ANIM_LIGHTNING = 1
+PAL_ANIM_EXPLOSIONS = 6
+ANIMATED_IDS = {PAL_ANIM_LIGHTNING, PAL_ANIM_EXPLOSIONS, *PALETTE_TABLES}
+
+LIGHTNING_FRAMES = 110  # About ten seconds of gameplay
+LIGHTNING_CHANCE = 1500  # Out of Turbo C's RAND_MAX + 1 (32,768)
+
+# paletteColors[] in DrawExplosions(), after a short idle stretch to show the
+# key color at rest. `age` runs from 1 to 8 and indexes it with `age - 1`, so
+# all but the ninth and final black are used.
+EXPLOSION_IDLE_FRAMES = 8
+EXPLOSION_TABLE = [WHITE, YELLOW, WHITE, BLACK, YELLOW, WHITE, YELLOW, BLACK]
+
+# One extra palette entry, fully transparent, for pixels a frame leaves alone
+TRANSPARENT_INDEX = 16
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'palanim', help='render animated PNG previews of map palette animations')
+    parser.add_argument(
+        '-d', dest='dirname', required=True, metavar='DIR',
+        help='path containing all expected map and backdrop .MNI files')
+    parser.add_argument(
+        '-o', dest='outdir', required=True, metavar='DIR',
+        help='path where the animated PNG images will be written')
+    parser.add_argument(
+        '-k', dest='cachedir', metavar='DIR',
+        help='path to keep decoded backdrop scroll variants between runs')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_palette_animation_data(args.dirname, args.outdir, args.cachedir)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class PaletteAnimationDB:
+    def __init__(self):
+        self.table = []
+
+    def insert(self, row):
+        self.table.append(row)
+
+    def to_dict(self):
+        return {
+            'table': sorted(
+                self.table, key=lambda row: (row['palette_animation_id'], row['backdrop_id'])),
+            'index': {},
+            'sort': {}
+        }
+
+
+def key_color_sequence(palette_animation_id, seed=0):
+    # The color the key palette register holds on each successive frame.
+    if palette_animation_id == PAL_ANIM_LIGHTNING:
+        rng = random.Random(seed)
+        colors = []
+        state = 0
+        for _ in range(LIGHTNING_FRAMES):
+            if state == 2:
+                colors.append(DARKGRAY)
+                state = 0
+            elif state == 1:
+                colors.append(LIGHTGRAY)
+                state = 2
+            elif rng.randrange(32768) < LIGHTNING_CHANCE:
+                colors.append(WHITE)
+                state = 1
+            else:
+                colors.append(BLACK)
+        return colors
+
+    if palette_animation_id == PAL_ANIM_EXPLOSIONS:
+        return [BLACK] * EXPLOSION_IDLE_FRAMES + EXPLOSION_TABLE
+
+    # StepPalette() increments before it reads, so the cycle starts at entry 1
+    table = PALETTE_TABLES[palette_animation_id]
+    return table[1:] + table[:1]
+
+
+def collapse_runs(colors):
+    # Consecutive frames with the same key color are one APNG frame held longer
+    runs = []
+    for color in colors:
+        if runs and runs[-1][0] == color:
+            runs[-1][1] += 1
+        else:
+            runs.append([color, 1])
+
+    return runs
+
+
+def build_frames(image, colors):
+    # Every frame is the same indexed image with the key color remapped. Only
+    # key pixels ever change, so after the first frame, each one covers just
+    # the bounding box of those pixels, with everything else transparent.
+    key_mask = image == PALETTE_KEY_INDEX
+    runs = collapse_runs(colors)
+
+    remap = np.arange(16, dtype=np.uint8)
+    remap[PALETTE_KEY_INDEX] = runs[0][0]
+    frames = [(remap[image], 0, 0, FRAME_DELAY * runs[0][1])]
+
+    if not key_mask.any():
+        return frames[:1]
+
+    rows = np.flatnonzero(key_mask.any(axis=1))
+    cols = np.flatnonzero(key_mask.any(axis=0))
+    top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    region_mask = key_mask[top:bottom, left:right]
+
+    for color, count in runs[1:]:
+        pixels = np.where(region_mask, np.uint8(color), np.uint8(TRANSPARENT_INDEX))
+        frames.append((pixels, int(left), int(top), FRAME_DELAY * count))
+
+    return frames
+
+
+def render_preview(backdrop_id, palette_animation_id, filename, outdir, cachedir):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    if len(data) != datalib.backdrop.BACKDROP_SIZE:
+        raise ValueError(
+            f'{filename} is {len(data)} bytes, expected {datalib.backdrop.BACKDROP_SIZE}')
+
+    name = datalib.defs.normalize_groupent_name(os.path.basename(filename))
+    image = datalib.backdrop.load_variants(data, cachedir)[0]
+    colors = key_color_sequence(palette_animation_id, seed=backdrop_id)
+    frames = build_frames(image, colors)
+
+    palette = datalib.defs.EGA_PALETTE + [(0, 0, 0)]
+    alpha = [255] * 16 + [0]
+    png_file = f'{name.lower()}-palanim{palette_animation_id}.png'
+    datalib.image.write_apng(os.path.join(outdir, png_file), frames, palette, alpha)
+
+    return {
+        'backdrop_id': backdrop_id,
+        'backdrop_name': name,
+        'palette_animation_id': palette_animation_id,
+        'key_pixel_count': int((image == PALETTE_KEY_INDEX).sum()),
+        'cycle_frames': len(colors),
+        'png_frames': len(frames),
+        'png_file': png_file
+    }
+
+
+def parse_palette_animation_data(dirname, outdir, cachedir=None):
+    palette_animation_db = PaletteAnimationDB()
+
+    os.makedirs(outdir, exist_ok=True)
+    if cachedir is not None:
+        os.makedirs(cachedir, exist_ok=True)
+
+    backdrop_files = list(datalib.defs.backdrop_file_iterator(dirname))
+
+    # Maps sharing a backdrop and animation share one preview
+    map_names = {}
+    for row in datalib.map.parse_map_data(dirname).table:
+        # Zero is no animation; anything else unknown has nothing to preview
+        if row['palette_animation_id'] not in ANIMATED_IDS:
+            continue
+        if row['backdrop_id'] >= len(backdrop_files) or \
+                not backdrop_files[row['backdrop_id']].exists():
+            continue
+        key = (row['backdrop_id'], row['palette_animation_id'])
+        map_names.setdefault(key, []).append(row['map_name'])
+
+    with ProcessPoolExecutor() as executor:
+        futures = {
+            key: executor.submit(
+                render_preview, *key, backdrop_files[key[0]], outdir, cachedir)
+            for key in map_names}
+
+        for key, future in futures.items():
+            row = future.result()
+            row['map_names'] = map_names[key]
+            palette_animation_db.insert(row)
+
+    return palette_animation_db
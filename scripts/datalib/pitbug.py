@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import datalib.defs
+import datalib.map
+import datalib.tileattr
+
+# A player falling out the bottom of the map reads tile rows past the end of
+# the map data, which wrap around to rows 0, 1, 2... The player is only killed
+# once their feet are more than three rows past the last visible row, so that
+# many wrapped rows get checked for something to land on first. See the E2M6
+# bug on the player movement functions page.
+PLAYER_WIDTH = 3  # Tiles tested under the player's feet
+WRAPPED_ROWS = 3
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'pitbug', help='find bottomless pits where the E2M6 wraparound bug can happen')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        '-d', dest='dirname', metavar='DIR',
+        help='path containing all expected map data .MNI files')
+    group.add_argument(
+        '-f', dest='files', nargs='+', metavar='FILE',
+        help='path to one or more map files, e.g. from a mod')
+    parser.add_argument(
+        '-t', dest='tileattr', required=True, metavar='FILE',
+        help='path to the TILEATTR.MNI file')
+    parser.add_argument(
+        '-j', dest='jobs', type=int, default=None, metavar='N',
+        help='number of maps to scan at once')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    if args.files is not None:
+        files = args.files
+    else:
+        files = list(datalib.defs.map_file_iterator(args.dirname))
+
+    db = parse_pit_bug_data(files, args.tileattr, args.jobs)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class PitBugDB:
+    def __init__(self):
+        self.table = []
+
+    def insert(self, row):
+        self.table.append(row)
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'index': {},
+            'sort': {
+                'hit_count': [
+                    row['map_name'] for row in
+                    sorted(self.table, key=lambda row: -row['hit_count']) if row['hit_count']]
+            }
+        }
+
+
+def find_wrap_landings(blocked):
+    # `blocked` is the map's (row, column) "blocks south movement" grid. Every
+    # column position the player could occupy is tested at once: a pit is any
+    # position where nothing under the player's feet blocks on the last visible
+    # row, and it's buggy if a blocking tile is in the same columns of one of
+    # the wrapped rows. Returns the pit positions and, for each buggy one, the
+    # first wrapped row that the player would land on.
+    height = blocked.shape[0]
+    under_feet = np.lib.stride_tricks.sliding_window_view(
+        blocked, PLAYER_WIDTH, axis=1).any(axis=2)
+
+    # Row height - 1 is the garbage row that TestPlayerMove() always lets the
+    # player fall into, so the last row they can fall from is the one above it
+    pits = ~under_feet[height - 2]
+    landings = under_feet[:WRAPPED_ROWS]
+
+    x_tiles = np.flatnonzero(pits & landings.any(axis=0))
+    y_tiles = landings[:, x_tiles].argmax(axis=0)
+
+    return pits, x_tiles, y_tiles
+
+
+def scan_map(filename, block_south):
+    header, _, tiles = datalib.map.read_map_file(filename)
+    grid = datalib.map.tile_grid(header, tiles)
+    height = header.height_tiles
+
+    pits, x_tiles, y_tiles = find_wrap_landings(datalib.tileattr.lookup_flags(grid, block_south))
+
+    return {
+        'map_name': datalib.defs.normalize_groupent_name(os.path.basename(filename)),
+        'width_tiles': header.width_tiles,
+        'height_tiles': height,
+        'pit_count': int(pits.sum()),
+        'hit_count': len(x_tiles),
+        'hits': [
+            {'x_tiles': int(x), 'y_tiles': int(y), 'player_y_tiles': height + int(y)}
+            for x, y in zip(x_tiles, y_tiles)]
+    }
+
+
+def parse_pit_bug_data(files, tileattr, jobs=None):
+    pit_bug_db = PitBugDB()
+
+    masks = datalib.tileattr.flag_masks(datalib.tileattr.read_tile_attributes(tileattr))
+    block_south = masks[:, datalib.tileattr.TILE_FLAGS.index('block_south')]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for row in executor.map(scan_map, files, [block_south] * len(files)):
+            pit_bug_db.insert(row)
+
+    return pit_bug_db
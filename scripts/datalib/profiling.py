@@ -0,0 +1,261 @@
+import contextlib
+import cProfile
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+# Opt-in instrumentation for generate.py. When enabled, a command's run(), its
+# parse_*() functions, the insert*()/to_dict() methods of its DB classes, and
+# JSON serialization are each timed as a phase, with tracemalloc tracking how
+# much memory every phase allocated and peaked at. The file iterators in
+# datalib.defs also report how long was spent on each file they handed out.
+# None of this costs anything when profiling is off, since nothing is wrapped.
+
+ENV_SUMMARY = 'COSMODOC_PROFILE'
+ENV_TRACE = 'COSMODOC_PROFILE_TRACE'
+ENV_STATS = 'COSMODOC_PROFILE_STATS'
+
+TOP_ALLOCATIONS = 10
+TOP_FILES = 20
+
+_active = None
+
+
+def add_arguments(parser):
+    # Each option can also be turned on from the environment, for runs that
+    # go through something else (like a Makefile or hugo) on their way here
+    parser.add_argument(
+        '--profile', action='store_true', default=bool(os.environ.get(ENV_SUMMARY)),
+        help=f'print phase and per-file timings to stderr (or set {ENV_SUMMARY}=1)')
+    parser.add_argument(
+        '--profile-trace', metavar='FILE', default=os.environ.get(ENV_TRACE),
+        help=f'write a Chrome trace event file, for chrome://tracing or Perfetto (or set {ENV_TRACE})')
+    parser.add_argument(
+        '--profile-stats', metavar='FILE', default=os.environ.get(ENV_STATS),
+        help=f'write cProfile stats, for pstats or snakeviz (or set {ENV_STATS})')
+
+
+class Phase:
+    def __init__(self, name, category, args=None):
+        self.name = name
+        self.category = category
+        self.args = args or {}
+        self.start = 0
+        self.end = 0
+        self.mem_start = 0
+        self.mem_end = 0
+        self.mem_peak = 0
+
+    @property
+    def seconds(self):
+        return self.end - self.start
+
+
+class Profiler:
+    def __init__(self, trace=None, stats=None):
+        self.trace = trace
+        self.stats = stats
+        self.phases = []
+        self.stack = []
+        self.snapshot = None
+        self.origin = time.perf_counter()
+        self.cprofile = cProfile.Profile() if stats is not None else None
+
+    def start(self):
+        tracemalloc.start()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.stats)
+        tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def phase(self, name, category='phase', snapshot=False, **args):
+        # tracemalloc only keeps one peak, so it is reset at the start of
+        # every phase, and each phase hands its peak up to its parent when it
+        # ends so the outer phases still see the true high-water mark.
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            self.stack[-1].mem_peak = max(self.stack[-1].mem_peak, peak)
+        tracemalloc.reset_peak()
+
+        phase = Phase(name, category, args)
+        phase.mem_start = phase.mem_peak = current
+        self.stack.append(phase)
+        phase.start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.end = time.perf_counter()
+            phase.mem_end, peak = tracemalloc.get_traced_memory()
+            phase.mem_peak = max(phase.mem_peak, peak)
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1].mem_peak = max(self.stack[-1].mem_peak, phase.mem_peak)
+            self.phases.append(phase)
+
+            if snapshot:
+                # Whatever the phase built is still alive at this point
+                self.snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, __file__),
+                    tracemalloc.Filter(False, contextlib.__file__)])
+
+    def begin_file(self, path):
+        # File phases stay off the stack, since the caller's own phases open
+        # and close while one is suspended in files(). That also means no peak
+        # is tracked for them, only what they allocated overall.
+        phase = Phase(os.path.basename(path), 'file', {'path': str(path)})
+        phase.mem_start = phase.mem_peak = tracemalloc.get_traced_memory()[0]
+        phase.start = time.perf_counter()
+
+        return phase
+
+    def end_file(self, phase):
+        phase.end = time.perf_counter()
+        phase.mem_end = tracemalloc.get_traced_memory()[0]
+        phase.mem_peak = max(phase.mem_start, phase.mem_end)
+        self.phases.append(phase)
+
+    def summary(self):
+        totals = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'allocated': 0, 'peak': 0})
+        for phase in self.phases:
+            if phase.category == 'file':
+                continue
+            entry = totals[phase.name]
+            entry['count'] += 1
+            entry['seconds'] += phase.seconds
+            entry['allocated'] += phase.mem_end - phase.mem_start
+            entry['peak'] = max(entry['peak'], phase.mem_peak - phase.mem_start)
+
+        lines = ['phase                                     count    seconds   alloc KiB    peak KiB']
+        for name, entry in sorted(totals.items(), key=lambda item: -item[1]['seconds']):
+            lines.append(
+                f'{name:40} {entry["count"]:6} {entry["seconds"]:10.4f} '
+                f'{entry["allocated"] / 1024:11.1f} {entry["peak"] / 1024:11.1f}')
+
+        files = [phase for phase in self.phases if phase.category == 'file']
+        if files:
+            lines.append('')
+            lines.append('file                                             seconds   alloc KiB')
+            for phase in sorted(files, key=lambda phase: -phase.seconds)[:TOP_FILES]:
+                lines.append(
+                    f'{phase.name:46} {phase.seconds:10.4f} '
+                    f'{(phase.mem_end - phase.mem_start) / 1024:11.1f}')
+            if len(files) > TOP_FILES:
+                lines.append(f'... and {len(files) - TOP_FILES} more in the trace file')
+
+        if self.snapshot is not None:
+            lines.append('')
+            lines.append('largest live allocations after parsing:')
+            for stat in self.snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                lines.append(f'  {stat}')
+
+        return '\n'.join(lines)
+
+    def write_trace(self):
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = [
+            {
+                'name': phase.name,
+                'cat': phase.category,
+                'ph': 'X',
+                'ts': (phase.start - self.origin) * 1e6,
+                'dur': phase.seconds * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': dict(
+                    phase.args,
+                    allocated_bytes=phase.mem_end - phase.mem_start,
+                    peak_bytes=phase.mem_peak - phase.mem_start)
+            } for phase in self.phases]
+
+        with open(self.trace, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def phase(name, **kwargs):
+    if _active is None:
+        return contextlib.nullcontext()
+
+    return _active.phase(name, **kwargs)
+
+
+def files(paths):
+    # Passes paths through unchanged, timing each one from when it is handed
+    # out until the caller asks for the next (or stops asking)
+    if _active is None:
+        yield from paths
+        return
+
+    for path in paths:
+        phase = _active.begin_file(path)
+        try:
+            yield path
+        finally:
+            _active.end_file(phase)
+
+
+def _wrap(func, name, **kwargs):
+    @functools.wraps(func)
+    def wrapper(*args, **kw):
+        with _active.phase(name, **kwargs):
+            return func(*args, **kw)
+
+    return wrapper
+
+
+def instrument(module):
+    # Only the command being run gets wrapped, and only for this process
+    prefix = module.__name__.rsplit('.', 1)[-1]
+
+    for attr, value in list(vars(module).items()):
+        if inspect.isfunction(value) and value.__module__ == module.__name__:
+            if attr == 'run':
+                setattr(module, attr, _wrap(value, f'{prefix}.run'))
+            elif attr.startswith('parse_'):
+                setattr(module, attr, _wrap(value, f'{prefix}.{attr}', snapshot=True))
+        elif inspect.isclass(value) and value.__module__ == module.__name__ and hasattr(value, 'to_dict'):
+            for method in ('insert', 'insert_batch', 'to_dict'):
+                if method in vars(value):
+                    setattr(value, method, _wrap(vars(value)[method], f'{value.__name__}.{method}'))
+
+
+def start(args):
+    global _active
+
+    if not (args.profile or args.profile_trace or args.profile_stats):
+        return False
+
+    import datalib.defs
+
+    _active = Profiler(trace=args.profile_trace, stats=args.profile_stats)
+    datalib.defs.json_minidumps = _wrap(datalib.defs.json_minidumps, 'serialize')
+
+    module = sys.modules[args.command_func.__module__]
+    if module.__name__.startswith('datalib.'):
+        instrument(module)
+        args.command_func = module.run
+
+    _active.start()
+
+    return True
+
+
+def finish(args):
+    _active.stop()
+
+    if args.profile:
+        print(_active.summary(), file=sys.stderr)
+
+    if args.profile_trace is not None:
+        _active.write_trace()
@@ -0,0 +1,158 @@
+import numpy as np
+
+import datalib.defs
+import datalib.tileattr
+
+# Rough approximation of where the player can get to in a map, for statistics
+# only. The player is tracked as the single tile under their feet (the bottom-
+# left tile of the sprite, same as actor positions), with the rest of the body
+# only used to rule out spaces they can't fit into. Everything works on whole
+# boolean (row, column) grids at once: each pass of the flood fill walks,
+# falls, and jumps from every reached cell together, and repeats until nothing
+# new is reached. Things like pipes, platforms, transporters, doors, and
+# clinging to walls are not modeled.
+
+PLAYER_WIDTH = 3
+PLAYER_HEIGHT = 5
+JUMP_HEIGHT = 4  # Tiles; approximate, from a standing start with jump held
+PLAYER_TYPE = 0
+
+
+def shift(grid, dy, dx):
+    # Moves every cell by (dy, dx), filling in from the edges with False
+    out = np.zeros_like(grid)
+    height, width = grid.shape
+    out[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+        grid[max(-dy, 0):height + min(-dy, 0), max(-dx, 0):width + min(-dx, 0)]
+
+    return out
+
+
+def box_any(grid, height, width):
+    # True where any cell in the `height` x `width` box with its bottom-left
+    # corner here is True. Cells near the edge only look at what's in the map.
+    padded = np.pad(grid, ((height - 1, 0), (0, width - 1)))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (height, width))
+
+    return windows.any(axis=(2, 3))
+
+
+def movement_masks(grid, tile_masks):
+    flags = datalib.tileattr.lookup_flags(grid, tile_masks)
+    block = {
+        name: flags[..., datalib.tileattr.TILE_FLAGS.index(f'block_{name}')]
+        for name in ('south', 'north', 'west', 'east')}
+
+    # Only tiles that block every direction are treated as walls for the
+    # purposes of fitting the player's body in somewhere
+    solid = block['south'] & block['north'] & block['west'] & block['east']
+    fits = ~box_any(solid, PLAYER_HEIGHT, PLAYER_WIDTH)
+
+    return {
+        'supported': shift(block['south'], -1, 0),
+        'enter_south': fits & ~block['south'],
+        'enter_north': fits & ~block['north'],
+        'enter_west': fits & ~block['west'],
+        'enter_east': fits & ~block['east']
+    }
+
+
+def sweep(reached, passable, axis):
+    # From every reached cell, continue in the positive direction along `axis`
+    # for as long as the cells are passable, all at once: cells are numbered
+    # by how many impassable cells come before them, and a cell is filled if
+    # the most recent reached cell before it has the same number.
+    segment = np.cumsum(~passable, axis=axis)
+    marks = np.where(reached, segment, -1)
+
+    return (np.maximum.accumulate(marks, axis=axis) == segment) & passable
+
+
+def walk(standing, masks):
+    east = sweep(standing, masks['enter_east'] & masks['supported'], axis=1)
+    west = sweep(standing[:, ::-1], (masks['enter_west'] & masks['supported'])[:, ::-1], axis=1)[:, ::-1]
+
+    # One more step off the end of each run, where the player walks off a ledge
+    edge_east = shift(standing | east, 0, 1) & masks['enter_east']
+    edge_west = shift(standing | west, 0, -1) & masks['enter_west']
+
+    return east | west | edge_east | edge_west
+
+
+def jump(standing, masks):
+    reached = np.zeros_like(standing)
+    layer = standing
+    for _ in range(JUMP_HEIGHT):
+        up = shift(layer, -1, 0) & masks['enter_north']
+        layer = up | (shift(up, 0, 1) & masks['enter_east']) | (shift(up, 0, -1) & masks['enter_west'])
+        reached |= layer
+
+    return reached
+
+
+def fall(airborne, masks):
+    straight = sweep(airborne, masks['enter_south'], axis=0)
+
+    # Steering while falling: one tile over for every tile down
+    drift = shift(shift(airborne, 0, 1) & masks['enter_east'], 1, 0) | \
+        shift(shift(airborne, 0, -1) & masks['enter_west'], 1, 0)
+
+    return straight | (drift & masks['enter_south'])
+
+
+def flood_fill(start, masks):
+    reached = start.copy()
+    while True:
+        standing = reached & masks['supported']
+        airborne = reached & ~masks['supported']
+        grown = reached | walk(standing, masks) | jump(standing, masks) | fall(airborne, masks)
+
+        if (grown == reached).all():
+            return reached
+        reached = grown
+
+
+def body_cover(reached):
+    # Every tile the player's body covers from any of the reached positions
+    cover = np.zeros_like(reached)
+    for dy in range(PLAYER_HEIGHT):
+        for dx in range(PLAYER_WIDTH):
+            cover |= shift(reached, -dy, dx)
+
+    return cover
+
+
+def reachability_stats(grid, actor_records, tile_masks):
+    masks = movement_masks(grid, tile_masks)
+
+    players = actor_records[actor_records['type'] == PLAYER_TYPE]
+    if len(players) == 0:
+        return None
+
+    # Positions past the edge of the map (junk data, usually) are pulled back
+    # onto its last row or column
+    start = np.zeros(grid.shape, dtype=bool)
+    start[
+        np.minimum(players['y_tiles'][0], grid.shape[0] - 1),
+        np.minimum(players['x_tiles'][0], grid.shape[1] - 1)] = True
+    reached = flood_fill(start, masks)
+    cover = body_cover(reached)
+
+    actors = actor_records[actor_records['type'] >= datalib.defs.FIRST_REAL_ACTOR_TYPE]
+    hit = cover[
+        np.minimum(actors['y_tiles'], grid.shape[0] - 1),
+        np.minimum(actors['x_tiles'], grid.shape[1] - 1)]
+
+    return {
+        'position_count': int(reached.sum()),
+        'covered_tile_count': int(cover.sum()),
+        'covered_percent': round(100 * float(cover.mean()), 2),
+        'actor_count': len(actors),
+        'reachable_actor_count': int(hit.sum()),
+        'unreachable_actors': [
+            {
+                'actor_type': int(act['type']) - datalib.defs.FIRST_REAL_ACTOR_TYPE,
+                'x_tiles': int(act['x_tiles']),
+                'y_tiles': int(act['y_tiles'])
+            } for act in actors[~hit]]
+    }
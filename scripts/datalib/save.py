@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+
+import datalib.defs
+
+# Fields that feed the "altered file" checksum at the end of every save
+CHECKSUM_FIELDS = ['health', 'stars', 'level_num', 'bombs', 'max_health']
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'save', help='generate a database of saved game files')
+    parser.add_argument(
+        '-f', dest='files', required=True, nargs='+', metavar='FILE',
+        help='path to one or more COSMOx.SV? files')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_save_data(args.files)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class SaveDB:
+    def __init__(self):
+        self.table = []
+        self.records = None
+
+    def insert_batch(self, names, records, raw):
+        self.records = records
+
+        # Re-encode everything and compare, to prove the files can be rewritten
+        size = datalib.defs.SAVE_SCHEMA.size
+        original = np.frombuffer(raw, dtype=np.uint8).reshape(-1, size)
+        encoded = np.frombuffer(encode_saves(records), dtype=np.uint8).reshape(-1, size)
+        round_trip = (original == encoded).all(axis=1)
+        valid = expected_checksums(records) == records['checksum']
+
+        for i, name in enumerate(names):
+            row = {'save_name': name}
+            row.update({field: int(records[field][i]) for field in records.dtype.names})
+            row['checksum_valid_flag'] = int(valid[i])
+            row['round_trip_flag'] = int(round_trip[i])
+            self.table.append(row)
+
+    def build_summary(self):
+        records = self.records
+        levels, counts = np.unique(records['level_num'], return_counts=True)
+
+        return {
+            'save_count': len(records),
+            'invalid_checksum_count': int((expected_checksums(records) != records['checksum']).sum()),
+            'used_cheat_count': int(records['used_cheat_flag'].astype(bool).sum()),
+            'max_score': int(records['score'].max()) if len(records) else 0,
+            'level_num_histogram': [
+                {'level_num': int(level), 'count': int(count)}
+                for level, count in zip(levels, counts)]
+        }
+
+    def to_dict(self):
+        return {
+            'table': self.table,
+            'index': {},
+            'sort': {},
+            'summary': self.build_summary()
+        }
+
+
+def expected_checksums(records):
+    total = sum(records[field].astype(np.uint32) for field in CHECKSUM_FIELDS)
+
+    return (total & 0xFFFF).astype(np.uint16)
+
+
+def encode_saves(records):
+    return datalib.defs.SAVE_SCHEMA.pack_many(records)
+
+
+def parse_save_data(files):
+    save_db = SaveDB()
+    size = datalib.defs.SAVE_SCHEMA.size
+
+    names = []
+    chunks = []
+    for filename in files:
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        if len(data) != size:
+            raise ValueError(f'{filename} is {len(data)} bytes, expected {size}')
+
+        names.append(os.path.basename(filename))
+        chunks.append(data)
+
+    raw = b''.join(chunks)
+    save_db.insert_batch(names, datalib.defs.SAVE_SCHEMA.unpack_many(raw), raw)
+
+    return save_db
@@ -0,0 +1,52 @@
+import functools
+import struct
+
+# Compiles a fixed binary record layout, given as (name, struct code) pairs,
+# into a struct.Struct for one record at a time and an equivalent NumPy dtype
+# for decoding whole batches of records in one call. Both are little-endian and
+# unpadded, like the game's own data. NumPy is only imported once a dtype is
+# actually needed, so the schemas in datalib.defs cost nothing to define.
+
+NUMPY_CODES = {
+    'B': 'u1', 'b': 'i1',
+    'H': '<u2', 'h': '<i2',
+    'I': '<u4', 'i': '<i4'
+}
+
+
+class Schema:
+    def __init__(self, fields):
+        self.names = [name for name, _ in fields]
+        self.fields = fields
+        self.struct = struct.Struct('<' + ''.join(code for _, code in fields))
+
+    @functools.cached_property
+    def dtype(self):
+        import numpy as np
+
+        dtype = np.dtype([(name, NUMPY_CODES[code]) for name, code in self.fields])
+        if self.struct.size != dtype.itemsize:
+            raise ValueError('struct and dtype layouts disagree')
+
+        return dtype
+
+    @property
+    def size(self):
+        return self.struct.size
+
+    def unpack(self, data, offset=0):
+        return dict(zip(self.names, self.struct.unpack_from(data, offset)))
+
+    def pack(self, record):
+        return self.struct.pack(*(record[name] for name in self.names))
+
+    def unpack_many(self, data):
+        # `data` is any number of back-to-back records
+        import numpy as np
+
+        return np.frombuffer(data, dtype=self.dtype)
+
+    def pack_many(self, records):
+        import numpy as np
+
+        return np.ascontiguousarray(records, dtype=self.dtype).tobytes()
@@ -0,0 +1,199 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+import datalib.defs
+import datalib.map
+import datalib.music
+
+# Deterministic generators for synthetic game files, in the same formats and
+# under the same names the real ones use, so every parser can be pointed at
+# them unmodified. The contents are random but structurally valid; nothing
+# here tries to make a level playable or a song listenable. Each file gets its
+# own random stream derived from the seed and the file's position in the
+# corpus, so changing one size knob doesn't reshuffle everything else.
+
+MAP_WIDTHS = [64, 128, 256, 512]
+MAP_TILE_WORDS = 32764
+SOLID_TILE_COUNT = 2000
+MASKED_TILE_COUNT = 1000
+MASKED_TILE_BASE = 16000
+MASKED_TILE_STEP = 40
+
+SOUND_COUNT = 24
+SOUND_HEADER_SIZE = 16
+SOUND_ENTRY_SIZE = 16
+SOUND_END = 0xFFFF
+
+INFO_ENTRY_DTYPE = np.dtype([
+    ('height_tiles', '<u2'), ('width_tiles', '<u2'), ('frame_offset_bytes', '<u4')])
+INFO_SEGMENT_BYTES = 0xFFFF
+
+CORPUS_MANIFEST = 'corpus.json'
+
+
+def file_rng(seed, *key):
+    return np.random.default_rng([seed, *key])
+
+
+def map_bytes(rng, actor_count):
+    width = int(rng.choice(MAP_WIDTHS))
+    header = datalib.defs.MapHeaderStruct(
+        backdrop_id=int(rng.integers(0, 27)),
+        rain_flag=int(rng.integers(0, 2)),
+        backdrop_hscroll_flag=int(rng.integers(0, 2)),
+        backdrop_vscroll_flag=int(rng.integers(0, 2)),
+        palette_animation_id=int(rng.integers(0, 6)),
+        music_id=int(rng.integers(0, len(datalib.defs.MUSIC_FILES))),
+        width_tiles=width,
+        actor_size_words=actor_count * 3)
+
+    # One player, then a mix of special and real actor types
+    actors = np.zeros(actor_count, dtype=datalib.map.ACTOR_DTYPE)
+    actors['type'] = rng.integers(1, datalib.defs.FIRST_REAL_ACTOR_TYPE + 240, actor_count)
+    actors['type'][0] = 0
+    actors['x_tiles'] = rng.integers(0, width, actor_count)
+    actors['y_tiles'] = rng.integers(0, 0x8000 // width, actor_count)
+
+    # Mostly empty space, some solid tiles, a few masked ones
+    kind = rng.choice(3, MAP_TILE_WORDS, p=[0.6, 0.3, 0.1])
+    tiles = np.where(
+        kind == 1, rng.integers(0, SOLID_TILE_COUNT, MAP_TILE_WORDS) * 8,
+        np.where(
+            kind == 2,
+            MASKED_TILE_BASE + rng.integers(0, MASKED_TILE_COUNT, MAP_TILE_WORDS) * MASKED_TILE_STEP,
+            0)).astype('<u2')
+
+    return bytes(header) + actors.tobytes() + tiles.tobytes()
+
+
+def music_bytes(rng, record_count):
+    # Leading null record like the real files, then notes made of three
+    # writes each: frequency low byte, key on with block/frequency high bits,
+    # and key off after a delay.
+    note_count = max(record_count - 1, 0) // 3
+    channels = rng.integers(0, datalib.defs.OPL_CHANNELS, note_count)
+    fnums = rng.integers(0x100, 0x400, note_count)
+    blocks = rng.integers(1, 7, note_count)
+
+    records = np.zeros(1 + (note_count * 3), dtype=datalib.music.MUSIC_DTYPE)
+    notes = records[1:].reshape(note_count, 3)
+    notes['register'] = np.stack((0xA0 + channels, 0xB0 + channels, 0xB0 + channels), axis=1)
+    notes['value'][:, 0] = fnums & 0xFF
+    notes['value'][:, 1] = 0x20 | (blocks << 2) | (fnums >> 8)
+    notes['value'][:, 2] = (blocks << 2) | (fnums >> 8)
+    notes['wait'][:, 1] = rng.choice([0, 0, 7, 14, 28], note_count)
+    notes['wait'][:, 2] = rng.integers(0, 4, note_count)
+
+    return records.tobytes()
+
+
+def sound_bytes(rng, sound_words):
+    data_size = SOUND_COUNT * (sound_words + 1) * 2
+    size = SOUND_HEADER_SIZE + (SOUND_COUNT * SOUND_ENTRY_SIZE) + data_size
+    if size > 0xFFFF:
+        raise ValueError(f'{sound_words} words per sound makes a {size} byte file, limit is 65535')
+
+    header = datalib.defs.SoundHeaderStruct(
+        magic=b'SND\0', size_bytes=size, num_sounds=SOUND_COUNT, data1=0x32)
+
+    table = b''
+    data = b''
+    offset = SOUND_HEADER_SIZE + (SOUND_COUNT * SOUND_ENTRY_SIZE)
+    for i in range(SOUND_COUNT):
+        # Tones, with the occasional rest (zero)
+        words = rng.integers(0x0100, 0x2000, sound_words + 1).astype('<u2')
+        words[rng.random(sound_words + 1) < 0.1] = 0
+        words[-1] = SOUND_END
+
+        table += bytes(datalib.defs.SoundEntryStruct(
+            offset_bytes=offset + len(data),
+            priority=int(rng.integers(0, 256)),
+            rate=8,
+            name=f'SYNTH{i}'.encode()))
+        data += words.tobytes()
+
+    return bytes(header) + table + data
+
+
+def info_bytes(rng, type_count, frame_count):
+    header_size = type_count * 2
+    list_size = frame_count * INFO_ENTRY_DTYPE.itemsize
+    if header_size + (type_count * list_size) > 0x1FFFE:
+        raise ValueError('INFO file too large for word offsets')
+
+    offsets = (header_size + (np.arange(type_count) * list_size)) // 2
+
+    entries = np.zeros(type_count * frame_count, dtype=INFO_ENTRY_DTYPE)
+    entries['height_tiles'] = rng.integers(1, 9, len(entries))
+    entries['width_tiles'] = rng.integers(1, 9, len(entries))
+
+    # True offsets into the tile image file, stored the segmented way
+    sizes = entries['height_tiles'].astype(np.int64) * entries['width_tiles'] * 40
+    true_offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    segments = true_offsets // INFO_SEGMENT_BYTES
+    entries['frame_offset_bytes'] = (segments << 16) | (true_offsets % INFO_SEGMENT_BYTES)
+
+    return offsets.astype('<u2').tobytes() + entries.tobytes()
+
+
+def actor_source(rng, type_count, padding_lines):
+    lines = ['void CreateActorAtIndex(word index, word actor_type, word xpos, word ypos)', '{', '    switch (actor_type) {']
+    for actor_type in range(type_count):
+        lines.append(f'    case {actor_type}:')
+        lines.extend(f'        /* padding {i} */' for i in range(padding_lines))
+        lines.append(
+            f'        CreateActor({int(rng.integers(0, 200))}, xpos, ypos - {int(rng.integers(0, 3))}, '
+            f'{int(rng.integers(0, 2))}, {int(rng.integers(0, 2))}, {int(rng.integers(0, 2))}, '
+            f'{int(rng.integers(0, 2))}, ActSynth{actor_type}, {int(rng.integers(0, 10))}, type, 0, 0, 0);')
+        lines.append('        break;')
+    lines.extend(['    }', '}', ''])
+
+    return '\n'.join(lines)
+
+
+def write_corpus(outdir, seed=0, map_sets=1, actor_count=200, music_records=10000,
+                 sound_sets=1, sound_words=200, sprite_types=300, sprite_frames=20,
+                 actor_types=300, actor_padding=10):
+    # Layout, with each `set` directory holding one complete, normally named
+    # collection of files that the directory-based parsers can read as-is:
+    #     actor/ACTORS.C  map/NNNN/*.MNI  music/*.MNI  sound/NNNN/*.MNI  sprite/ACTRINFO.MNI
+    outdir = Path(outdir)
+    manifest = {
+        'seed': seed,
+        'params': {
+            'map_sets': map_sets, 'actor_count': actor_count, 'music_records': music_records,
+            'sound_sets': sound_sets, 'sound_words': sound_words, 'sprite_types': sprite_types,
+            'sprite_frames': sprite_frames, 'actor_types': actor_types, 'actor_padding': actor_padding},
+        'files': {}
+    }
+
+    def write(kind, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        entry = manifest['files'].setdefault(kind, {'count': 0, 'bytes': 0})
+        entry['count'] += 1
+        entry['bytes'] += len(data)
+
+    source = actor_source(file_rng(seed, 0), actor_types, actor_padding)
+    write('actor', outdir / 'actor' / 'ACTORS.C', source.encode())
+
+    for s in range(map_sets):
+        for i, name in enumerate(datalib.defs.MAP_FILES):
+            write('map', outdir / 'map' / f'{s:04}' / name, map_bytes(file_rng(seed, 1, s, i), actor_count))
+
+    for i, name in enumerate(datalib.defs.MUSIC_FILES):
+        write('music', outdir / 'music' / name, music_bytes(file_rng(seed, 2, i), music_records))
+
+    for s in range(sound_sets):
+        for i, name in enumerate(datalib.defs.SOUND_FILES):
+            write('sound', outdir / 'sound' / f'{s:04}' / name, sound_bytes(file_rng(seed, 3, s, i), sound_words))
+
+    write('sprite', outdir / 'sprite' / 'ACTRINFO.MNI',
+          info_bytes(file_rng(seed, 4), sprite_types, sprite_frames))
+
+    with open(outdir / CORPUS_MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
@@ -0,0 +1,119 @@
+import numpy as np
+
+import datalib.defs
+
+# Bit positions in each attribute byte, least significant first. Names follow
+# the TILE_*() macros in the game.
+TILE_FLAGS = [
+    'block_south', 'block_north', 'block_west', 'block_east',
+    'slippery', 'in_front', 'sloped', 'can_cling']
+
+SOLID_TILE_COUNT = 2000
+MASKED_TILE_COUNT = 1000
+MASKED_TILE_STRIDE = 5  # Masked tile attributes are padded out to 5 bytes each
+TILEATTR_SIZE = SOLID_TILE_COUNT + (MASKED_TILE_COUNT * MASKED_TILE_STRIDE)
+
+# Map tile values are indexed by tile value / 8, whether solid or masked
+TILE_VALUE_SCALE = 8
+
+
+def register_parser(parent):
+    parser = parent.add_parser(
+        'tileattr', help='generate the tile attribute database')
+    parser.add_argument(
+        '-f', dest='file', required=True, metavar='FILE',
+        help='path to the TILEATTR.MNI file')
+    parser.add_argument(
+        '-b', dest='binfile', metavar='FILE',
+        help='also write the attribute bytes and flag masks as a NumPy .npz file')
+    parser.set_defaults(command_func=run)
+
+
+def run(args):
+    db = parse_tile_attribute_data(args.file)
+
+    if args.binfile is not None:
+        db.save(args.binfile)
+
+    print(datalib.defs.json_minidumps(db.to_dict()))
+
+
+###############################################################################
+
+
+class TileAttributeDB:
+    def __init__(self, attributes):
+        self.attributes = attributes
+        self.masks = flag_masks(attributes)
+
+        # Only the bytes that a map tile value can actually land on
+        self.meaningful = np.zeros(TILEATTR_SIZE, dtype=bool)
+        self.meaningful[:SOLID_TILE_COUNT] = True
+        self.meaningful[SOLID_TILE_COUNT::MASKED_TILE_STRIDE] = True
+
+    def save(self, binfile):
+        np.savez_compressed(
+            binfile, attributes=self.attributes,
+            **{flag: self.masks[:, i] for i, flag in enumerate(TILE_FLAGS)})
+
+    def to_dict(self):
+        indexes = np.flatnonzero(self.meaningful)
+        tile_values = indexes * TILE_VALUE_SCALE
+        attributes = self.attributes[indexes]
+
+        behaviors, counts = np.unique(attributes, return_counts=True)
+        order = np.argsort(-counts, kind='stable')
+
+        return {
+            'table': [
+                {'tile_value': int(value), 'attributes': int(attrs)}
+                for value, attrs in zip(tile_values, attributes)],
+            'index': {
+                flag: tile_values[self.masks[indexes, i]].tolist()
+                for i, flag in enumerate(TILE_FLAGS)},
+            'sort': {},
+            'summary': {
+                'flag_counts': {
+                    flag: int(self.masks[indexes, i].sum())
+                    for i, flag in enumerate(TILE_FLAGS)},
+                'behaviors': [
+                    {'attributes': int(behaviors[i]), 'count': int(counts[i])}
+                    for i in order]
+            }
+        }
+
+
+def read_tile_attributes(filename):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    if len(data) != TILEATTR_SIZE:
+        raise ValueError(f'{filename} is {len(data)} bytes, expected {TILEATTR_SIZE}')
+
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def flag_masks(attributes):
+    # (attribute index, flag) boolean table, columns in TILE_FLAGS order
+    return np.unpackbits(attributes[:, None], axis=1, bitorder='little').astype(bool)
+
+
+def lookup_flags(tile_values, masks):
+    # Per-tile lookup of one or more flag columns. Tile values past the end of
+    # the attribute table (junk data, usually) come back with no flags set.
+    padded = np.concatenate((masks, np.zeros((1,) + masks.shape[1:], dtype=bool)))
+
+    return padded[np.minimum(tile_values // TILE_VALUE_SCALE, TILEATTR_SIZE)]
+
+
+def count_flags(tile_values, masks):
+    # How many of the given map tiles have each flag set. Tile values are
+    # histogrammed first, so the per-flag sums are one small matrix product
+    # instead of a lookup per tile.
+    histogram = np.bincount(tile_values // TILE_VALUE_SCALE, minlength=TILEATTR_SIZE)
+
+    return histogram[:TILEATTR_SIZE] @ masks
+
+
+def parse_tile_attribute_data(filename):
+    return TileAttributeDB(read_tile_attributes(filename))
@@ -0,0 +1,321 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import shlex
+import struct
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Shared by `generate.py watch` and `imgmake.py watch`. On Linux, changes come
+# straight from inotify; anywhere else (or if inotify is unavailable) the
+# watched trees are stat-polled instead. Either way, changes are collected
+# until things have been quiet for a moment, so an editor's save-as-rename or
+# a batch copy turns into one rebuild rather than several.
+
+DEBOUNCE_SECONDS = 0.1
+POLL_SECONDS = 0.25
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB
+EVENT_STRUCT = struct.Struct('iIII')
+
+# Arguments that name something a command writes, not reads
+OUTPUT_DESTS = {'outdir', 'binfile', 'cachefile', 'cachedir', 'profile_trace', 'profile_stats'}
+
+
+class InotifyWatcher:
+    def __init__(self, paths):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        # Directories are watched, not files, since most editors save by
+        # writing a new file and renaming it over the old one
+        self.paths = paths
+        self.dirs = {}
+        for path in paths:
+            if os.path.isdir(path):
+                self.add_tree(path)
+            else:
+                self.add(os.path.dirname(path))
+
+    def add(self, dirname):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirname), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = dirname
+
+    def add_tree(self, root):
+        for dirname, _, _ in os.walk(root):
+            self.add(dirname)
+
+    def read(self, timeout=None):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        data = os.read(self.fd, 64 * 1024)
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = EVENT_STRUCT.unpack_from(data, pos)
+            name = data[pos + EVENT_STRUCT.size:pos + EVENT_STRUCT.size + length].rstrip(b'\0')
+            pos += EVENT_STRUCT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # The kernel dropped events, so there's no telling what changed
+                changed |= self.everything()
+            elif mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+            elif wd in self.dirs:
+                path = os.path.join(self.dirs[wd], os.fsdecode(name))
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                changed.add(path)
+
+        return changed
+
+    def everything(self):
+        # Every watched file and directory, with any directories created while
+        # events were being dropped picked up along the way
+        paths = set()
+        for path in self.paths:
+            if os.path.isdir(path):
+                self.add_tree(path)
+                for dirname, _, filenames in os.walk(path):
+                    paths.add(dirname)
+                    paths.update(os.path.join(dirname, filename) for filename in filenames)
+            else:
+                paths.add(path)
+
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, paths, interval=POLL_SECONDS):
+        self.paths = paths
+        self.interval = interval
+        self.stats = self.scan()
+
+    def scan(self):
+        stats = {}
+        for path in self.paths:
+            if os.path.isdir(path):
+                for dirname, _, filenames in os.walk(path):
+                    for filename in filenames:
+                        self.stat_into(stats, os.path.join(dirname, filename))
+            else:
+                self.stat_into(stats, path)
+
+        return stats
+
+    @staticmethod
+    def stat_into(stats, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return
+        stats[path] = (st.st_mtime_ns, st.st_size)
+
+    def read(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.monotonic(), 0))
+            time.sleep(wait)
+
+            stats = self.scan()
+            changed = {path for path in stats.keys() | self.stats.keys()
+                       if stats.get(path) != self.stats.get(path)}
+            self.stats = stats
+
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(paths, polling=False):
+    paths = [os.path.abspath(path) for path in paths]
+
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass  # No usable libc, or no inotify in it
+
+    return PollingWatcher(paths)
+
+
+def changes(watcher, debounce=DEBOUNCE_SECONDS):
+    # Blocks until something changes, then keeps collecting until there's a
+    # quiet spell of `debounce` seconds, and yields everything at once
+    while True:
+        changed = watcher.read()
+        while True:
+            more = watcher.read(debounce)
+            if not more:
+                break
+            changed |= more
+
+        if changed:
+            yield changed
+
+
+def is_affected(changed, path):
+    return any(c == path or c.startswith(path + os.sep) for c in changed)
+
+
+###############################################################################
+
+
+def watch_root(path):
+    # What to watch for a path that may not exist yet: the path itself if it
+    # does, otherwise the nearest directory above it that does
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+
+    return path
+
+
+###############################################################################
+
+
+def register_parser(parent, job_func, inputs_func):
+    parser = parent.add_parser(
+        'watch', help='rerun data commands whenever their input files change')
+    parser.add_argument(
+        '-f', dest='jobfile', required=True, metavar='FILE',
+        help='file with one command per line, like `map -d $DIR > src/data/map.json`')
+    parser.add_argument(
+        '-j', dest='jobs', type=int, default=None, metavar='N',
+        help='number of commands to run at once')
+    parser.add_argument(
+        '-p', dest='polling', action='store_true',
+        help='poll file stats instead of using inotify')
+    parser.set_defaults(command_func=run, job_func=job_func, inputs_func=inputs_func)
+
+
+def run(args):
+    jobfile = os.path.abspath(args.jobfile)
+    jobs = read_job_file(jobfile)
+    outputs = {}
+    inputs = {}
+
+    # The workers stay up between rebuilds, so every command after the first
+    # starts with its modules already imported
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        run_jobs(executor, args, jobs, range(len(jobs)), outputs, inputs)
+
+        while True:
+            watcher = make_watcher(
+                [jobfile] + sorted({watch_root(path) for paths in inputs.values() for path in paths}),
+                args.polling)
+            print(f'Watching for changes ({type(watcher).__name__})...', file=sys.stderr)
+
+            for changed in changes(watcher):
+                if jobfile in changed:
+                    jobs = read_job_file(jobfile)
+                    outputs.clear()
+                    inputs.clear()
+                    run_jobs(executor, args, jobs, range(len(jobs)), outputs, inputs)
+                    break  # The set of watched paths may be different now
+
+                affected = [i for i in range(len(jobs))
+                            if any(is_affected(changed, path) for path in inputs.get(i, []))]
+                run_jobs(executor, args, jobs, affected, outputs, inputs)
+
+            watcher.close()
+
+
+def read_job_file(jobfile):
+    jobs = []
+    with open(jobfile, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            argv = shlex.split(os.path.expandvars(line))
+            if len(argv) < 3 or argv[-2] != '>':
+                raise ValueError(f'expected `COMMAND ARGS... > OUTPUT` in {jobfile}: {line!r}')
+            jobs.append((argv[:-2], argv[-1]))
+
+    return jobs
+
+
+def run_jobs(executor, args, jobs, indexes, outputs, inputs):
+    futures = {}
+    for i in indexes:
+        argv, outfile = jobs[i]
+
+        # Worked out from the command line up front, so a job that fails
+        # (say, because its input doesn't exist yet) is still watched, and
+        # reruns once its inputs turn up
+        try:
+            inputs[i] = args.inputs_func(argv)
+        except SystemExit:
+            print(f'{outfile}: bad command `{shlex.join(argv)}`', file=sys.stderr)
+            continue
+
+        futures[executor.submit(args.job_func, argv)] = i
+
+    for future in as_completed(futures):
+        i = futures[future]
+        argv, outfile = jobs[i]
+        try:
+            text, seconds = future.result()
+        except Exception:
+            print(f'{outfile}: failed\n{traceback.format_exc()}', file=sys.stderr)
+            continue
+
+        if i not in outputs and os.path.exists(outfile):
+            with open(outfile, 'r') as f:
+                outputs[i] = f.read()
+
+        # Only touch the output when it really changed, so nothing downstream
+        # (like `hugo server`) reloads for a rebuild that came out the same
+        if outputs.get(i) != text:
+            with open(outfile, 'w') as f:
+                f.write(text)
+            outputs[i] = text
+            print(f'{outfile}: rebuilt in {seconds:.2f}s', file=sys.stderr)
+        else:
+            print(f'{outfile}: unchanged ({seconds:.2f}s)', file=sys.stderr)
+
+
+def input_paths(args):
+    # Every string argument names a file or directory, which for the data
+    # commands (outputs aside) is exactly the set of things they read. Paths
+    # that don't exist yet are kept; they're what a failed job is waiting on.
+    paths = []
+    for dest, value in vars(args).items():
+        if dest in OUTPUT_DESTS:
+            continue
+        for item in (value if isinstance(value, list) else [value]):
+            if isinstance(item, (str, os.PathLike)):
+                paths.append(os.path.abspath(item))
+
+    return paths
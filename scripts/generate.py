@@ -1,38 +1,132 @@
-#!/usr/bin/env python3
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "markdown==3.11.1",
+#     "numpy==2.4.6",
+#     "pygments==2.19.2",
+#     "ruamel.yaml==0.19.1",
+# ]
+# ///
 
+import contextlib
+import importlib
+import io
 import sys
+import time
 from argparse import ArgumentParser
 
-import datalib.actor
-import datalib.font
-import datalib.map
-import datalib.music
-import datalib.sound
-import datalib.sprite
+import datalib.profiling
+import datalib.watch
 
-parser = ArgumentParser(description='Table data generator utility')
+# Command name -> the module that implements it. A command's module is only
+# imported when that command is run (or for the full usage listing), so the
+# commands that need nothing outside the standard library, like `actor`,
+# `font`, `sound`, and `sprite`, still work under a plain python3 without the
+# dependencies the others pull in.
+COMMANDS = {
+    'actor': 'datalib.actor',
+    'b800': 'datalib.b800',
+    'backdrop': 'datalib.backdrop',
+    'calls': 'datalib.callgraph',
+    'config': 'datalib.config',
+    'demo': 'datalib.demo',
+    'font': 'datalib.font',
+    'fullscreen': 'datalib.fullscreen',
+    'index': 'datalib.index',
+    'lzexe': 'datalib.lzexe',
+    'map': 'datalib.map',
+    'music': 'datalib.music',
+    'palanim': 'datalib.palanim',
+    'pitbug': 'datalib.pitbug',
+    'save': 'datalib.save',
+    'sound': 'datalib.sound',
+    'sprite': 'datalib.sprite',
+    'tileattr': 'datalib.tileattr',
+    'watch': 'datalib.watch'
+}
 
 
-def usage(args):
+def usage(parser):
     parser.print_usage()
     sys.exit(2)
 
 
-def main():
+def unavailable(name, error):
+    def run(args):
+        sys.exit(f'{name}: {error}')
+
+    return run
+
+
+def add_global_arguments(parser):
     parser.add_argument(
         '-V', '--version', action='version', version='%(prog)s 0.0.1')
-    parser.set_defaults(command_func=usage)
+    datalib.profiling.add_arguments(parser)
+
 
+def requested_command(argv):
+    # Whatever is left after the global options is the command and its args
+    parser = ArgumentParser(add_help=False)
+    add_global_arguments(parser)
+    _, rest = parser.parse_known_args(argv)
+
+    return rest[0] if rest and rest[0] in COMMANDS else None
+
+
+def build_parser(argv=None):
+    parser = ArgumentParser(description='Table data generator utility')
+    add_global_arguments(parser)
+    parser.set_defaults(command_func=lambda args: usage(parser))
+
+    command = requested_command(sys.argv[1:] if argv is None else argv)
     commands = parser.add_subparsers(metavar='COMMAND')
-    datalib.actor.register_parser(commands)
-    datalib.font.register_parser(commands)
-    datalib.map.register_parser(commands)
-    datalib.music.register_parser(commands)
-    datalib.sound.register_parser(commands)
-    datalib.sprite.register_parser(commands)
-
-    args = parser.parse_args()
-    args.command_func(args)
+    for name, module_name in COMMANDS.items():
+        if command is not None and name != command:
+            continue
+
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as e:
+            if command is not None:
+                raise
+            # Still listed, just not runnable here
+            commands.add_parser(name, help=f'(unavailable: {e})').set_defaults(
+                command_func=unavailable(name, e))
+            continue
+
+        if name == 'watch':
+            module.register_parser(commands, run_job, job_inputs)
+        else:
+            module.register_parser(commands)
+
+    return parser
+
+
+def run_job(argv):
+    # One command for `watch`, run in a pool worker exactly as if it came
+    # from the command line, with its stdout captured instead of printed
+    args = build_parser(argv).parse_args(argv)
+    out = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        args.command_func(args)
+
+    return out.getvalue(), time.perf_counter() - start
+
+
+def job_inputs(argv):
+    return datalib.watch.input_paths(build_parser(argv).parse_args(argv))
+
+
+def main():
+    args = build_parser().parse_args()
+    profiling = datalib.profiling.start(args)
+    try:
+        args.command_func(args)
+    finally:
+        if profiling:
+            datalib.profiling.finish(args)
 
 
 if __name__ == '__main__':
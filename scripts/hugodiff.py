@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+import difflib
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import re
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+
+# Every page carries a <meta name="generator" content="Hugo x.y.z"> tag, which
+# makes every single file differ between Hugo versions unless it's masked out.
+VERSION_RE = re.compile(rb'"Hugo [0-9.]+"')
+VERSION_MASK = b'"HUGOVERSION"'
+
+TAG_DIFF_SUFFIXES = {'.html', '.htm', '.xml', '.svg'}
+CACHE_VERSION = 1
+
+
+class HashCache:
+    # Remembers the digest of every file hashed so far, keyed by absolute path
+    # and only trusted while the file's size and mtime are unchanged. A stable
+    # baseline tree (like public-orig/) then never has to be reread.
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+
+        if path is None:
+            return
+
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self.entries = data['entries']
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def get(self, path, stat):
+        entry = self.entries.get(str(path))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, path, stat, digest):
+        self.entries[str(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        self.dirty = True
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+
+        temp_path = self.path.with_name(f'.{self.path.name}.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f)
+        os.replace(temp_path, self.path)
+
+
+def hash_file(path):
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Zero-length files can't be mapped
+            return digest.hexdigest()
+
+        with data:
+            pos = 0
+            for match in VERSION_RE.finditer(data):
+                digest.update(data[pos:match.start()])
+                digest.update(VERSION_MASK)
+                pos = match.end()
+            digest.update(data[pos:])
+
+    return digest.hexdigest()
+
+
+def scan_tree(root, cache):
+    digests = {}
+    misses = []
+
+    for path in sorted(p for p in root.rglob('*') if p.is_file()):
+        stat = path.stat()
+        digest = cache.get(path.resolve(), stat)
+        if digest is None:
+            misses.append((digests, path.relative_to(root).as_posix(), path, stat))
+        else:
+            digests[path.relative_to(root).as_posix()] = digest
+
+    return digests, misses
+
+
+def read_tags(path):
+    # Equivalent of `tr -s '>' '\n'`, but with the version string masked too
+    data = VERSION_RE.sub(VERSION_MASK, path.read_bytes())
+    text = data.decode(errors='replace')
+
+    return [f'{tag}>' for tag in text.split('>') if tag]
+
+
+def tag_diff(old_path, new_path, name):
+    return difflib.unified_diff(
+        read_tags(old_path), read_tags(new_path),
+        fromfile=f'a/{name}', tofile=f'b/{name}', lineterm='')
+
+
+def main():
+    parser = ArgumentParser(description='Rendered Hugo output comparison utility')
+    parser.add_argument('old', type=pathlib.Path, help='baseline output directory')
+    parser.add_argument('new', type=pathlib.Path, help='changed output directory')
+    parser.add_argument(
+        '-d', '--diff', action='store_true',
+        help='show a tag-by-tag diff of every changed HTML-ish file')
+    parser.add_argument(
+        '-c', '--cache', type=pathlib.Path,
+        default=pathlib.Path(__file__).resolve().parents[1] / '.hugodiff-cache.json',
+        metavar='FILE', help='where to keep the persistent hash cache')
+    parser.add_argument(
+        '-n', '--no-cache', action='store_true', help='do not read or write the hash cache')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None, metavar='N',
+        help='number of files to hash at once')
+    args = parser.parse_args()
+
+    for tree in (args.old, args.new):
+        if not tree.is_dir():
+            parser.error(f'{tree} is not a directory')
+
+    cache = HashCache(None if args.no_cache else args.cache)
+
+    old_digests, old_misses = scan_tree(args.old, cache)
+    new_digests, new_misses = scan_tree(args.new, cache)
+    misses = old_misses + new_misses
+
+    # Both trees go into one queue; hashlib drops the GIL for large updates, so
+    # threads are plenty here.
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        results = executor.map(hash_file, (path for _, _, path, _ in misses))
+
+        for (digests, name, path, stat), digest in zip(misses, results):
+            cache.put(path.resolve(), stat, digest)
+            digests[name] = digest
+
+    cache.save()
+
+    changed = sorted(
+        name for name in old_digests.keys() & new_digests.keys()
+        if old_digests[name] != new_digests[name])
+    removed = sorted(old_digests.keys() - new_digests.keys())
+    added = sorted(new_digests.keys() - old_digests.keys())
+
+    for name in removed:
+        print(f'Only in {args.old}: {name}')
+    for name in added:
+        print(f'Only in {args.new}: {name}')
+    for name in changed:
+        print(f'Files differ: {name}')
+
+        if args.diff and pathlib.PurePath(name).suffix.lower() in TAG_DIFF_SUFFIXES:
+            for line in tag_diff(args.old / name, args.new / name, name):
+                print(line)
+
+    print(
+        f'{len(changed)} changed, {len(removed)} removed, {len(added)} added '
+        f'({len(misses)} file(s) hashed, the rest cached).',
+        file=sys.stderr)
+
+    if changed or removed or added:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,41 @@
 #!/usr/bin/env python3
 
+import json
+import os
 import pathlib
 import re
+import struct
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import datalib.watch
 
 PNGQUANT_QUALITY = 25
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
 
 INKSCAPE_BIN = '/usr/local/bin/inkscape-cosmodoc'
 PNGQUANT_BIN = '/usr/bin/pngquant'
 OPTIPNG_BIN = '/usr/bin/optipng'
+CWEBP_BIN = '/usr/bin/cwebp'
+AVIFENC_BIN = '/usr/bin/avifenc'
 IS_CYGWIN = (sys.platform == 'cygwin')
 
+# Every version is written in each of these formats. The PNG is the fallback
+# that's always used for the <img> itself; the others are only offered by the
+# image shortcode when they come out smaller.
+FORMATS = ('png', 'webp', 'avif')
+
+# The formats above that can be left out when their encoder isn't installed
+OPTIONAL_ENCODER_BINS = {
+    'webp': CWEBP_BIN,
+    'avif': AVIFENC_BIN
+}
+
+# Byte sizes of every variant, for the image shortcode to pick from
+VARIANTS_FILE = 'src/data/image.json'
+
 
 def execute(command_list):
     p = subprocess.Popen(
@@ -31,6 +55,11 @@ def parse_manifest_entry(entry):
     return file, vers
 
 
+def read_manifest(manifest):
+    with manifest.open() as f:
+        return dict(parse_manifest_entry(entry) for entry in f.read().splitlines())
+
+
 def parse_manifest_ver(ver):
     match = re.match(r'([0-9]*)x([0-9]*)', ver)
 
@@ -50,26 +79,108 @@ def parse_manifest_ver(ver):
     return width, height
 
 
-def maybe_make_image(*, source, destination, ver):
-    src_str = str(source)
+def variant_path(destination, ver, fmt):
     dest_str = str(destination)
-
-    dest_ver = re.sub(r'\.svg$', f'-{ver}.png', dest_str, flags=re.I)
+    dest_ver = re.sub(r'\.svg$', f'-{ver}.{fmt}', dest_str, flags=re.I)
     assert dest_ver != dest_str
 
+    return pathlib.Path(dest_ver)
+
+
+def available_formats():
+    formats = []
+    for fmt in FORMATS:
+        binary = OPTIONAL_ENCODER_BINS.get(fmt)
+        if binary is not None and not os.path.exists(binary):
+            print(f'{binary} not found; skipping {fmt.upper()} images.\n')
+            continue
+
+        formats.append(fmt)
+
+    return tuple(formats)
+
+
+def is_up_to_date(target, source):
     try:
-        if pathlib.Path(dest_ver).stat().st_mtime >= source.stat().st_mtime:
-            return
+        return target.stat().st_mtime >= source.stat().st_mtime
     except FileNotFoundError:
-        pass
+        return False
 
-    make_image(src_str, dest_ver, ver)
 
+def maybe_make_image(*, source, destination, ver, formats):
+    stale = tuple(
+        fmt for fmt in formats if not is_up_to_date(variant_path(destination, ver, fmt), source))
+    if not stale:
+        return
 
-def make_image(source, destination, ver):
+    png = variant_path(destination, ver, 'png')
+    if 'png' in stale:
+        make_image(str(source), str(png), ver, stale)
+    else:
+        # The PNG is current, so the missing formats are encoded from it
+        # instead of rendering the version again and rewriting the PNG
+        encode_variants(native_path(str(png)), str(png), stale)
+
+
+def native_path(path):
     if IS_CYGWIN:
-        source = subprocess.check_output(['cygpath', '-w', source]).strip().decode()
-        destination = subprocess.check_output(['cygpath', '-w', destination]).strip().decode()
+        return subprocess.check_output(['cygpath', '-w', path]).strip().decode()
+
+    return path
+
+
+def run_step(cmd):
+    # Steps run side by side, so the whole message goes out in one piece
+    execute(cmd)
+    print(f'Executing {" ".join(cmd)}... done.\n', flush=True)
+
+
+def encode_png(raster, destination):
+    run_step([
+        PNGQUANT_BIN, '--ordered', '--quality', str(PNGQUANT_QUALITY),
+        '--speed', '1', '--output', destination, '--force', raster])
+
+    run_step([OPTIPNG_BIN, '-o7', '-zm1-9', '-strip', 'all', destination])
+
+
+def encode_webp(raster, destination):
+    run_step([
+        CWEBP_BIN, '-quiet', '-q', str(WEBP_QUALITY), '-m', '6', '-metadata', 'none',
+        raster, '-o', destination])
+
+
+def encode_avif(raster, destination):
+    run_step([
+        AVIFENC_BIN, '--speed', '0', '-q', str(AVIF_QUALITY), '--ignore-exif', '--ignore-xmp',
+        raster, destination])
+
+
+ENCODERS = {
+    'png': encode_png,
+    'webp': encode_webp,
+    'avif': encode_avif
+}
+
+
+def encode_variants(raster, destination, formats):
+    outputs = {fmt: native_path(re.sub(r'\.png$', f'.{fmt}', destination)) for fmt in formats}
+
+    # === PNGQUANT/OPTIPNG, CWEBP, AVIFENC =====================================
+
+    with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+        futures = [executor.submit(ENCODERS[fmt], raster, outputs[fmt]) for fmt in formats]
+        for future in futures:
+            future.result()
+
+
+def make_image(source, destination, ver, formats):
+    # Inkscape is by far the slowest part, so it renders each version once to
+    # a scratch PNG, and all the encoders then work from that at the same time
+    raster = re.sub(r'\.png$', '.raw.png', destination)
+    assert raster != destination
+
+    source = native_path(source)
+    raster = native_path(raster)
 
     # === INKSCAPE =============================================================
 
@@ -85,29 +196,53 @@ def make_image(source, destination, ver):
     if height is not None:
         cmd += [f'--export-height={height}']
 
-    cmd += [f'--export-filename={destination}', source]
+    cmd += [f'--export-filename={raster}', source]
 
-    print(f'Executing {" ".join(cmd)}...', end='', flush=True)
-    execute(cmd)
-    print(f' done.\n')
+    try:
+        run_step(cmd)
+        encode_variants(raster, destination, formats)
+    finally:
+        if os.path.exists(raster):
+            os.remove(raster)
 
-    # === PNGQUANT =============================================================
 
-    cmd = [
-        PNGQUANT_BIN, '--ordered', '--quality', str(PNGQUANT_QUALITY),
-        '--speed', '1', '--output', destination, '--force', destination]
+def png_dimensions(filename):
+    # Width and height are the first two fields of the IHDR chunk, which
+    # always comes right after the signature
+    with open(filename, 'rb') as f:
+        header = f.read(24)
 
-    print(f'Executing {" ".join(cmd)}...', end='', flush=True)
-    execute(cmd)
-    print(f' done.\n')
+    return struct.unpack('>II', header[16:24])
 
-    # === OPTIPNG ==============================================================
 
-    cmd = [OPTIPNG_BIN, '-o7', '-zm1-9', '-strip', 'all', destination]
+def write_variants(root, manifest):
+    content = root / 'src/content'
+    destination = content / 'topics'
+    variants = {}
 
-    print(f'Executing {" ".join(cmd)}...', end='', flush=True)
-    execute(cmd)
-    print(f' done.\n')
+    for file, vers in manifest.items():
+        for ver in vers:
+            png = variant_path(destination / file, ver, 'png')
+            if not png.exists():
+                continue
+
+            width, height = png_dimensions(png)
+            sizes = {}
+            for fmt in FORMATS:
+                try:
+                    sizes[fmt] = variant_path(destination / file, ver, fmt).stat().st_size
+                except FileNotFoundError:
+                    pass
+
+            variants[png.relative_to(content).as_posix()] = {
+                'width': width,
+                'height': height,
+                'bytes': sizes
+            }
+
+    with open(root / VARIANTS_FILE, 'w') as f:
+        json.dump(variants, f, indent=2, sort_keys=True)
+        f.write('\n')
 
 
 def make():
@@ -115,15 +250,15 @@ def make():
 
     source = root / 'imgsrc'
     destination = root / 'src/content/topics'
-    manifest = source / 'manifest.txt'
+    manifest = read_manifest(source / 'manifest.txt')
+    formats = available_formats()
 
-    with manifest.open() as f:
-        for entry in f.read().splitlines():
-            file, vers = parse_manifest_entry(entry)
+    for file, vers in manifest.items():
+        for ver in vers:
+            maybe_make_image(
+                source=source / file, destination=destination / file, ver=ver, formats=formats)
 
-            for ver in vers:
-                maybe_make_image(
-                    source=source / file, destination=destination / file, ver=ver)
+    write_variants(root, manifest)
 
 
 def clean():
@@ -132,13 +267,10 @@ def clean():
     destination = root / 'src/content/topics'
     manifest = root / 'imgsrc' / 'manifest.txt'
 
-    with manifest.open() as f:
-        for entry in f.read().splitlines():
-            file, vers = parse_manifest_entry(entry)
-
-            for ver in vers:
-                target = pathlib.Path(re.sub(
-                    r'\.svg$', f'-{ver}.png', str(destination / file), flags=re.I))
+    for file, vers in read_manifest(manifest).items():
+        for ver in vers:
+            for fmt in FORMATS:
+                target = variant_path(destination / file, ver, fmt)
 
                 if target.exists():
                     print(f'Removing {target}...', end='', flush=True)
@@ -146,8 +278,52 @@ def clean():
                     print(' done.\n')
 
 
+def watch():
+    root = pathlib.Path(__file__).resolve().parents[1]
+
+    source = root / 'imgsrc'
+    destination = root / 'src/content/topics'
+    manifest_file = source / 'manifest.txt'
+    manifest = read_manifest(manifest_file)
+    formats = available_formats()
+
+    def build(files):
+        futures = {
+            executor.submit(
+                maybe_make_image, source=source / file, destination=destination / file, ver=ver,
+                formats=formats): (file, ver)
+            for file in files for ver in manifest[file]}
+
+        for future in as_completed(futures):
+            file, ver = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f'{file} ({ver}): failed: {e}')
+
+        write_variants(root, manifest)
+
+    # The external tools do the real work, so threads are enough. The pool
+    # and the parsed manifest stay around between rebuilds.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        build(manifest.keys())
+
+        watcher = datalib.watch.make_watcher([source])
+        print(f'Watching {source} for changes...')
+
+        for changed in datalib.watch.changes(watcher):
+            if str(manifest_file) in changed:
+                # Anything new or resized is out of date; the rest is skipped
+                manifest = read_manifest(manifest_file)
+                build(manifest.keys())
+            else:
+                build(file for file in manifest if str(source / file) in changed)
+
+
 if __name__ == '__main__':
     if len(sys.argv) > 1 and sys.argv[1] == 'clean':
         clean()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'watch':
+        watch()
     else:
         make()
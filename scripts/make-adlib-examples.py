@@ -3,6 +3,9 @@
 import math
 import struct
 import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import transcode
 
 # Don't read this; this is single-use crap.
 
@@ -335,15 +338,29 @@ def waveform_select(filename):
                 out_wav.writeframesraw(struct.pack('<h', int(out * 32767)))
 
 
+EXAMPLES = [
+    (sine, 'sine-wave.wav'),
+    (sine_song, 'sine-song.wav'),
+    (slide_song, 'sine-portamento-song.wav'),
+    (pop_song, 'amplitude-song.wav'),
+    (zarathustra, 'zarathustra.wav'),
+    (vibrato, 'vibrato.wav'),
+    (tremolo, 'tremolo.wav'),
+    (modulate_up, 'mod-up.wav'),
+    (modulate_down, 'mod-down.wav'),
+    (feedback, 'feedback.wav'),
+    (waveform_select, 'waveform-select.wav')
+]
+
 if __name__ == '__main__':
-    sine('sine-wave.wav')
-    sine_song('sine-song.wav')
-    slide_song('sine-portamento-song.wav')
-    pop_song('amplitude-song.wav')
-    zarathustra('zarathustra.wav')
-    vibrato('vibrato.wav')
-    tremolo('tremolo.wav')
-    modulate_up('mod-up.wav')
-    modulate_down('mod-down.wav')
-    feedback('feedback.wav')
-    waveform_select('waveform-select.wav')
+    with ProcessPoolExecutor() as executor:
+        for future in [executor.submit(func, filename) for func, filename in EXAMPLES]:
+            future.result()
+
+    try:
+        results = transcode.transcode_all([filename for _, filename in EXAMPLES])
+    except FileNotFoundError as e:
+        print(f'Not transcoding: {e}')
+    else:
+        for destination, status in sorted(results.items()):
+            print(f'{destination}: {status}')
@@ -0,0 +1,214 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#     "brotli==1.2.0",
+#     "zstandard==0.25.0",
+# ]
+# ///
+
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import brotli
+import zstandard
+
+# Writes .gz, .br, and .zst siblings next to every compressible file in the
+# Hugo output, each at the highest level its format offers, so the HTTP server
+# can send them as-is (nginx `gzip_static`/`brotli_static`, Caddy
+# `precompressed`, and so on) instead of compressing on every request. Hugo
+# rewrites every file on every build, so mtimes say nothing; a file is only
+# recompressed when its contents hash differently than last time.
+
+COMPRESSIBLE_SUFFIXES = {
+    '.css', '.html', '.ico', '.js', '.json', '.map', '.svg', '.txt', '.webmanifest', '.xml'}
+CACHE_VERSION = 1
+
+
+def compress_gzip(data):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=11, lgwin=24)
+
+
+def compress_zstd(data):
+    return zstandard.ZstdCompressor(level=22).compress(data)
+
+
+ENCODINGS = {
+    'gz': compress_gzip,
+    'br': compress_brotli,
+    'zst': compress_zstd
+}
+
+
+def hash_data(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def sibling(path, ext):
+    return path.with_name(f'{path.name}.{ext}')
+
+
+def compress_file(path, previous_digest):
+    # Returns the file's digest and size, and the size of each compressed
+    # copy, or None for those if the contents haven't changed. A compressed
+    # copy that isn't any smaller is not kept, so the server falls back to the
+    # original; its size is reported as the original's.
+    data = path.read_bytes()
+    digest = hash_data(data)
+
+    if digest == previous_digest:
+        return digest, len(data), None
+
+    sizes = {}
+    stat = path.stat()
+    for ext, compress in ENCODINGS.items():
+        target = sibling(path, ext)
+        compressed = compress(data)
+
+        if len(compressed) >= len(data):
+            target.unlink(missing_ok=True)
+            sizes[ext] = len(data)
+            continue
+
+        temp_path = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+        temp_path.write_bytes(compressed)
+        os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(temp_path, target)
+        sizes[ext] = len(compressed)
+
+    return digest, len(data), sizes
+
+
+def read_cache(path):
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') == CACHE_VERSION:
+            return data['entries']
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    return {}
+
+
+def write_cache(path, entries):
+    temp_path = path.with_name(f'.{path.name}.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'entries': entries}, f)
+    os.replace(temp_path, path)
+
+
+def remove_stale(root, cache, names):
+    # Compressed copies of files that Hugo no longer generates. Only copies
+    # this script made are touched, which the cache knows about.
+    count = 0
+    for name in cache.keys() - names:
+        for ext in ENCODINGS:
+            path = sibling(root / name, ext)
+            if path.exists():
+                path.unlink()
+                count += 1
+
+    return count
+
+
+def main():
+    parser = ArgumentParser(description='Static output precompression utility')
+    parser.add_argument(
+        'root', type=pathlib.Path, nargs='?',
+        default=pathlib.Path(__file__).resolve().parents[1] / 'public',
+        help='directory to compress (default: %(default)s)')
+    parser.add_argument(
+        '-c', '--cache', type=pathlib.Path,
+        default=pathlib.Path(__file__).resolve().parents[1] / '.precompress-cache.json',
+        metavar='FILE', help='where to keep the digests of the files compressed last time')
+    parser.add_argument(
+        '-f', '--force', action='store_true', help='recompress everything, ignoring the cache')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None, metavar='N',
+        help='number of files to compress at once')
+    args = parser.parse_args()
+
+    if not args.root.is_dir():
+        parser.error(f'{args.root} is not a directory')
+
+    start = time.perf_counter()
+    cache = {} if args.force else read_cache(args.cache)
+    compressible = sorted(
+        p for p in args.root.rglob('*')
+        if p.is_file() and p.suffix.lower() in COMPRESSIBLE_SUFFIXES)
+    removed = remove_stale(
+        args.root, read_cache(args.cache), {p.relative_to(args.root).as_posix() for p in compressible})
+
+    entries = {}
+    compressed_count = 0
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {}
+        for path in compressible:
+            name = path.relative_to(args.root).as_posix()
+            previous = cache.get(name)
+            previous_digest = None
+
+            # A kept copy that went missing has to be put back, even if the
+            # original didn't change
+            if previous is not None and all(
+                    sibling(path, ext).exists()
+                    for ext, size in previous['sizes'].items() if size < previous['size']):
+                previous_digest = previous['digest']
+
+            futures[executor.submit(compress_file, path, previous_digest)] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            digest, size, sizes = future.result()
+
+            if sizes is None:
+                entries[name] = cache[name]
+            else:
+                entries[name] = {'digest': digest, 'size': size, 'sizes': sizes}
+                compressed_count += 1
+
+    write_cache(args.cache, entries)
+
+    # Savings are for the whole tree, not just what changed this time, broken
+    # down by file type for each encoding
+    totals = {ext: {} for ext in ENCODINGS}
+    for name, entry in entries.items():
+        suffix = pathlib.PurePosixPath(name).suffix.lower()
+        for ext, size in entry['sizes'].items():
+            original, compressed = totals[ext].get(suffix, (0, 0))
+            totals[ext][suffix] = (original + entry['size'], compressed + size)
+
+    print('encoding  type         original KiB   compressed KiB   saved')
+    for ext, by_suffix in totals.items():
+        rows = sorted(by_suffix.items())
+        rows.append(('total', (
+            sum(original for original, _ in by_suffix.values()),
+            sum(compressed for _, compressed in by_suffix.values()))))
+        for suffix, (original, compressed) in rows:
+            saved = 100 * (original - compressed) / original if original else 0
+            print(
+                f'{ext:9} {suffix:12} {original / 1024:12.1f} {compressed / 1024:16.1f} '
+                f'{saved:6.1f}%')
+
+    print(
+        f'{compressed_count} file(s) compressed, {len(compressible) - compressed_count} unchanged, '
+        f'{removed} stale file(s) removed in {time.perf_counter() - start:.2f}s.',
+        file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 
+import bisect
+import os
 import pathlib
 import re
 import sys
+import tempfile
+from argparse import ArgumentParser
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 WEIGHT_STRIDE = 10
+MINIMUM_GAP = WEIGHT_STRIDE // 2
 
 
 class Article:
@@ -48,7 +54,26 @@ class Article:
 
     def rewrite(self):
         text = ''.join(f'{line}\n' for line in self.text_lines)
-        self.path.write_text(text)
+
+        # Write next to the original and swap it into place, so an interrupted
+        # run never leaves a half-written article behind.
+        fd, temp_name = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+        try:
+            try:
+                f = os.fdopen(fd, 'w')
+            except BaseException:
+                # Until the file object exists, nothing else will close it
+                os.close(fd)
+                raise
+
+            with f:
+                f.write(text)
+            os.chmod(temp_name, self.path.stat().st_mode & 0o7777)
+            os.replace(temp_name, self.path)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
 
 
 class ArticleGroup:
@@ -79,46 +104,223 @@ class ArticleGroup:
             assert len(articles) == 1
             yield articles[0]
 
+    def plan_full(self):
+        new_weight = WEIGHT_STRIDE
+        for article in self.get_usable():
+            yield article, new_weight
+            new_weight += WEIGHT_STRIDE
+
+    def plan_minimal(self, min_gap):
+        articles = list(self.get_usable())
+        keep = find_anchors([a.weight for a in articles], min_gap)
+
+        for article, new_weight in zip(articles, spread_weights(articles, keep)):
+            if new_weight != article.weight:
+                yield article, new_weight
+
 
 class SafetyStop(Exception):
     pass
 
 
-def main():
-    root = pathlib.Path(__file__).resolve().parents[1]
+class PartialRun(Exception):
+    pass
+
+
+def find_anchors(weights, min_gap):
+    # Returns the indexes of the largest set of weights that can stay as they
+    # are while everything else is moved to leave at least `min_gap` between
+    # neighbors. Two kept weights at indexes i < j can coexist only if there
+    # is room for the (j - i - 1) articles between them, i.e. when
+    # weights[j] - weights[i] >= (j - i) * min_gap. Subtracting i * min_gap
+    # from each weight turns that into a plain "non-decreasing" test, so this
+    # is a longest non-decreasing subsequence search. The implied article at
+    # weight 0 before the first one is what bounds the low end.
+    tails = []
+    tail_indexes = []
+    parents = [None] * len(weights)
+
+    for i, weight in enumerate(weights):
+        key = weight - (i * min_gap)
+        if key < min_gap:
+            continue
+
+        pos = bisect.bisect_right(tails, key)
+        parents[i] = tail_indexes[pos - 1] if pos > 0 else None
+        if pos == len(tails):
+            tails.append(key)
+            tail_indexes.append(i)
+        else:
+            tails[pos] = key
+            tail_indexes[pos] = i
+
+    keep = set()
+    i = tail_indexes[-1] if tail_indexes else None
+    while i is not None:
+        keep.add(i)
+        i = parents[i]
+
+    return keep
+
+
+def spread_weights(articles, keep):
+    # Every run of moved articles is spaced evenly across the gap between the
+    # kept weights on either side of it. Moved articles past the last kept one
+    # simply continue on at the usual stride.
+    new_weights = [None] * len(articles)
+    low_index, low_weight = -1, 0
+
+    for i, article in enumerate(articles):
+        if i not in keep:
+            continue
+
+        span = i - low_index
+        for step in range(1, span):
+            new_weights[low_index + step] = \
+                low_weight + ((article.weight - low_weight) * step) // span
+        new_weights[i] = article.weight
+        low_index, low_weight = i, article.weight
+
+    for step, i in enumerate(range(low_index + 1, len(articles)), start=1):
+        new_weights[i] = low_weight + (step * WEIGHT_STRIDE)
+
+    return new_weights
+
+
+def find_section(path, content_root):
+    # Hugo orders a page against its siblings, so a page's weight lives in the
+    # namespace of the nearest enclosing section (a directory with an
+    # _index.md). A section's own _index.md is ordered among the pages of its
+    # parent section, not its own.
+    parent = path.parent
+    if path.name == '_index.md' and parent != content_root:
+        parent = parent.parent
+
+    while parent != content_root and not (parent / '_index.md').exists():
+        parent = parent.parent
+
+    return parent.relative_to(content_root).as_posix() or '.'
+
+
+def renumber_group(paths, minimal, min_gap):
+    # Runs one complete load/check/renumber pass over `paths` as a single
+    # weight namespace. Returns (log lines, rewritten count, untouched count,
+    # stopped flag) instead of printing so it can run inside a worker process.
+    log = []
     group = ArticleGroup()
 
-    for article in (root / 'src' / 'content').rglob('*'):
-        if not article.is_dir():
-            try:
-                group.add(Article(article))
-            except UnicodeDecodeError:
-                print(f'Skipping probable binary file {article}')
+    for path in paths:
+        try:
+            group.add(Article(path))
+        except UnicodeDecodeError:
+            log.append(f'Skipping probable binary file {path}')
 
+    # Duplicates are only worth reporting once every page has a weight, so
+    # the two checks stop separately, in the same order as always.
     should_stop = False
     for article in group.get_incompletes():
         should_stop = True
-        print(f'Missing weight in {article}.')
+        log.append(f'Missing weight in {article}.')
     if should_stop:
-        raise SafetyStop
+        return log, 0, 0, True
 
-    should_stop = False
     for weight, articles in group.get_conflicts():
         should_stop = True
-        print(f'Duplicate weight {weight} in:')
+        log.append(f'Duplicate weight {weight} in:')
         for article in articles:
-            print(f'  - {article}')
+            log.append(f'  - {article}')
+
     if should_stop:
-        raise SafetyStop
+        return log, 0, 0, True
+
+    if minimal:
+        plan = group.plan_minimal(min_gap)
+    else:
+        plan = group.plan_full()
 
-    print(f'Renumbering articles using weight stride {WEIGHT_STRIDE}.')
+    rewritten = 0
+    for article, new_weight in plan:
+        if new_weight == article.weight:
+            continue
 
-    new_weight = WEIGHT_STRIDE
-    for article in group.get_usable():
-        print(f'Applying weight {new_weight} to {article}...')
+        log.append(f'Applying weight {new_weight} to {article}...')
         article.set_weight(new_weight)
         article.rewrite()
-        new_weight += WEIGHT_STRIDE
+        rewritten += 1
+
+    return log, rewritten, len(group.weight_table) - rewritten, False
+
+
+def main():
+    parser = ArgumentParser(description='Content page weight renumbering utility')
+    parser.add_argument(
+        '-m', '--minimal', action='store_true',
+        help='only rewrite the pages needed to open up crowded weight gaps')
+    parser.add_argument(
+        '-g', '--min-gap', type=int, default=MINIMUM_GAP, metavar='GAP',
+        help=f'smallest acceptable gap between weights (default {MINIMUM_GAP})')
+    parser.add_argument(
+        '-s', '--per-section', action='store_true',
+        help='give each content section its own weight namespace')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None, metavar='N',
+        help='number of sections to process at once (default: CPU count)')
+    args = parser.parse_args()
+
+    if args.min_gap < 1:
+        parser.error('minimum gap must be at least 1')
+
+    root = pathlib.Path(__file__).resolve().parents[1]
+    content_root = root / 'src' / 'content'
+    sections = defaultdict(list)
+
+    for path in sorted(content_root.rglob('*')):
+        if not path.is_dir():
+            if args.per_section:
+                sections[find_section(path, content_root)].append(path)
+            else:
+                sections['.'].append(path)
+
+    if args.minimal:
+        print(f'Renumbering crowded articles using minimum gap {args.min_gap}.')
+    else:
+        print(f'Renumbering articles using weight stride {WEIGHT_STRIDE}.')
+
+    # Sections share nothing, so each one gets its own worker. Whichever of
+    # them hit a missing or duplicate weight are left alone; the rest proceed.
+    # Without --per-section there is only the one group, so a problem anywhere
+    # stops the run before anything is rewritten.
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            name: executor.submit(renumber_group, paths, args.minimal, args.min_gap)
+            for name, paths in sections.items()}
+
+    total_rewritten = 0
+    total_untouched = 0
+    stopped = []
+    for name in sorted(futures):
+        log, rewritten, untouched, did_stop = futures[name].result()
+
+        if args.per_section and (log or did_stop):
+            print(f'Section {name}:')
+        for line in log:
+            print(line)
+
+        total_rewritten += rewritten
+        total_untouched += untouched
+        if did_stop:
+            stopped.append(name)
+
+    if stopped and not args.per_section:
+        raise SafetyStop
+
+    print(
+        f'Rewrote {total_rewritten} file(s), '
+        f'left {total_untouched} file(s) untouched.')
+
+    if stopped:
+        print(f'Skipped section(s) with problems: {", ".join(stopped)}')
+        raise PartialRun
 
     print('The deed is done.')
 
@@ -129,3 +331,6 @@ if __name__ == '__main__':
     except SafetyStop:
         print('Cannot continue.')
         sys.exit(1)
+    except PartialRun:
+        print('Only some of the sections were renumbered.')
+        sys.exit(2)
@@ -0,0 +1,6 @@
+import pathlib
+import sys
+
+# The scripts import `datalib` relative to their own directory, as if run
+# from there; do the same here no matter where pytest was started.
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
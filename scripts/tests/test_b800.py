@@ -0,0 +1,91 @@
+import gzip
+import struct
+
+import numpy as np
+import pytest
+
+import datalib.b800
+import datalib.defs
+from datalib.b800 import SCREEN_SIZE_BYTES, TEXT_COLUMNS, TEXT_ROWS
+
+
+def raw_font(height=8):
+    # Glyph n has row r set to n, except that row 0 of every glyph is full
+    glyphs = np.tile(np.arange(256, dtype=np.uint8)[:, None], (1, height))
+    glyphs[:, 0] = 0xFF
+
+    return glyphs.tobytes()
+
+
+def screen(cells):
+    # `cells` maps (row, column) to (character, attribute); the rest is blank
+    data = bytearray(SCREEN_SIZE_BYTES)
+    for (row, col), (char, attr) in cells.items():
+        pos = ((row * TEXT_COLUMNS) + col) * 2
+        data[pos:pos + 2] = bytes((char, attr))
+
+    return bytes(data)
+
+
+def test_read_font_file_formats(tmp_path):
+    font = raw_font(16)
+
+    raw = tmp_path / 'font.bin'
+    raw.write_bytes(font)
+    assert datalib.b800.read_font_file(raw) == (font, 8, 16)
+
+    psf1 = tmp_path / 'font.psf.gz'
+    psf1.write_bytes(gzip.compress(datalib.b800.PSF1_MAGIC + bytes((0, 16)) + font))
+    assert datalib.b800.read_font_file(psf1) == (font, 8, 16)
+
+    psf2 = tmp_path / 'font.psf'
+    psf2.write_bytes(
+        datalib.b800.PSF2_MAGIC + struct.pack('<7I', 0, 32, 0, 256, 16, 16, 8) + font)
+    assert datalib.b800.read_font_file(psf2) == (font, 8, 16)
+
+    bad = tmp_path / 'font.txt'
+    bad.write_bytes(b'not a font')
+    with pytest.raises(ValueError):
+        datalib.b800.read_font_file(bad)
+
+
+def test_nine_dot_extends_line_graphics_only(tmp_path):
+    fontfile = tmp_path / 'font.bin'
+    fontfile.write_bytes(raw_font())
+
+    atlas = datalib.b800.load_glyph_atlas(fontfile, nine_dot=True)
+
+    assert atlas.shape == (256, 8, 9)
+    assert atlas[0xC4, 0, 8] and not atlas[ord('A'), 0, 8]
+
+
+def test_render_screens_colors_and_blink(tmp_path):
+    fontfile = tmp_path / 'font.bin'
+    fontfile.write_bytes(raw_font())
+    atlas = datalib.b800.load_glyph_atlas(fontfile)
+    data = screen({(0, 0): (0, 0x1E), (1, 2): (0, 0x9C)})
+
+    chars, attrs = datalib.b800.split_screens(data)
+    visible, blinked = datalib.b800.render_screens(chars, attrs, atlas)
+
+    assert visible.shape == (1, TEXT_ROWS * 8, TEXT_COLUMNS * 8)
+    assert visible[0, 0, 0] == 0x0E and visible[0, 1, 0] == 0x01
+    assert visible[0, 8, 16] == 0x0C and blinked[0, 8, 16] == 0x01
+    assert (visible[0, :8, :8] == blinked[0, :8, :8]).all()
+
+
+def test_parse_and_export(tmp_path):
+    fontfile = tmp_path / 'font.bin'
+    fontfile.write_bytes(raw_font())
+    atlas = datalib.b800.load_glyph_atlas(fontfile)
+    names = datalib.defs.B800_FILES
+    for i, name in enumerate(names):
+        (tmp_path / name).write_bytes(screen({(0, 0): (65, 0x87 if i == 0 else 0x07)}))
+
+    db = datalib.b800.parse_b800_data(tmp_path, atlas)
+    db.export(tmp_path / 'out')
+
+    table = db.to_dict()['table']
+    assert table[0]['blink_flag'] == 1 and len(table[0]['png_files']) == 2
+    assert all(row['blink_flag'] == 0 and len(row['png_files']) == 1 for row in table[1:])
+    assert all((tmp_path / 'out' / f).exists() for row in table for f in row['png_files'])
@@ -0,0 +1,43 @@
+import numpy as np
+
+import datalib.backdrop
+import datalib.image
+from datalib.backdrop import BACKDROP_HEIGHT, BACKDROP_SIZE, BACKDROP_WIDTH
+
+
+def decode(data):
+    return datalib.image.decode_solid_tiles(data, BACKDROP_WIDTH).reshape(
+        BACKDROP_HEIGHT * 8, BACKDROP_WIDTH * 8)
+
+
+def random_backdrop():
+    return np.random.default_rng(3).integers(0, 256, BACKDROP_SIZE, dtype=np.uint8).tobytes()
+
+
+def test_shift_horizontal_moves_four_pixels_left():
+    data = random_backdrop()
+
+    shifted = datalib.backdrop.shift_horizontal(data)
+
+    assert len(shifted) == BACKDROP_SIZE
+    assert (decode(shifted) == np.roll(decode(data), -4, axis=1)).all()
+
+
+def test_shift_vertical_moves_four_pixels_up():
+    data = random_backdrop()
+
+    shifted = datalib.backdrop.shift_vertical(data)
+
+    assert len(shifted) == BACKDROP_SIZE
+    assert (decode(shifted) == np.roll(decode(data), -4, axis=0)).all()
+
+
+def test_build_variants():
+    data = random_backdrop()
+    image = decode(data)
+
+    variants = datalib.backdrop.build_variants(data)
+
+    assert variants.shape == (4, BACKDROP_HEIGHT * 8, BACKDROP_WIDTH * 8)
+    assert (variants[0] == image).all()
+    assert (variants[3] == np.roll(image, (-4, -4), axis=(0, 1))).all()
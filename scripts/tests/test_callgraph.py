@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import datalib.callgraph
+
+CFLOW = '''\
+main() <int main (void) at src/main.c:10>:
+    Startup() <void Startup (void) at src/main.c:40>:
+        LoadConfig() <void LoadConfig (void) at src/config.c:5>
+    GameLoop() <void GameLoop (void) at src/game.c:100> (R):
+        DrawMap() <void DrawMap (void) at src/draw.c:20>:
+            DrawTile() <void DrawTile (word) at src/draw.c:80>
+        GameLoop() <void GameLoop (void) at src/game.c:100> (R) [see 4]
+        DrawTile()
+'''
+
+REVERSE = '''\
+DrawTile() <void DrawTile (word) at src/draw.c:80>:
+    DrawMap() <void DrawMap (void) at src/draw.c:20>:
+        GameLoop() <void GameLoop (void) at src/game.c:100>
+    GameLoop()
+'''
+
+
+def test_parse_cflow():
+    graph = datalib.callgraph.parse_cflow(CFLOW)
+
+    assert graph.symbols == ['main', 'Startup', 'LoadConfig', 'GameLoop', 'DrawMap', 'DrawTile']
+    assert graph.locations[graph.ids['DrawTile']] == 'src/draw.c:80'
+    assert graph.recursive[graph.ids['GameLoop']]
+    assert not graph.recursive[graph.ids['main']]
+    assert graph.callees('GameLoop') == ['GameLoop', 'DrawMap', 'DrawTile']
+    assert graph.callers('DrawTile') == ['GameLoop', 'DrawMap']
+
+
+def test_transitive_calls():
+    graph = datalib.callgraph.parse_cflow(CFLOW)
+
+    assert graph.all_callees('Startup') == ['LoadConfig']
+    assert sorted(graph.all_callers('DrawTile')) == ['DrawMap', 'GameLoop', 'main']
+    assert graph.calls('main', 'DrawTile')
+    assert graph.calls('GameLoop', 'GameLoop')
+    assert not graph.calls('DrawTile', 'main')
+
+
+def test_reverse_output_flips_edges():
+    graph = datalib.callgraph.parse_cflow(REVERSE, reverse=True)
+
+    assert graph.callees('GameLoop') == ['DrawTile', 'DrawMap']
+    assert graph.callers('DrawTile') == ['DrawMap', 'GameLoop']
+
+
+def test_unrecognized_line():
+    with pytest.raises(ValueError):
+        datalib.callgraph.parse_cflow('main() {\n')
+
+
+def test_to_dict_links_refs():
+    graph = datalib.callgraph.parse_cflow(CFLOW)
+    db = datalib.callgraph.CallGraphDB(graph, {'DrawMap': 'functions/drawmap'})
+
+    result = db.to_dict()
+    row = result['table'][result['index']['symbol']['DrawTile']]
+
+    assert row['callers'] == [
+        {'symbol': 'DrawMap', 'ref': 'functions/drawmap'}, {'symbol': 'GameLoop', 'ref': None}]
+    assert (row['all_caller_count'], row['all_callee_count']) == (3, 0)
+    assert row['recursive_flag'] == 0
+
+
+def test_save(tmp_path):
+    graph = datalib.callgraph.parse_cflow(CFLOW)
+
+    graph.save(tmp_path / 'calls.npz')
+
+    with np.load(tmp_path / 'calls.npz') as saved:
+        assert saved['symbols'].tolist() == graph.symbols
+        assert (saved['closure'] == graph.closure).all()
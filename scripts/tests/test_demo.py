@@ -0,0 +1,37 @@
+import struct
+
+import datalib.demo
+
+
+def write_demo(path, frames):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(struct.pack('<H', len(frames)) + bytes(frames))
+
+    return str(path)
+
+
+def test_analyze_demo(tmp_path):
+    # Walk left for two frames, jump, then end the first level while idle
+    filename = write_demo(tmp_path / 'PREVDEMO.MNI', [0x01, 0x01, 0x10, 0x00, 0x40, 0x02])
+
+    row = datalib.demo.analyze_demo(filename, 'PREVDEMO.MNI')
+
+    assert (row['frame_count'], row['idle_frame_count']) == (6, 2)
+    keys = {key['key']: key for key in row['keys']}
+    assert (keys['walk_left']['frames_held'], keys['walk_left']['press_count']) == (2, 1)
+    assert keys['walk_left']['run_lengths'] == [[2, 1]]
+    assert keys['jump']['press_count'] == 1
+    assert [(level['level_num'], level['frame_count']) for level in row['levels']] == [
+        (0, 5), (13, 1)]
+
+
+def test_batch_names_are_relative_to_common_parent(tmp_path):
+    files = [
+        write_demo(tmp_path / 'ep1' / 'PREVDEMO.MNI', [0]),
+        write_demo(tmp_path / 'ep2' / 'PREVDEMO.MNI', [1])
+    ]
+
+    db = datalib.demo.parse_demo_data(files, jobs=1)
+
+    assert [row['demo_name'] for row in db.table] == ['ep1/PREVDEMO.MNI', 'ep2/PREVDEMO.MNI']
+    assert datalib.demo.demo_names(files[:1]) == ['PREVDEMO.MNI']
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import datalib.defs
+import datalib.fullscreen
+from datalib.defs import EGA_PLANES, SCREEN_HEIGHT_PIXELS, SCREEN_WIDTH_PIXELS
+from datalib.fullscreen import IMAGE_SIZE_BYTES
+
+
+def encode_planar(pixels):
+    # The reverse of decode_planar_images(), one image at a time
+    planes = [np.packbits((pixels >> plane) & 1) for plane in range(EGA_PLANES)]
+
+    return np.concatenate(planes).tobytes()
+
+
+def random_images(count):
+    return np.random.default_rng(5).integers(
+        0, 16, (count, SCREEN_HEIGHT_PIXELS, SCREEN_WIDTH_PIXELS), dtype=np.uint8)
+
+
+def test_decode_planar_images_round_trip():
+    images = random_images(2)
+    data = b''.join(encode_planar(image) for image in images)
+
+    assert (datalib.fullscreen.decode_planar_images(data) == images).all()
+
+
+def test_insert_batch_counts_colors():
+    images = np.zeros((2, SCREEN_HEIGHT_PIXELS, SCREEN_WIDTH_PIXELS), dtype=np.uint8)
+    images[1, 0, :3] = [4, 9, 15]
+    db = datalib.fullscreen.FullScreenDB()
+
+    db.insert_batch(['TITLE1', 'TITLE2'], images)
+
+    assert [row['colors_used'] for row in db.to_dict()['table']] == [1, 4]
+
+
+def test_insert_batch_rejects_duplicate_names():
+    db = datalib.fullscreen.FullScreenDB()
+
+    with pytest.raises(ValueError):
+        db.insert_batch(['TITLE1', 'TITLE1'], random_images(2))
+
+
+def test_parse_and_export(tmp_path):
+    images = random_images(len(datalib.defs.FULL_SCREEN_FILES))
+    for name, image in zip(datalib.defs.FULL_SCREEN_FILES, images):
+        (tmp_path / name).write_bytes(encode_planar(image))
+
+    db = datalib.fullscreen.parse_full_screen_data(tmp_path)
+    db.export(tmp_path / 'out')
+
+    table = db.to_dict()['table']
+    assert [row['image_name'] for row in table][:2] == ['PRETITLE', 'TITLE1']
+    assert all((tmp_path / 'out' / row['png_file']).exists() for row in table)
+
+
+def test_parse_rejects_short_files(tmp_path):
+    for name in datalib.defs.FULL_SCREEN_FILES:
+        (tmp_path / name).write_bytes(bytes(IMAGE_SIZE_BYTES - 1))
+
+    with pytest.raises(ValueError):
+        datalib.fullscreen.parse_full_screen_data(tmp_path)
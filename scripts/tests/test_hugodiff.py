@@ -0,0 +1,90 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import hugodiff
+
+SCRIPT = Path(__file__).resolve().parents[1] / 'hugodiff.py'
+
+PAGE = '<html><head><meta name="generator" content="Hugo {}"></head><body>{}</body></html>'
+
+
+def write_tree(root, files):
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def run(*args):
+    return subprocess.run([sys.executable, SCRIPT, *map(str, args)], capture_output=True, text=True)
+
+
+def test_hash_file_ignores_the_hugo_version(tmp_path):
+    old = tmp_path / 'old.html'
+    new = tmp_path / 'new.html'
+    empty = tmp_path / 'empty.html'
+    old.write_text(PAGE.format('0.110.0', 'Hi'))
+    new.write_text(PAGE.format('0.128.2', 'Hi'))
+    empty.write_text('')
+
+    assert hugodiff.hash_file(old) == hugodiff.hash_file(new)
+    assert hugodiff.hash_file(empty) != hugodiff.hash_file(old)
+
+
+def test_read_tags_splits_on_closing_brackets(tmp_path):
+    path = tmp_path / 'a.html'
+    path.write_text('<p>One</p><br>')
+
+    assert hugodiff.read_tags(path) == ['<p>', 'One</p>', '<br>']
+
+
+def test_hash_cache_trusts_unchanged_files_only(tmp_path):
+    path = tmp_path / 'a.html'
+    path.write_text('one')
+    cache_file = tmp_path / 'cache.json'
+
+    cache = hugodiff.HashCache(cache_file)
+    cache.put(path, path.stat(), 'digest')
+    cache.save()
+
+    cache = hugodiff.HashCache(cache_file)
+    assert cache.get(path, path.stat()) == 'digest'
+
+    path.write_text('longer')
+    assert cache.get(path, path.stat()) is None
+
+
+def test_compares_trees(tmp_path):
+    write_tree(tmp_path / 'old', {
+        'index.html': PAGE.format('0.110.0', 'Same'),
+        'page/index.html': PAGE.format('0.110.0', '<p>Old</p>'),
+        'gone.css': 'a {}'})
+    write_tree(tmp_path / 'new', {
+        'index.html': PAGE.format('0.128.2', 'Same'),
+        'page/index.html': PAGE.format('0.128.2', '<p>New</p>'),
+        'added.css': 'b {}'})
+    cache = tmp_path / 'cache.json'
+
+    result = run(tmp_path / 'old', tmp_path / 'new', '-d', '-c', cache)
+
+    assert result.returncode == 1
+    assert result.stdout.splitlines()[:3] == [
+        f'Only in {tmp_path / "old"}: gone.css',
+        f'Only in {tmp_path / "new"}: added.css',
+        'Files differ: page/index.html']
+    assert '-Old</p>' in result.stdout and '+New</p>' in result.stdout
+    assert '(6 file(s) hashed' in result.stderr
+
+    result = run(tmp_path / 'old', tmp_path / 'new', '-c', cache)
+    assert '(0 file(s) hashed' in result.stderr
+
+
+def test_identical_trees(tmp_path):
+    write_tree(tmp_path / 'old', {'index.html': PAGE.format('0.110.0', 'Same')})
+    write_tree(tmp_path / 'new', {'index.html': PAGE.format('0.128.2', 'Same')})
+
+    result = run(tmp_path / 'old', tmp_path / 'new', '-n')
+
+    assert result.returncode == 0
+    assert result.stdout == ''
@@ -0,0 +1,149 @@
+import json
+import os
+import stat
+import struct
+import subprocess
+import sys
+
+import pytest
+
+import imgmake
+
+# Stands in for every external tool, picking its behavior from the name it was
+# run as. Each run is noted in calls.log. The "render" is a PNG header with
+# the requested width and height, which is all png_dimensions() reads.
+STUB_TOOL = f'''#!{sys.executable}
+import shutil
+import struct
+import subprocess
+import sys
+from pathlib import Path
+
+tool = Path(sys.argv[0]).name
+args = sys.argv[1:]
+with open(Path(__file__).parent / 'calls.log', 'a') as f:
+    f.write(tool + '\\n')
+
+if tool == 'inkscape':
+    opts = dict(arg[2:].split('=', 1) for arg in args if arg.startswith('--export-') and '=' in arg)
+    width = int(opts.get('export-width', 100))
+    height = int(opts.get('export-height', 50))
+    Path(opts['export-filename']).write_bytes(
+        b'\\x89PNG\\r\\n\\x1a\\n\\x00\\x00\\x00\\rIHDR' + struct.pack('>II', width, height))
+elif tool == 'pngquant':
+    shutil.copy(args[-1], args[args.index('--output') + 1])
+elif tool == 'cwebp':
+    shutil.copy(args[-3], args[-1])
+    with open(args[-1], 'ab') as f:
+        f.write(b'webp')
+elif tool == 'avifenc':
+    shutil.copy(args[-2], args[-1])
+'''
+
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    for name, attr in (
+            ('inkscape', 'INKSCAPE_BIN'), ('pngquant', 'PNGQUANT_BIN'), ('optipng', 'OPTIPNG_BIN'),
+            ('cwebp', 'CWEBP_BIN'), ('avifenc', 'AVIFENC_BIN')):
+        tool = bindir / name
+        tool.write_text(STUB_TOOL)
+        tool.chmod(tool.stat().st_mode | stat.S_IXUSR)
+        monkeypatch.setattr(imgmake, attr, str(tool))
+
+    def calls():
+        log = bindir / 'calls.log'
+        lines = log.read_text().splitlines() if log.exists() else []
+        log.unlink(missing_ok=True)
+        return sorted(lines)
+
+    return calls
+
+
+@pytest.fixture
+def image(tmp_path):
+    (tmp_path / 'imgsrc').mkdir()
+    (tmp_path / 'src/content/topics').mkdir(parents=True)
+    source = tmp_path / 'imgsrc' / 'diagram.svg'
+    source.write_text('<svg/>')
+
+    return {
+        'source': source,
+        'destination': tmp_path / 'src/content/topics' / 'diagram.svg',
+        'ver': '320x'}
+
+
+def test_parse_manifest_ver():
+    assert imgmake.parse_manifest_ver('320x') == (320, None)
+    assert imgmake.parse_manifest_ver('x200') == (None, 200)
+    with pytest.raises(RuntimeError):
+        imgmake.parse_manifest_ver('big')
+
+
+def test_variant_path(tmp_path):
+    assert imgmake.variant_path(tmp_path / 'a.SVG', '320x', 'webp') == tmp_path / 'a-320x.webp'
+
+
+def test_renders_every_format_once(tools, image):
+    imgmake.maybe_make_image(**image, formats=imgmake.FORMATS)
+
+    assert tools() == ['avifenc', 'cwebp', 'inkscape', 'optipng', 'pngquant']
+    topics = image['destination'].parent
+    assert sorted(path.name for path in topics.iterdir()) == [
+        'diagram-320x.avif', 'diagram-320x.png', 'diagram-320x.webp']
+
+    imgmake.maybe_make_image(**image, formats=imgmake.FORMATS)
+    assert tools() == []
+
+
+def test_missing_format_is_encoded_from_the_png(tools, image):
+    imgmake.maybe_make_image(**image, formats=imgmake.FORMATS)
+    tools()
+
+    imgmake.variant_path(image['destination'], '320x', 'webp').unlink()
+    imgmake.maybe_make_image(**image, formats=imgmake.FORMATS)
+
+    assert tools() == ['cwebp']
+
+
+def test_changed_source_is_rendered_again(tools, image):
+    imgmake.maybe_make_image(**image, formats=('png',))
+    tools()
+
+    later = image['source'].stat().st_mtime + 10
+    os.utime(image['source'], (later, later))
+    imgmake.maybe_make_image(**image, formats=('png',))
+
+    assert tools() == ['inkscape', 'optipng', 'pngquant']
+
+
+def test_failed_step_removes_the_raster(tools, image, monkeypatch):
+    monkeypatch.setattr(imgmake, 'PNGQUANT_BIN', '/bin/false')
+
+    with pytest.raises(subprocess.CalledProcessError):
+        imgmake.maybe_make_image(**image, formats=('png',))
+
+    assert list(image['destination'].parent.iterdir()) == []
+
+
+def test_available_formats_skips_missing_encoders(monkeypatch):
+    monkeypatch.setattr(imgmake, 'OPTIONAL_ENCODER_BINS', {'webp': '/nonexistent/cwebp'})
+
+    assert imgmake.available_formats() == ('png', 'avif')
+
+
+def test_write_variants(tmp_path, tools, image):
+    imgmake.maybe_make_image(**image, formats=imgmake.FORMATS)
+    (tmp_path / 'src/data').mkdir()
+
+    imgmake.write_variants(tmp_path, {'diagram.svg': ['320x', '640x']})
+
+    variants = json.loads((tmp_path / imgmake.VARIANTS_FILE).read_text())
+    png_size = struct.calcsize('>II') + 16
+    assert variants == {
+        'topics/diagram-320x.png': {
+            'width': 320,
+            'height': 50,
+            'bytes': {'png': png_size, 'webp': png_size + 4, 'avif': png_size}}}
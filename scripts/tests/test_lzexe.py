@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+
+import datalib.defs
+import datalib.lzexe
+from datalib.lzexe import PARAGRAPH_BYTES
+
+
+class StreamWriter:
+    # Writes an LZEXE stream the way the compressor lays it out: a 16-bit flag
+    # word, then data bytes, with the next flag word reserved the moment the
+    # last bit of the current one is filled in.
+    def __init__(self):
+        self.out = bytearray(2)
+        self.word_pos = 0
+        self.bit_count = 0
+
+    def bit(self, value):
+        if value:
+            self.out[self.word_pos + (self.bit_count // 8)] |= 1 << (self.bit_count % 8)
+        self.bit_count += 1
+        if self.bit_count == 16:
+            self.word_pos = len(self.out)
+            self.out += b'\0\0'
+            self.bit_count = 0
+
+    def literal(self, byte):
+        self.bit(1)
+        self.out.append(byte)
+
+    def short_pointer(self, distance, length):
+        assert 1 <= distance <= 0x100 and 2 <= length <= 5
+        for value in (0, 0, (length - 2) >> 1, (length - 2) & 1):
+            self.bit(value)
+        self.out.append(0x100 - distance)
+
+    def long_pointer(self, distance, length=None, extra=None):
+        # `extra` is the length byte that follows when the 3-bit length is 0
+        self.bit(0)
+        self.bit(1)
+        value = 0x2000 - distance
+        short_length = 0 if length is None or length > 9 else length - 2
+        self.out += bytes([value & 0xFF, ((value >> 5) & 0xF8) | short_length])
+        if short_length == 0:
+            self.out.append(extra if extra is not None else length - 1)
+
+    def end(self):
+        self.long_pointer(1, extra=0)
+
+        return bytes(self.out)
+
+
+def test_decompress_literals_and_pointers():
+    writer = StreamWriter()
+    for byte in b'abcdefghijklmnopqrstuvwxyz':
+        writer.literal(byte)
+    writer.short_pointer(26, 4)  # abcd
+    writer.short_pointer(1, 5)  # ddddd, overlapping itself
+    writer.long_pointer(35, 9)  # abcdefghi
+    writer.long_pointer(1, extra=1)  # Segment change, no output
+    writer.long_pointer(44, 20)  # abcdefghijklmnopqrst
+    data = writer.end()
+
+    out, pos = datalib.lzexe.decompress(data + b'trailing')
+
+    expected = b'abcdefghijklmnopqrstuvwxyz' + b'abcd' + b'ddddd' + b'abcdefghi'
+    assert out == expected + expected[:20]
+    assert pos == len(data)
+
+
+def test_decompress_matches_input():
+    rng = np.random.default_rng(2)
+    source = bytearray()
+    writer = StreamWriter()
+    while len(source) < 3000:
+        if len(source) > 300 and rng.random() < 0.3:
+            distance = int(rng.integers(1, 300))
+            length = int(rng.integers(2, 40)) if distance > 0x100 else int(rng.integers(2, 6))
+            if distance > 0x100 and length == 2:
+                length = 3
+            if length <= 5 and distance <= 0x100:
+                writer.short_pointer(distance, length)
+            else:
+                writer.long_pointer(distance, length)
+            for _ in range(length):
+                source.append(source[-distance])
+        else:
+            byte = int(rng.integers(256))
+            writer.literal(byte)
+            source.append(byte)
+
+    out, _ = datalib.lzexe.decompress(writer.end())
+
+    assert out == bytes(source)
+
+
+def test_decompress_rejects_pointer_before_start():
+    writer = StreamWriter()
+    writer.literal(1)
+    writer.short_pointer(2, 2)
+
+    with pytest.raises(ValueError):
+        datalib.lzexe.decompress(writer.end())
+
+
+def make_lz91_exe(packed, junk_paragraphs):
+    # An image of some unrelated paragraphs, the packed data, then the
+    # decompressor's segment: its LZEXE header and a relocation table with
+    # fixups at 5 and 105h bytes into the image
+    packed = packed.ljust(-(-len(packed) // PARAGRAPH_BYTES) * PARAGRAPH_BYTES, b'\0')
+    table = bytes([5, 0, 0x00, 0x01, 0, 1, 0])
+    table_start = datalib.lzexe.LZEXE_VERSIONS[b'LZ91']
+    initial_cs = junk_paragraphs + (len(packed) // PARAGRAPH_BYTES)
+
+    code = datalib.defs.LZEXE_HEADER_SCHEMA.pack({
+        'initial_ip': 0x12,
+        'initial_cs': 0x34,
+        'initial_sp': 0x80,
+        'initial_ss': 0x56,
+        'compressed_paragraphs': len(packed) // PARAGRAPH_BYTES,
+        'extra_paragraphs': 0,
+        'decompressor_bytes': table_start + len(table)
+    }).ljust(table_start, b'\0') + table
+    image = (b'\xCC' * (junk_paragraphs * PARAGRAPH_BYTES)) + packed + code
+
+    schema = datalib.defs.EXE_HEADER_SCHEMA
+    header_size = 2 * PARAGRAPH_BYTES
+    total_size = header_size + len(image)
+    header = schema.pack({
+        'signature': datalib.lzexe.MZ_SIGNATURE,
+        'last_page_bytes': total_size % 512,
+        'page_count': -(-total_size // 512),
+        'relocation_count': 0,
+        'header_paragraphs': header_size // PARAGRAPH_BYTES,
+        'min_alloc_paragraphs': 0,
+        'max_alloc_paragraphs': 0xFFFF,
+        'initial_ss': 0,
+        'initial_sp': 0,
+        'checksum': 0,
+        'initial_ip': 0,
+        'initial_cs': initial_cs,
+        'relocation_offset': schema.size,
+        'overlay_number': 0
+    })
+
+    return (header + b'LZ91').ljust(header_size, b'\0') + image
+
+
+@pytest.mark.parametrize('junk_paragraphs', [0, 3])
+def test_read_exe_unpacks_lzexe(tmp_path, junk_paragraphs):
+    writer = StreamWriter()
+    for byte in b'Hello, world!':
+        writer.literal(byte)
+    writer.long_pointer(13, 13)
+    path = tmp_path / 'PACKED.EXE'
+    path.write_bytes(make_lz91_exe(writer.end(), junk_paragraphs))
+
+    exe = datalib.lzexe.read_exe(path)
+
+    assert exe.packed_version == 'LZ91'
+    assert exe.image == b'Hello, world!' * 2
+    assert (exe.header['initial_cs'], exe.header['initial_ip']) == (0x34, 0x12)
+    assert (exe.header['initial_ss'], exe.header['initial_sp']) == (0x56, 0x80)
+    assert exe.relocations.tolist() == [(5, 0), (5, 0x10)]
+
+    # Rewritten unpacked, it reads back the same
+    unpacked = tmp_path / 'UNPACKED.EXE'
+    unpacked.write_bytes(exe.to_bytes())
+    again = datalib.lzexe.read_exe(unpacked)
+    assert again.packed_version is None
+    assert again.image == exe.image
+    assert again.relocations.tolist() == exe.relocations.tolist()
@@ -0,0 +1,70 @@
+import datalib.defs
+import datalib.map
+from datalib.defs import FIRST_REAL_ACTOR_TYPE
+
+
+def map_parts(*actors, width=64, backdrop=3, music=7):
+    header = datalib.defs.MapHeaderStruct(
+        backdrop_id=backdrop, music_id=music, width_tiles=width, actor_size_words=3 * len(actors))
+    records = (datalib.defs.ActorStruct * len(actors))(
+        *(datalib.defs.ActorStruct(*act) for act in actors))
+
+    return header, records, bytes(64)
+
+
+def build_db():
+    db = datalib.map.MapDB()
+    db.insert('A1', *map_parts(
+        (0, 2, 10), (FIRST_REAL_ACTOR_TYPE + 5, 4, 9), (FIRST_REAL_ACTOR_TYPE + 5, 8, 9),
+        (FIRST_REAL_ACTOR_TYPE + 2, 6, 3)))
+    db.insert('A2', *map_parts(
+        (0, 1, 1), (FIRST_REAL_ACTOR_TYPE + 2, 7, 7), (FIRST_REAL_ACTOR_TYPE + 2, 9, 7),
+        (FIRST_REAL_ACTOR_TYPE + 9, 1, 5), (2, 3, 3)))
+    db.insert('A3', *map_parts((0, 1, 1)))
+
+    return db
+
+
+def test_insert_builds_indexes():
+    data = build_db().to_dict()
+
+    assert [row['actor_count'] for row in data['table']] == [4, 5, 1]
+    assert data['table'][1]['fountain_count'] == 1
+    assert data['index']['actor'] == {5: ['A1'], 2: ['A1', 'A2'], 9: ['A2']}
+    assert data['index']['special_actor'] == {0: ['A1', 'A2', 'A3'], 2: ['A2']}
+    assert data['sort']['actor'] == [2, 5, 9]
+
+
+def test_cross_index_counts_and_first_occurrence():
+    cross = build_db().to_dict()['cross']['actor']
+
+    assert cross['map_names'] == ['A1', 'A2', 'A3']
+    assert cross['actor_types'] == [2, 5, 9]
+    assert cross['counts'] == [[1, 2, 0], [2, 0, 0], [0, 1, 0]]
+
+    row = cross['table'][0]
+    assert row['actor_type'] == 2 and row['total'] == 3
+    assert row['maps'] == [{'map_name': 'A1', 'count': 1}, {'map_name': 'A2', 'count': 2}]
+    assert row['first_occurrence'] == {'map_name': 'A1', 'x_tiles': 6, 'y_tiles': 3}
+
+
+def test_cross_index_histogram_is_most_common_first():
+    cross = build_db().to_dict()['cross']['actor']
+
+    assert cross['histogram'] == {
+        'A1': [{'actor_type': 5, 'count': 2}, {'actor_type': 2, 'count': 1}],
+        'A2': [{'actor_type': 2, 'count': 2}, {'actor_type': 9, 'count': 1}],
+        'A3': []}
+
+
+def test_cross_index_special_actors():
+    cross = build_db().to_dict()['cross']['special_actor']
+
+    assert cross['actor_types'] == [0, 2]
+    assert cross['counts'] == [[1, 1, 1], [0, 1, 0]]
+
+
+def test_cross_index_without_maps():
+    cross = datalib.map.MapDB().build_cross_index(special=False)
+
+    assert cross['counts'] == [] and cross['table'] == [] and cross['histogram'] == {}
@@ -0,0 +1,136 @@
+import argparse
+
+import numpy as np
+import pytest
+
+import datalib.music
+from datalib.music import MUSIC_DTYPE, REPEAT_DTYPE
+
+
+def song(writes):
+    return np.array(writes, dtype=MUSIC_DTYPE)
+
+
+def naive_hash(tokens):
+    value = 0
+    for token in tokens:
+        value = (value * datalib.music.HASH_BASE + int(token)) % 2**64
+
+    return value
+
+
+def test_window_hashes_match_polynomial_hash():
+    rng = np.random.default_rng(1)
+    tokens = rng.integers(0, 2**32, 40).astype(np.uint64)
+
+    hashes = datalib.music.window_hashes(tokens, 5)
+
+    assert hashes.dtype == np.uint64
+    assert hashes.tolist() == [naive_hash(tokens[i:i + 5]) for i in range(36)]
+
+
+def test_window_hashes_short_input():
+    tokens = np.arange(3, dtype=np.uint64)
+
+    assert len(datalib.music.window_hashes(tokens, 4)) == 0
+    assert len(datalib.music.window_hashes(tokens, 3)) == 1
+
+
+def test_window_hashes_rejects_empty_window():
+    with pytest.raises(ValueError):
+        datalib.music.window_hashes(np.arange(3, dtype=np.uint64), 0)
+
+
+def test_window_writes_type():
+    assert datalib.music.window_writes('1') == 1
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        datalib.music.window_writes('0')
+
+
+def test_find_repeats_loop_and_shared_section():
+    phrase = [(0xA0, n, 10) for n in range(4)]
+    first = song([(0x01, 0x20, 5)] + phrase * 3)
+    second = song([(0xB0, 0xFF, 1), (0xB0, 0xFE, 2)] + phrase)
+
+    repeats = datalib.music.find_repeats([first, second], window=4)
+
+    assert repeats.dtype == REPEAT_DTYPE
+    assert repeats.tolist() == [
+        # The phrase plays again straight after itself, overlapping its source
+        (0, 5, 45, 8, 80, 0, 1, 5),
+        # The second song's copy points at the last time the phrase was heard
+        (1, 2, 3, 4, 40, 0, 9, 85)
+    ]
+
+
+def test_find_repeats_ignores_different_waits():
+    first = song([(0xA0, 1, 10), (0xA0, 2, 10)])
+    second = song([(0xA0, 1, 10), (0xA0, 2, 11)])
+
+    assert len(datalib.music.find_repeats([first, second], window=2)) == 0
+
+
+def test_find_repeats_too_short_to_match():
+    assert len(datalib.music.find_repeats([song([(0xA0, 1, 1)])], window=2)) == 0
+
+
+def test_find_repeats_whole_song_copy_is_one_section():
+    # The second song copies all of the first, and the first has a phrase of
+    # its own that comes back later. Matching each window with the last one
+    # like it would split the copy up where that phrase is.
+    writes = [(0xA0, n, 1) for n in range(9)]
+    first = song(writes + writes[2:8] + [(0xB0, n, 2) for n in range(12)])
+    second = song(first.tolist())
+
+    repeats = datalib.music.find_repeats([first, second], window=4)
+
+    assert repeats[['music', 'offset', 'writes', 'source_music', 'source_offset']].tolist() == [
+        (0, 9, 6, 0, 2),
+        (1, 0, 27, 0, 0)
+    ]
+
+
+def test_find_repeats_sections_do_not_overlap():
+    rng = np.random.default_rng(4)
+    songs = [song([(0xA0, n, 1) for n in rng.integers(0, 2, 200).tolist()]) for _ in range(3)]
+
+    repeats = datalib.music.find_repeats(songs, window=5)
+
+    assert len(repeats) > 10
+    assert (repeats['writes'] >= 5).all()
+    for music in range(3):
+        found = repeats[repeats['music'] == music]
+        assert (found['offset'][1:] >= found['offset'][:-1] + found['writes'][:-1]).all()
+    for repeat in repeats:
+        copy = songs[repeat['music']][repeat['offset']:][:repeat['writes']]
+        original = songs[repeat['source_music']][repeat['source_offset']:][:repeat['writes']]
+        assert len(copy) == repeat['writes']
+        assert (copy == original).all()
+
+
+def test_decode_notes():
+    records = song([
+        (0x20, 0x01, 0),  # Channel 0 modulator, part of the instrument
+        (0xA0, 0x44, 0),
+        (0xB0, 0x32, 100),  # Key on, block 4, fnum 244h (A4)
+        (0xB0, 0x12, 50),  # Key off
+        (0xA1, 0x44, 0),
+        (0xB1, 0x36, 20),  # Key on, block 5 (A5), never keyed off
+        (0xBD, 0x30, 10),  # Rhythm mode, bass drum on
+        (0xBD, 0x20, 10),
+        (0xBD, 0x30, 0)
+    ])
+
+    events, instruments, percussion = datalib.music.decode_notes(records)
+
+    assert events[['channel', 'start', 'duration', 'block', 'fnum', 'note']].tolist() == [
+        (0, 0, 100, 4, 0x244, 69),
+        (1, 150, 40, 5, 0x244, 81)
+    ]
+    # Only channel 0 had its modulator set, so the two notes use different
+    # instruments, numbered in order of first use
+    assert events['instrument'].tolist() == [0, 1]
+    assert instruments[0][0] == 0x01
+    assert not instruments[1].any()
+    assert percussion == {'bass_drum': 2}
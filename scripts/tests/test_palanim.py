@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import datalib.defs
+import datalib.map
+import datalib.palanim
+from datalib.palanim import (
+    BLACK, DARKGRAY, LIGHTGRAY, PALETTE_KEY_INDEX, PALETTE_TABLES, TRANSPARENT_INDEX, WHITE)
+
+
+def test_key_color_sequence_starts_one_entry_in():
+    assert datalib.palanim.key_color_sequence(4) == PALETTE_TABLES[4][1:] + PALETTE_TABLES[4][:1]
+
+
+def test_key_color_sequence_lightning_fades_out():
+    colors = datalib.palanim.key_color_sequence(datalib.palanim.PAL_ANIM_LIGHTNING, seed=1)
+
+    assert len(colors) == datalib.palanim.LIGHTNING_FRAMES
+    assert colors == datalib.palanim.key_color_sequence(datalib.palanim.PAL_ANIM_LIGHTNING, seed=1)
+    for i, color in enumerate(colors[:-2]):
+        if color == WHITE:
+            assert colors[i + 1:i + 3] == [LIGHTGRAY, DARKGRAY]
+
+
+def test_collapse_runs():
+    assert datalib.palanim.collapse_runs([1, 1, 2, 1, 1, 1]) == [[1, 2], [2, 1], [1, 3]]
+
+
+def test_build_frames_covers_only_key_pixels():
+    image = np.zeros((8, 8), dtype=np.uint8)
+    image[2, 3] = image[4, 5] = PALETTE_KEY_INDEX
+
+    frames = datalib.palanim.build_frames(image, [BLACK, BLACK, WHITE])
+
+    assert len(frames) == 2
+    assert frames[0][0][2, 3] == BLACK and frames[0][0][0, 0] == 0
+    pixels, left, top, _ = frames[1]
+    assert (left, top, pixels.shape) == (3, 2, (3, 3))
+    assert pixels[0, 0] == pixels[2, 2] == WHITE
+    assert pixels[1, 1] == TRANSPARENT_INDEX
+
+
+def test_build_frames_without_key_pixels():
+    frames = datalib.palanim.build_frames(np.zeros((8, 8), dtype=np.uint8), [BLACK, WHITE])
+
+    assert len(frames) == 1
+
+
+def test_unknown_animation_ids_are_skipped(tmp_path, monkeypatch):
+    for name in datalib.defs.BACKDROP_FILES:
+        (tmp_path / name).write_bytes(b'')
+    rows = [
+        {'map_name': 'A1.MNI', 'backdrop_id': 0, 'palette_animation_id': 0},
+        {'map_name': 'A2.MNI', 'backdrop_id': 0, 'palette_animation_id': 7}]
+    monkeypatch.setattr(
+        datalib.map, 'parse_map_data', lambda dirname: SimpleNamespace(table=rows))
+
+    db = datalib.palanim.parse_palette_animation_data(tmp_path, tmp_path / 'out')
+
+    assert db.to_dict()['table'] == []
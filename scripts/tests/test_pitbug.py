@@ -0,0 +1,62 @@
+import numpy as np
+
+import datalib.defs
+import datalib.pitbug
+from datalib.tileattr import TILE_VALUE_SCALE, TILEATTR_SIZE
+
+WIDTH = 64
+HEIGHT = 0x8000 // WIDTH
+FLOOR = 8  # Tile value that blocks southward movement
+
+
+def write_map(path, grid):
+    header = datalib.defs.MapHeaderStruct(width_tiles=WIDTH)
+    path.write_bytes(bytes(header) + grid.astype('<u2').tobytes())
+
+
+def write_tileattr(path):
+    data = np.zeros(TILEATTR_SIZE, dtype=np.uint8)
+    data[FLOOR // TILE_VALUE_SCALE] = 0x01
+    path.write_bytes(data.tobytes())
+
+
+def test_find_wrap_landings():
+    blocked = np.zeros((10, 8), dtype=bool)
+    blocked[8, :4] = True  # Solid ground on the last row they can fall from
+    blocked[1, 6] = True  # Something to land on after wrapping around
+
+    pits, x_tiles, y_tiles = datalib.pitbug.find_wrap_landings(blocked)
+
+    assert pits.tolist() == [False, False, False, False, True, True]
+    assert x_tiles.tolist() == [4, 5]
+    assert y_tiles.tolist() == [1, 1]
+
+
+def test_first_landing_row_wins():
+    blocked = np.zeros((10, 3), dtype=bool)
+    blocked[0:3, 1] = True
+
+    _, x_tiles, y_tiles = datalib.pitbug.find_wrap_landings(blocked)
+
+    assert (x_tiles.tolist(), y_tiles.tolist()) == ([0], [0])
+
+
+def test_parse_pit_bug_data(tmp_path):
+    safe = np.zeros((HEIGHT, WIDTH), dtype=np.uint16)
+    safe[HEIGHT - 2] = FLOOR
+    buggy = safe.copy()
+    buggy[HEIGHT - 2, 10:20] = 0
+    buggy[2, 15] = FLOOR
+    write_map(tmp_path / 'A1.MNI', safe)
+    write_map(tmp_path / 'A2.MNI', buggy)
+    write_tileattr(tmp_path / 'TILEATTR.MNI')
+
+    db = datalib.pitbug.parse_pit_bug_data(
+        [tmp_path / 'A1.MNI', tmp_path / 'A2.MNI'], tmp_path / 'TILEATTR.MNI', jobs=1)
+
+    result = db.to_dict()
+    a1, a2 = result['table']
+    assert (a1['map_name'], a1['pit_count'], a1['hit_count']) == ('A1', 0, 0)
+    assert (a2['pit_count'], a2['hit_count']) == (8, 3)
+    assert a2['hits'][0] == {'x_tiles': 13, 'y_tiles': 2, 'player_y_tiles': HEIGHT + 2}
+    assert result['sort']['hit_count'] == ['A2']
@@ -0,0 +1,93 @@
+import gzip
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import brotli
+import zstandard
+
+import precompress
+
+SCRIPT = Path(__file__).resolve().parents[1] / 'precompress.py'
+PAGE = b'<html><body>' + b'<p>Hello, world!</p>' * 200 + b'</body></html>'
+
+
+def run(root, cache):
+    return subprocess.run(
+        [sys.executable, SCRIPT, root, '-c', cache, '-j', '2'], capture_output=True, text=True)
+
+
+def test_compress_file_writes_every_encoding(tmp_path):
+    path = tmp_path / 'index.html'
+    path.write_bytes(PAGE)
+
+    digest, size, sizes = precompress.compress_file(path, None)
+
+    assert size == len(PAGE)
+    assert gzip.decompress((tmp_path / 'index.html.gz').read_bytes()) == PAGE
+    assert brotli.decompress((tmp_path / 'index.html.br').read_bytes()) == PAGE
+    assert zstandard.ZstdDecompressor().decompress((tmp_path / 'index.html.zst').read_bytes()) == PAGE
+    assert sizes == {ext: (tmp_path / f'index.html.{ext}').stat().st_size for ext in sizes}
+    assert (tmp_path / 'index.html.gz').stat().st_mtime_ns == path.stat().st_mtime_ns
+
+    assert precompress.compress_file(path, digest) == (digest, len(PAGE), None)
+
+
+def test_incompressible_files_get_no_copies(tmp_path):
+    path = tmp_path / 'tiny.txt'
+    path.write_bytes(b'x')
+
+    _, _, sizes = precompress.compress_file(path, None)
+
+    assert sizes == {'gz': 1, 'br': 1, 'zst': 1}
+    assert [p.name for p in tmp_path.iterdir()] == ['tiny.txt']
+
+
+def test_cache_round_trip(tmp_path):
+    cache = tmp_path / 'cache.json'
+    entries = {'index.html': {'digest': 'abc', 'size': 10, 'sizes': {'gz': 5}}}
+
+    assert precompress.read_cache(cache) == {}
+    precompress.write_cache(cache, entries)
+    assert precompress.read_cache(cache) == entries
+
+    cache.write_text('{"version": 0, "entries": {}}')
+    assert precompress.read_cache(cache) == {}
+
+
+def test_remove_stale(tmp_path):
+    for name in ('gone.html.gz', 'gone.html.br', 'kept.html.gz'):
+        (tmp_path / name).write_bytes(b'')
+    cache = {'gone.html': {}, 'kept.html': {}}
+
+    assert precompress.remove_stale(tmp_path, cache, {'kept.html'}) == 2
+    assert [p.name for p in tmp_path.iterdir()] == ['kept.html.gz']
+
+
+def test_only_changed_or_missing_files_are_recompressed(tmp_path):
+    root = tmp_path / 'public'
+    (root / 'css').mkdir(parents=True)
+    (root / 'index.html').write_bytes(PAGE)
+    (root / 'css' / 'site.css').write_bytes(b'body { color: black; }\n' * 50)
+    (root / 'logo.png').write_bytes(b'\x89PNG')
+    cache = tmp_path / 'cache.json'
+
+    result = run(root, cache)
+    assert result.returncode == 0
+    assert '2 file(s) compressed, 0 unchanged, 0 stale' in result.stderr
+    assert not (root / 'logo.png.gz').exists()
+
+    result = run(root, cache)
+    assert '0 file(s) compressed, 2 unchanged' in result.stderr
+
+    (root / 'index.html.br').unlink()
+    (root / 'css' / 'site.css').write_bytes(b'body { color: white; }\n' * 50)
+    result = run(root, cache)
+    assert '2 file(s) compressed, 0 unchanged' in result.stderr
+    assert (root / 'index.html.br').exists()
+
+    os.remove(root / 'index.html')
+    result = run(root, cache)
+    assert '0 file(s) compressed, 1 unchanged, 3 stale' in result.stderr
+    assert sorted(p.name for p in root.iterdir()) == ['css', 'logo.png']
@@ -0,0 +1,54 @@
+from argparse import Namespace
+
+import pytest
+
+import datalib.profiling
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    profiler = datalib.profiling.Profiler()
+    monkeypatch.setattr(datalib.profiling, '_active', profiler)
+    profiler.start()
+    yield profiler
+    profiler.stop()
+
+
+def test_nothing_is_timed_when_off():
+    assert datalib.profiling._active is None
+    assert list(datalib.profiling.files(['a', 'b'])) == ['a', 'b']
+    assert not datalib.profiling.start(Namespace(profile=False, profile_trace=None, profile_stats=None))
+
+
+def test_phases_nest(profiler):
+    with datalib.profiling.phase('outer'):
+        with datalib.profiling.phase('inner'):
+            data = bytearray(100000)
+        del data
+
+    inner, outer = profiler.phases
+    assert (inner.name, outer.name) == ('inner', 'outer')
+    assert outer.start <= inner.start <= inner.end <= outer.end
+    assert outer.mem_peak - outer.mem_start >= 100000
+    assert profiler.stack == []
+
+
+def test_files_leave_the_stack_alone(profiler):
+    for path in datalib.profiling.files(['dir/a.mni', 'dir/b.mni', 'dir/c.mni']):
+        with datalib.profiling.phase('parse'):
+            pass
+        if path.endswith('b.mni'):
+            break
+
+    assert profiler.stack == []
+    assert [(phase.name, phase.category) for phase in profiler.phases] == [
+        ('parse', 'phase'), ('a.mni', 'file'), ('parse', 'phase'), ('b.mni', 'file')]
+
+
+def test_summary_lists_phases_and_files(profiler):
+    with datalib.profiling.phase('map.run'):
+        list(datalib.profiling.files(['dir/a.mni']))
+
+    summary = profiler.summary()
+    assert 'map.run' in summary
+    assert 'a.mni' in summary
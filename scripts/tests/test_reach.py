@@ -0,0 +1,79 @@
+import numpy as np
+
+import datalib.reach
+import datalib.tileattr
+from datalib.defs import FIRST_REAL_ACTOR_TYPE
+from datalib.map import ACTOR_DTYPE
+
+WALL = 8  # Tile value whose attribute byte blocks every direction
+
+
+def tile_masks():
+    attributes = np.zeros(datalib.tileattr.TILEATTR_SIZE, dtype=np.uint8)
+    attributes[WALL // datalib.tileattr.TILE_VALUE_SCALE] = 0x0F
+
+    return datalib.tileattr.flag_masks(attributes)
+
+
+def room(height=12, width=20):
+    # Open space with a solid floor along the bottom row
+    grid = np.zeros((height, width), dtype=np.uint16)
+    grid[-1] = WALL
+
+    return grid
+
+
+def actors(*records):
+    return np.array(list(records), dtype=ACTOR_DTYPE)
+
+
+def test_shift_fills_from_the_edge():
+    grid = np.eye(3, dtype=bool)
+
+    assert (datalib.reach.shift(grid, 0, 1) == np.eye(3, k=1, dtype=bool)).all()
+    assert (datalib.reach.shift(grid, 1, 0) == np.eye(3, k=-1, dtype=bool)).all()
+
+
+def test_sweep_stops_at_impassable_cells():
+    reached = np.array([[True, False, False, False, False]])
+    passable = np.array([[True, True, False, True, True]])
+
+    assert datalib.reach.sweep(reached, passable, axis=1).tolist() == \
+        [[True, True, False, False, False]]
+
+
+def test_walks_the_whole_floor():
+    grid = room()
+    records = actors(
+        (datalib.reach.PLAYER_TYPE, 2, 10),
+        (FIRST_REAL_ACTOR_TYPE, 17, 10),
+        (FIRST_REAL_ACTOR_TYPE + 1, 17, 0))
+
+    stats = datalib.reach.reachability_stats(grid, records, tile_masks())
+
+    assert stats['actor_count'] == 2
+    assert stats['reachable_actor_count'] == 1
+    assert stats['unreachable_actors'] == [{'actor_type': 1, 'x_tiles': 17, 'y_tiles': 0}]
+
+
+def test_walls_block_the_way():
+    grid = room()
+    grid[:, 10] = WALL
+    records = actors((datalib.reach.PLAYER_TYPE, 2, 10), (FIRST_REAL_ACTOR_TYPE, 17, 10))
+
+    stats = datalib.reach.reachability_stats(grid, records, tile_masks())
+
+    assert stats['reachable_actor_count'] == 0
+
+
+def test_player_outside_the_map_is_clamped():
+    grid = room()
+    records = actors((datalib.reach.PLAYER_TYPE, 500, 500))
+
+    stats = datalib.reach.reachability_stats(grid, records, tile_masks())
+
+    assert stats['position_count'] > 0
+
+
+def test_no_player():
+    assert datalib.reach.reachability_stats(room(), actors(), tile_masks()) is None
@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+
+import pytest
+
+import renumber
+
+
+def spread(weights, min_gap):
+    articles = [SimpleNamespace(weight=w) for w in weights]
+
+    return renumber.spread_weights(articles, renumber.find_anchors(weights, min_gap))
+
+
+def test_find_anchors_keeps_everything_already_spaced():
+    assert renumber.find_anchors([10, 20, 30, 40], 5) == {0, 1, 2, 3}
+
+
+def test_find_anchors_moves_the_fewest():
+    # Only one of 21, 22, and 23 can stay; on a tie the later one is kept
+    assert renumber.find_anchors([10, 21, 22, 23, 50, 60], 5) == {0, 2, 4, 5}
+
+
+def test_find_anchors_leaves_room_at_the_start():
+    # Two articles have to fit below 8, so it can't stay at a gap of 5
+    assert renumber.find_anchors([1, 2, 8, 40], 5) == {3}
+
+
+def test_find_anchors_empty():
+    assert renumber.find_anchors([], 5) == set()
+
+
+def test_spread_weights_opens_up_gaps():
+    new_weights = spread([10, 21, 22, 23, 50, 60, 61], 5)
+
+    assert new_weights == [10, 16, 22, 36, 50, 55, 61]
+    assert all(b - a >= 5 for a, b in zip([0] + new_weights, new_weights))
+
+
+def test_renumber_group_minimal(tmp_path):
+    paths = []
+    for name, weight in (('a', 10), ('b', 20), ('c', 21), ('d', 40)):
+        path = tmp_path / f'{name}.md'
+        path.write_text(f'+++\ntitle = "{name}"\nweight = {weight}\n+++\n\nBody\n')
+        paths.append(path)
+
+    log, rewritten, untouched, stopped = renumber.renumber_group(paths, True, 5)
+
+    assert (rewritten, untouched, stopped) == (1, 3, False)
+    assert (tmp_path / 'b.md').read_text() == '+++\ntitle = "b"\nweight = 15\n+++\n\nBody\n'
+    assert 'weight = 21' in (tmp_path / 'c.md').read_text()
+
+
+def test_rewrite_cleans_up_when_open_fails(tmp_path, monkeypatch):
+    path = tmp_path / 'a.md'
+    path.write_text('+++\nweight = 10\n+++\n')
+    article = renumber.Article(path)
+    article.set_weight(20)
+    closed = []
+
+    def fail_fdopen(fd, *args, **kwargs):
+        raise OSError('no more files')
+
+    real_close = renumber.os.close
+    monkeypatch.setattr(renumber.os, 'fdopen', fail_fdopen)
+    monkeypatch.setattr(renumber.os, 'close', lambda fd: closed.append(fd) or real_close(fd))
+
+    with pytest.raises(OSError):
+        article.rewrite()
+
+    assert len(closed) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ['a.md']
+    assert path.read_text() == '+++\nweight = 10\n+++\n'
+
+
+def write_page(path, weight=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    front = f'weight = {weight}\n' if weight is not None else ''
+    path.write_text(f'+++\ntitle = "{path.stem}"\n{front}+++\n')
+
+
+def test_find_section(tmp_path):
+    write_page(tmp_path / 'topic' / '_index.md', 10)
+    write_page(tmp_path / 'topic' / 'sub' / 'page.md', 10)
+
+    assert renumber.find_section(tmp_path / 'top.md', tmp_path) == '.'
+    assert renumber.find_section(tmp_path / 'topic' / '_index.md', tmp_path) == '.'
+    assert renumber.find_section(tmp_path / 'topic' / 'sub' / 'page.md', tmp_path) == 'topic'
+
+
+def test_renumber_group_reports_missing_before_duplicates(tmp_path):
+    write_page(tmp_path / 'a.md', 10)
+    write_page(tmp_path / 'b.md', 10)
+    write_page(tmp_path / 'c.md')
+
+    log, rewritten, untouched, stopped = renumber.renumber_group(
+        sorted(tmp_path.iterdir()), False, 5)
+
+    assert (rewritten, untouched, stopped) == (0, 0, True)
+    assert len(log) == 1 and log[0].startswith('Missing weight in')
+
+
+def run_main(tmp_path, monkeypatch, *argv):
+    monkeypatch.setattr(renumber, '__file__', str(tmp_path / 'scripts' / 'renumber.py'))
+    monkeypatch.setattr(renumber.sys, 'argv', ['renumber.py', *argv])
+    renumber.main()
+
+
+def test_main_per_section_is_partial(tmp_path, monkeypatch, capsys):
+    content = tmp_path / 'src' / 'content'
+    write_page(content / 'good' / '_index.md', 10)
+    write_page(content / 'good' / 'a.md', 10)
+    write_page(content / 'good' / 'b.md', 15)
+    write_page(content / 'bad' / '_index.md', 20)
+    write_page(content / 'bad' / 'a.md', 10)
+    write_page(content / 'bad' / 'b.md', 10)
+
+    with pytest.raises(renumber.PartialRun):
+        run_main(tmp_path, monkeypatch, '--per-section', '--jobs', '1')
+
+    assert 'weight = 20' in (content / 'good' / 'b.md').read_text()
+    assert 'weight = 10' in (content / 'bad' / 'b.md').read_text()
+    assert 'Skipped section(s) with problems: bad' in capsys.readouterr().out
+
+
+def test_main_stops_before_rewriting(tmp_path, monkeypatch):
+    content = tmp_path / 'src' / 'content'
+    write_page(content / 'a.md', 10)
+    write_page(content / 'b.md', 15)
+    write_page(content / 'c.md', 15)
+
+    with pytest.raises(renumber.SafetyStop):
+        run_main(tmp_path, monkeypatch)
+
+    assert 'weight = 10' in (content / 'a.md').read_text()
+    assert 'weight = 15' in (content / 'b.md').read_text()
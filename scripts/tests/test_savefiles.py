@@ -0,0 +1,84 @@
+import pytest
+
+import datalib.config
+import datalib.defs
+import datalib.save
+
+CONFIG_HEADER = bytes([0x48, 0x50, 0x4B, 0x4D, 0x1D, 0x38, 1, 0])
+
+
+def high_score_table(separator=b' '):
+    return b''.join(
+        b'%d%s%s\n' % (score, separator, name)
+        for score, name in zip(range(100000, 0, -10000), [b'DEV', b'\x8eBC'] + [b'BOB'] * 8))
+
+
+def write(path, data):
+    path.write_bytes(data)
+
+    return str(path)
+
+
+def save_record(**fields):
+    record = {
+        'health': 3, 'score': 123456, 'stars': 7, 'level_num': 4, 'bombs': 2,
+        'max_health': 4, 'used_cheat_flag': 0, 'saw_bomb_hint_flag': 1,
+        'saw_pounce_hint_state': 2, 'saw_powerup_hint_flag': 0}
+    record.update(fields)
+    record.setdefault(
+        'checksum', sum(record[field] for field in datalib.save.CHECKSUM_FIELDS) & 0xFFFF)
+
+    return datalib.defs.SAVE_SCHEMA.pack(record)
+
+
+def test_save_round_trip(tmp_path):
+    files = [
+        write(tmp_path / 'COSMO1.SV1', save_record()),
+        write(tmp_path / 'COSMO1.SV2', save_record(score=0xFFFFFFFF, checksum=1))
+    ]
+
+    db = datalib.save.parse_save_data(files)
+
+    first, second = db.table
+    assert (first['save_name'], first['score'], first['level_num']) == ('COSMO1.SV1', 123456, 4)
+    assert (first['checksum_valid_flag'], first['round_trip_flag']) == (1, 1)
+    assert (second['checksum_valid_flag'], second['round_trip_flag']) == (0, 1)
+    assert db.to_dict()['summary']['max_score'] == 0xFFFFFFFF
+
+
+def test_save_wrong_size(tmp_path):
+    with pytest.raises(ValueError):
+        datalib.save.parse_save_data([write(tmp_path / 'COSMO1.SV1', save_record() + b'\0')])
+
+
+def test_config_round_trip(tmp_path):
+    files = [
+        write(tmp_path / 'a.CFG', CONFIG_HEADER + high_score_table()),
+        write(tmp_path / 'b.CFG', CONFIG_HEADER + high_score_table(b'\t') + b'\x1a'),
+        # An empty score comes back as 0, so this one can't be rewritten as-is
+        write(tmp_path / 'c.CFG', CONFIG_HEADER + b' NOBODY\n' + high_score_table().split(b'\n', 1)[1])
+    ]
+
+    db = datalib.config.parse_config_data(files)
+
+    a, b, c = db.table
+    assert a['scancode_jump'] == 0x1D
+    assert a['high_scores'][1] == {'score': 90000, 'separator': ' ', 'name': 'ÄBC'}
+    assert [row['round_trip_flag'] for row in db.table] == [1, 1, 0]
+    assert (b['high_scores'][0]['separator'], b['trailer']) == ('\t', '\x1a')
+    assert c['high_scores'][0] == {'score': 0, 'separator': ' ', 'name': 'NOBODY'}
+    assert c['high_scores'][1]['score'] == 90000
+
+    summary = db.to_dict()['summary']
+    assert (summary['config_count'], summary['max_score']) == (3, 100000)
+    assert summary['common_names'][0] == {'name': 'BOB', 'count': 24}
+
+
+def test_config_short_high_score_table(tmp_path):
+    files = [
+        write(tmp_path / 'a.CFG', CONFIG_HEADER + high_score_table()),
+        write(tmp_path / 'b.CFG', CONFIG_HEADER + high_score_table()[:-1])
+    ]
+
+    with pytest.raises(ValueError, match='b.CFG'):
+        datalib.config.parse_config_data(files)
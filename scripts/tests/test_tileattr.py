@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import datalib.defs
+import datalib.map
+import datalib.tileattr
+from datalib.tileattr import (
+    MASKED_TILE_STRIDE, SOLID_TILE_COUNT, TILE_FLAGS, TILE_VALUE_SCALE, TILEATTR_SIZE)
+
+
+def attributes(**values):
+    # Attribute bytes keyed by the tile value that lands on them
+    data = np.zeros(TILEATTR_SIZE, dtype=np.uint8)
+    for tile_value, attrs in values.items():
+        data[int(tile_value[1:]) // TILE_VALUE_SCALE] = attrs
+
+    return data
+
+
+def test_read_tile_attributes_checks_size(tmp_path):
+    path = tmp_path / 'TILEATTR.MNI'
+    path.write_bytes(bytes(TILEATTR_SIZE - 1))
+
+    with pytest.raises(ValueError):
+        datalib.tileattr.read_tile_attributes(path)
+
+
+def test_flag_masks_bit_order():
+    masks = datalib.tileattr.flag_masks(np.array([0x01, 0x80, 0x12], dtype=np.uint8))
+
+    assert masks[0].tolist() == [True] + [False] * 7
+    assert masks[1, TILE_FLAGS.index('can_cling')]
+    assert [TILE_FLAGS[i] for i in np.flatnonzero(masks[2])] == ['block_north', 'slippery']
+
+
+def test_lookup_flags_past_the_end_has_no_flags():
+    masks = datalib.tileattr.flag_masks(np.full(TILEATTR_SIZE, 0xFF, dtype=np.uint8))
+    tile_values = np.array([0, 8, TILEATTR_SIZE * TILE_VALUE_SCALE, 0xFFFF], dtype=np.uint16)
+
+    assert datalib.tileattr.lookup_flags(tile_values, masks).any(axis=1).tolist() == \
+        [True, True, False, False]
+
+
+def test_count_flags():
+    masks = datalib.tileattr.flag_masks(attributes(t8=0x0F, t16=0x10))
+    tile_values = np.array([0, 8, 8, 16, 8], dtype=np.uint16)
+
+    counts = dict(zip(TILE_FLAGS, datalib.tileattr.count_flags(tile_values, masks).tolist()))
+
+    assert counts['block_south'] == 3
+    assert counts['slippery'] == 1
+    assert counts['in_front'] == 0
+
+
+def test_to_dict_only_lists_meaningful_bytes():
+    data = attributes(t8=0x0F)
+    data[SOLID_TILE_COUNT + 1] = 0xFF  # Padding between masked tiles
+    db = datalib.tileattr.TileAttributeDB(data)
+
+    result = db.to_dict()
+
+    masked_values = [row['tile_value'] for row in result['table'][SOLID_TILE_COUNT:]]
+    assert len(result['table']) == SOLID_TILE_COUNT + 1000
+    assert masked_values[:2] == [
+        SOLID_TILE_COUNT * TILE_VALUE_SCALE,
+        (SOLID_TILE_COUNT + MASKED_TILE_STRIDE) * TILE_VALUE_SCALE]
+    assert result['index']['block_west'] == [8]
+    assert result['index']['can_cling'] == []
+    assert result['summary']['behaviors'][:2] == [
+        {'attributes': 0, 'count': 2999}, {'attributes': 0x0F, 'count': 1}]
+
+
+def test_save_round_trip(tmp_path):
+    db = datalib.tileattr.TileAttributeDB(attributes(t8=0x0F))
+
+    db.save(tmp_path / 'tileattr.npz')
+
+    with np.load(tmp_path / 'tileattr.npz') as saved:
+        assert (saved['attributes'] == db.attributes).all()
+        assert saved['block_south'][1] and not saved['block_south'][0]
+
+
+def test_map_tile_stats():
+    masks = datalib.tileattr.flag_masks(attributes(t8=0x0F))
+    db = datalib.map.MapDB(masks)
+    header = datalib.defs.MapHeaderStruct(width_tiles=64)
+    tiles = np.array([8, 8, 0, 16], dtype='<u2').tobytes()
+
+    db.insert('A1', header, (datalib.defs.ActorStruct * 0)(), tiles)
+
+    stats = db.table[0]['tile_stats']
+    assert stats['tile_count'] == 4
+    assert stats['flag_counts']['block_east'] == 2
+    assert stats['flag_percents']['block_east'] == 50.0
@@ -0,0 +1,99 @@
+import stat
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / 'transcode.py'
+
+# Takes FFmpeg's arguments, copies the input to the output, and notes each run
+# in calls.log. Inputs that start with FAIL are rejected.
+STUB_ENCODER = f'''#!{sys.executable}
+import sys
+from pathlib import Path
+
+source = Path(sys.argv[sys.argv.index('-i') + 1])
+destination = Path(sys.argv[-1])
+with open(Path(__file__).parent / 'calls.log', 'a') as f:
+    f.write(source.name + '\\n')
+
+data = source.read_bytes()
+if data.startswith(b'FAIL'):
+    sys.exit('unsupported input')
+destination.write_bytes(data)
+'''
+
+
+@pytest.fixture
+def encoder(tmp_path):
+    stub = tmp_path / 'encoder'
+    stub.write_text(STUB_ENCODER)
+    stub.chmod(stub.stat().st_mode | stat.S_IXUSR)
+
+    return stub
+
+
+def transcode(encoder, *wav_files):
+    return subprocess.run(
+        [sys.executable, SCRIPT, '-e', encoder, '-j', '2', *wav_files],
+        capture_output=True, text=True)
+
+
+def calls(encoder):
+    log = encoder.parent / 'calls.log'
+    lines = log.read_text().splitlines() if log.exists() else []
+    log.unlink(missing_ok=True)
+
+    return sorted(lines)
+
+
+def test_encodes_then_skips_unchanged(tmp_path, encoder):
+    wav = tmp_path / 'song.wav'
+    wav.write_bytes(b'RIFF one')
+
+    result = transcode(encoder, wav)
+    assert result.returncode == 0
+    assert f'{tmp_path / "song.mp3"}: encoded' in result.stdout
+    assert (tmp_path / 'song.m4a').read_bytes() == b'RIFF one'
+    assert calls(encoder) == ['song.wav', 'song.wav']
+
+    result = transcode(encoder, wav)
+    assert result.returncode == 0
+    assert f'{tmp_path / "song.mp3"}: unchanged' in result.stdout
+    assert calls(encoder) == []
+
+
+def test_changed_wav_is_encoded_again(tmp_path, encoder):
+    wav = tmp_path / 'song.wav'
+    wav.write_bytes(b'RIFF one')
+    transcode(encoder, wav)
+    calls(encoder)
+
+    wav.write_bytes(b'RIFF two')
+    result = transcode(encoder, wav)
+
+    assert result.returncode == 0
+    assert f'{tmp_path / "song.mp3"}: encoded' in result.stdout
+    assert (tmp_path / 'song.mp3').read_bytes() == b'RIFF two'
+    assert calls(encoder) == ['song.wav', 'song.wav']
+
+
+def test_failed_encode(tmp_path, encoder):
+    good = tmp_path / 'good.wav'
+    good.write_bytes(b'RIFF good')
+    bad = tmp_path / 'bad.wav'
+    bad.write_bytes(b'FAIL')
+
+    result = transcode(encoder, good, bad)
+
+    assert result.returncode == 1
+    assert f'{tmp_path / "bad.mp3"}: failed' in result.stdout
+    assert f'{tmp_path / "good.mp3"}: encoded' in result.stdout
+    assert 'unsupported input' in result.stderr
+    assert sorted(path.name for path in tmp_path.glob('bad*')) == ['bad.wav']
+
+    # Failures aren't cached, so they are tried again next time
+    calls(encoder)
+    transcode(encoder, good, bad)
+    assert calls(encoder) == ['bad.wav', 'bad.wav']
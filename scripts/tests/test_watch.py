@@ -0,0 +1,73 @@
+import os
+import sys
+from argparse import Namespace
+
+import pytest
+
+import datalib.watch
+
+
+def test_input_paths_skips_outputs(tmp_path):
+    args = Namespace(
+        dirname=str(tmp_path / 'data'), files=['a.mni', 'b.mni'], outdir=str(tmp_path / 'out'),
+        jobs=4, polling=False)
+
+    assert datalib.watch.input_paths(args) == [
+        str(tmp_path / 'data'), os.path.abspath('a.mni'), os.path.abspath('b.mni')]
+
+
+def test_watch_root_climbs_to_an_existing_directory(tmp_path):
+    assert datalib.watch.watch_root(str(tmp_path)) == str(tmp_path)
+    assert datalib.watch.watch_root(str(tmp_path / 'not' / 'yet.mni')) == str(tmp_path)
+
+
+def test_is_affected():
+    changed = {os.path.join('data', 'maps', 'A1.MNI')}
+
+    assert datalib.watch.is_affected(changed, 'data')
+    assert datalib.watch.is_affected(changed, os.path.join('data', 'maps', 'A1.MNI'))
+    assert not datalib.watch.is_affected(changed, 'dat')
+
+
+def test_read_job_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA', 'game')
+    jobfile = tmp_path / 'jobs.txt'
+    jobfile.write_text('# comment\n\nmap -d $DATA > map.json\n')
+
+    assert datalib.watch.read_job_file(jobfile) == [(['map', '-d', 'game'], 'map.json')]
+
+    jobfile.write_text('map -d game\n')
+    with pytest.raises(ValueError):
+        datalib.watch.read_job_file(jobfile)
+
+
+def test_polling_watcher_sees_changes(tmp_path):
+    existing = tmp_path / 'a.mni'
+    existing.write_bytes(b'a')
+    watcher = datalib.watch.PollingWatcher([str(tmp_path)], interval=0)
+
+    assert watcher.read(0) == set()
+
+    existing.write_bytes(b'ab')
+    (tmp_path / 'b.mni').write_bytes(b'b')
+    assert watcher.read(0) == {str(existing), str(tmp_path / 'b.mni')}
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux-only')
+def test_inotify_overflow_reports_everything(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'a.mni').write_bytes(b'a')
+    watched_file = tmp_path / 'jobs.txt'
+    watched_file.write_text('')
+    watcher = datalib.watch.InotifyWatcher([str(tmp_path / 'sub'), str(watched_file)])
+
+    # Stand in for the inotify descriptor with a pipe holding one overflow event
+    read_fd, write_fd = os.pipe()
+    os.close(watcher.fd)
+    watcher.fd = read_fd
+    os.write(write_fd, datalib.watch.EVENT_STRUCT.pack(-1, datalib.watch.IN_Q_OVERFLOW, 0, 0))
+    os.close(write_fd)
+
+    assert watcher.read(0) == {
+        str(tmp_path / 'sub'), str(tmp_path / 'sub' / 'a.mni'), str(watched_file)}
+    watcher.close()
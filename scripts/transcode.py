@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# WAV -> MP3/M4A for the web, with FFmpeg's default encoders at quality 4
+# ("good enough"). An output is skipped when the WAV's contents, the encoder,
+# and its options are all the same as last time, which is tracked in a small
+# JSON file next to the outputs; WAV mtimes are useless here, since the
+# generators rewrite every file on every run.
+
+FFMPEG_BIN = os.environ.get('FFMPEG_BIN', 'ffmpeg')
+CACHE_FILE = '.transcode-cache.json'
+
+FORMATS = {
+    'mp3': ['-q:a', '4'],
+    'm4a': ['-q:a', '4']
+}
+
+
+def file_sha(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def encode(encoder, source, destination, options):
+    # Write to a temporary name first so an interrupted run never leaves a
+    # truncated file that looks finished. The extension stays last because
+    # FFmpeg picks the container from it.
+    base, ext = os.path.splitext(destination)
+    temp_file = f'{base}.{os.getpid()}.tmp{ext}'
+
+    cmd = [encoder, '-y', '-loglevel', 'error', '-i', source, *options, temp_file]
+    try:
+        subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL, capture_output=True)
+    except subprocess.CalledProcessError:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+    os.replace(temp_file, destination)
+
+
+def transcode_all(wav_files, outdir=None, encoder=FFMPEG_BIN, jobs=None, formats=FORMATS):
+    if shutil.which(encoder) is None:
+        raise FileNotFoundError(f'encoder {encoder} not found')
+
+    if outdir is not None:
+        os.makedirs(outdir, exist_ok=True)
+
+    results = {}
+    caches = {}
+    tasks = []
+
+    for source in wav_files:
+        dirname = outdir or os.path.dirname(source) or '.'
+        if dirname not in caches:
+            try:
+                with open(os.path.join(dirname, CACHE_FILE), 'r') as f:
+                    caches[dirname] = json.load(f)
+            except (FileNotFoundError, ValueError):
+                caches[dirname] = {}
+
+        source_sha = file_sha(source)
+        stem = os.path.splitext(os.path.basename(source))[0]
+        for ext, options in formats.items():
+            destination = os.path.join(dirname, f'{stem}.{ext}')
+            key = [source_sha, encoder, options]
+
+            if caches[dirname].get(os.path.basename(destination)) == key and os.path.exists(destination):
+                results[destination] = 'unchanged'
+            else:
+                tasks.append((dirname, destination, key, source, options))
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(encode, encoder, source, destination, options): (dirname, destination, key)
+            for dirname, destination, key, source, options in tasks}
+
+        for future in as_completed(futures):
+            dirname, destination, key = futures[future]
+            try:
+                future.result()
+            except subprocess.CalledProcessError as e:
+                results[destination] = 'failed'
+                message = e.stderr.decode(errors='replace').strip() or f'exit status {e.returncode}'
+                print(f'{destination}: {message}', file=sys.stderr)
+                continue
+
+            caches[dirname][os.path.basename(destination)] = key
+            results[destination] = 'encoded'
+
+    for dirname, cache in caches.items():
+        with open(os.path.join(dirname, CACHE_FILE), 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+
+    return results
+
+
+def main():
+    parser = ArgumentParser(description='Transcode WAV files to MP3 and M4A')
+    parser.add_argument('files', nargs='+', metavar='WAV', help='WAV files to transcode')
+    parser.add_argument(
+        '-o', dest='outdir', metavar='DIR',
+        help='write outputs here instead of next to each WAV')
+    parser.add_argument(
+        '-e', dest='encoder', default=FFMPEG_BIN, metavar='BIN',
+        help='FFmpeg binary, or anything that takes the same arguments (default: %(default)s, or $FFMPEG_BIN)')
+    parser.add_argument(
+        '-j', dest='jobs', type=int, default=None, metavar='N',
+        help='number of encoders to run at once')
+    args = parser.parse_args()
+
+    results = transcode_all(args.files, args.outdir, args.encoder, args.jobs)
+
+    for destination, status in sorted(results.items()):
+        print(f'{destination}: {status}')
+
+    if 'failed' in results.values():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()